@@ -0,0 +1,3 @@
+"""
+EDF 檢視器的基準測試與合成資料產生器（python -m benchmarks --help）
+"""
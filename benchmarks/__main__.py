@@ -0,0 +1,156 @@
+"""
+EDF 檢視器的基準測試
+
+用法：
+    python -m benchmarks run [--profile quick] [--suite parse,read,views] [--output results.json]
+                             [--baseline baseline.json] [--threshold 0.25]
+    python -m benchmarks compare results.json baseline.json [--threshold 0.25]
+    python -m benchmarks generate out.edf [--channels 8] [--rates 256,128] [--hours 8] [--edf-plus]
+                                  [--hypnogram out-Hypnogram.edf]
+
+run 以固定 seed 產生合成資料，在暫存資料庫中執行各套件並輸出 JSON 結果；
+指定 --baseline 時與基準線比較，有案例的 median 超過門檻即以結束碼 1 結束
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+
+from .common import ROOT, import_edf, setup_django
+from .compare import DEFAULT_THRESHOLD, compare, format_comparison, format_results, load_results
+from .suites import PROFILES, SUITES, Context
+from .synthetic import hypnogram_events, psg_channels, write_edf, write_hypnogram
+
+
+def _git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ''
+
+
+def _generate(edf_path, hypnogram_path, channels, rates, hours, record_duration, seed, edf_plus=False):
+    """edf_plus 為 True 時睡眠階段同時寫入信號檔的 annotation 信號"""
+    duration = hours * 3600
+    events = hypnogram_events(duration, seed=seed)
+    write_edf(edf_path, psg_channels(channels, rates), duration, record_duration, seed=seed, edf_plus=edf_plus,
+              annotations=events if edf_plus else ())
+    if hypnogram_path:
+        write_hypnogram(hypnogram_path, events, duration)
+
+
+def run(args):
+    import numpy
+
+    profile = dict(PROFILES[args.profile])
+    if args.repeat:
+        profile['repeat'] = args.repeat
+    suites = args.suite.split(',') if args.suite else list(SUITES)
+    unknown = [name for name in suites if name not in SUITES]
+    if unknown:
+        raise SystemExit(f"unknown suite: {', '.join(unknown)}")
+
+    workdir = tempfile.mkdtemp(prefix='edf-bench-')
+    try:
+        edf_path = os.path.join(workdir, 'synthetic-PSG.edf')
+        hypnogram_path = os.path.join(workdir, 'synthetic-Hypnogram.edf')
+        _generate(edf_path, hypnogram_path, profile['channels'], profile['rates'], profile['hours'],
+                  profile['record_duration'], args.seed)
+
+        setup_django(workdir)
+        from django.test import Client
+
+        edf_file = import_edf(edf_path, hypnogram_path)
+        ctx = Context(edf_file.file.path, edf_file.hypnogram_file.path, edf_file, Client(), profile['repeat'])
+        results = {}
+        for name in suites:
+            print(f"running {name} ...", file=sys.stderr)
+            results.update(SUITES[name](ctx))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    output = {
+        'meta': {
+            'profile': args.profile,
+            'config': dict(profile, rates=list(profile['rates']), seed=args.seed),
+            'suites': suites,
+            'revision': _git_revision(),
+            'python': platform.python_version(),
+            'numpy': numpy.__version__,
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'timestamp': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+        },
+        'results': results,
+    }
+    print(format_results(output))
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(output, f, indent=2, sort_keys=True)
+        print(f"results written to {args.output}", file=sys.stderr)
+
+    if args.baseline:
+        return _report(output, load_results(args.baseline), args.threshold)
+    return 0
+
+
+def _report(results, baseline, threshold):
+    if baseline['meta'].get('config') != results['meta'].get('config'):
+        print("warning: baseline was recorded with a different profile or seed", file=sys.stderr)
+    rows = compare(results, baseline, threshold)
+    print(format_comparison(rows))
+    regressions = [row for row in rows if row[4] == 'regression']
+    if regressions:
+        print(f"{len(regressions)} case(s) slower than baseline by more than {threshold:.0%}", file=sys.stderr)
+        return 1
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks', description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = commands.add_parser('run', help='執行基準測試')
+    run_parser.add_argument('--profile', choices=sorted(PROFILES), default='quick')
+    run_parser.add_argument('--suite', help=f"以逗號分隔（{', '.join(SUITES)}），預設全部")
+    run_parser.add_argument('--repeat', type=int, help='每個案例的計時次數（預設依 profile）')
+    run_parser.add_argument('--seed', type=int, default=0)
+    run_parser.add_argument('--output', help='結果 JSON 路徑')
+    run_parser.add_argument('--baseline', help='與此結果 JSON 比較')
+    run_parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD, help='退步門檻（比例）')
+
+    compare_parser = commands.add_parser('compare', help='比較兩份結果 JSON')
+    compare_parser.add_argument('results')
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD)
+
+    generate_parser = commands.add_parser('generate', help='產生合成 EDF（與睡眠週期檔）')
+    generate_parser.add_argument('edf_path')
+    generate_parser.add_argument('--channels', type=int, default=8)
+    generate_parser.add_argument('--rates', default='256', help='以逗號分隔，依序循環使用')
+    generate_parser.add_argument('--hours', type=float, default=8.0)
+    generate_parser.add_argument('--record-duration', type=float, default=1.0)
+    generate_parser.add_argument('--hypnogram', help='同時寫入睡眠週期檔')
+    generate_parser.add_argument('--edf-plus', action='store_true', help='寫成 EDF+，睡眠階段放在 annotation 信號')
+    generate_parser.add_argument('--seed', type=int, default=0)
+
+    args = parser.parse_args(argv)
+    if args.command == 'run':
+        return run(args)
+    if args.command == 'compare':
+        return _report(load_results(args.results), load_results(args.baseline), args.threshold)
+    rates = tuple(float(rate) if '.' in rate else int(rate) for rate in args.rates.split(','))
+    _generate(args.edf_path, args.hypnogram, args.channels, rates, args.hours, args.record_duration, args.seed,
+              args.edf_plus)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
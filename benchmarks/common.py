@@ -0,0 +1,98 @@
+"""基準測試共用的 Django 設定、匯入與計時工具"""
+import gc
+import os
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'edf_viewer.settings')
+
+
+def setup_django(workdir):
+    """使用暫存資料庫與媒體目錄，不動到正式資料"""
+    import django
+    from django.conf import settings
+
+    settings.DATABASES['default']['NAME'] = os.path.join(workdir, 'db.sqlite3')
+    settings.MEDIA_ROOT = workdir
+    settings.ALLOWED_HOSTS = ['*']
+    # 背景預讀與上傳處理會干擾計時
+    settings.EDF_PREFETCH_WINDOWS = 0
+    settings.EDF_INGEST_IN_PROCESS = False
+    django.setup()
+
+    from django.core.management import call_command
+    call_command('migrate', verbosity=0)
+
+
+def import_edf(edf_path, hypnogram_path=None):
+    from django.core.files import File
+    from viewer.edf_parser import parse_edf_file, parse_hypnogram_file
+    from viewer.models import EDFFile
+
+    edf_file = EDFFile(title=os.path.basename(edf_path))
+    with open(edf_path, 'rb') as fh:
+        edf_file.file.save(os.path.basename(edf_path), File(fh), save=False)
+    if hypnogram_path:
+        with open(hypnogram_path, 'rb') as fh:
+            edf_file.hypnogram_file.save(os.path.basename(hypnogram_path), File(fh), save=False)
+    edf_file.save()
+    parse_edf_file(edf_file)
+    if hypnogram_path:
+        parse_hypnogram_file(edf_file)
+    return edf_file
+
+
+def time_requests(client, url, repeat, **headers):
+    timings = []
+    size = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        response = client.get(url, **headers)
+        timings.append(time.perf_counter() - start)
+        size = len(response.content)
+        if response.status_code != 200:
+            raise RuntimeError(f"{url}: HTTP {response.status_code}")
+    return size, timings
+
+
+def measure(func, repeat, warmup=1, setup=None):
+    """
+    執行 func 共 warmup + repeat 次，只計時後 repeat 次（每次之前呼叫 setup，不計入時間）
+    計時期間停用 GC，避免回收時間落在個別樣本上
+    回傳 (每次秒數列表, 最後一次的回傳值)
+    """
+    result = None
+    timings = []
+    gc_enabled = gc.isenabled()
+    try:
+        for k in range(warmup + repeat):
+            if setup is not None:
+                setup()
+            gc.disable()
+            start = time.perf_counter()
+            result = func()
+            elapsed = time.perf_counter() - start
+            if gc_enabled:
+                gc.enable()
+            if k >= warmup:
+                timings.append(elapsed)
+    finally:
+        if gc_enabled:
+            gc.enable()
+    return timings, result
+
+
+def summarize(timings):
+    """毫秒統計：median、p95、min、max"""
+    ordered = sorted(timings)
+    return {
+        'median_ms': statistics.median(ordered) * 1000,
+        'p95_ms': ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000,
+        'min_ms': ordered[0] * 1000,
+        'max_ms': ordered[-1] * 1000,
+        'repeat': len(ordered),
+    }
@@ -0,0 +1,63 @@
+"""將基準測試結果與保存的基準線比較"""
+import json
+
+# 預設的退步門檻：median 比基準線慢超過 25% 視為退步
+DEFAULT_THRESHOLD = 0.25
+# 差距小於此值（毫秒）時不論比例都視為雜訊
+MIN_DELTA_MS = 0.1
+
+
+def load_results(path):
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def compare(results, baseline, threshold=DEFAULT_THRESHOLD):
+    """
+    逐案例比較 median_ms（只比較這次有執行的套件）
+    回傳 [(案例, 基準線 ms, 目前 ms, 比值, 狀態), ...]；
+    狀態為 regression / improved / ok，或只出現在一邊時為 new / missing
+    """
+    current = results['results']
+    suites = set(results['meta'].get('suites') or ())
+    previous = {name: result for name, result in baseline['results'].items()
+                if not suites or name.split('.', 1)[0] in suites}
+    rows = []
+    for name in sorted(set(current) | set(previous)):
+        if name not in previous:
+            rows.append((name, None, current[name]['median_ms'], None, 'new'))
+            continue
+        if name not in current:
+            rows.append((name, previous[name]['median_ms'], None, None, 'missing'))
+            continue
+        before = previous[name]['median_ms']
+        after = current[name]['median_ms']
+        ratio = after / before if before > 0 else float('inf')
+        if abs(after - before) < MIN_DELTA_MS:
+            status = 'ok'
+        elif ratio > 1 + threshold:
+            status = 'regression'
+        elif ratio < 1 / (1 + threshold):
+            status = 'improved'
+        else:
+            status = 'ok'
+        rows.append((name, before, after, ratio, status))
+    return rows
+
+
+def format_comparison(rows):
+    def ms(value):
+        return f"{value:10.2f}" if value is not None else f"{'-':>10}"
+
+    lines = [f"{'case':<44} {'baseline':>10} {'current':>10} {'ratio':>7}  status"]
+    for name, before, after, ratio, status in rows:
+        shown = f"{ratio:7.2f}" if ratio is not None else f"{'-':>7}"
+        lines.append(f"{name:<44} {ms(before)} {ms(after)} {shown}  {status}")
+    return '\n'.join(lines)
+
+
+def format_results(results):
+    lines = [f"{'case':<44} {'median ms':>10} {'p95 ms':>10} {'min ms':>10}"]
+    for name, result in sorted(results['results'].items()):
+        lines.append(f"{name:<44} {result['median_ms']:10.2f} {result['p95_ms']:10.2f} {result['min_ms']:10.2f}")
+    return '\n'.join(lines)
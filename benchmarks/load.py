@@ -0,0 +1,334 @@
+"""
+多人同時檢視的負載測試：對執行中的伺服器重播瀏覽器的檢視流程
+
+用法：
+    python -m benchmarks.load [--url http://127.0.0.1:8000] [--concurrency 8] [--duration 60]
+                              [--sessions N] [--edf 3,5] [--pages 10] [--zoom 120,1800] [--think 1.0]
+                              [--start-server] [--server-cmd "gunicorn edf_viewer.wsgi -w 4 -b 127.0.0.1:8000"]
+                              [--json results.json]
+
+每個虛擬使用者是一條執行緒（各自持有一條 keep-alive 連線），反覆執行一次檢視流程：
+開啟檢視頁 → 依序載入所有信號 → 讀取睡眠週期 → 以 30 秒為單位往後翻頁 → 縮小檢視（大於 300 秒時分段讀取）
+每一步之間以指數分布的思考時間等待。結束後依端點列出吞吐量、p50 / p95 / p99 延遲與錯誤率
+
+只透過 HTTP 與伺服器溝通，可測試任何部署方式（runserver、gunicorn、多個 worker）；
+紀錄取自伺服器現有的資料，可先以 python -m benchmarks generate 與 import_edf 匯入合成錄製
+"""
+import argparse
+import http.client
+import json
+import math
+import random
+import re
+import shlex
+import subprocess
+import sys
+import threading
+import time
+from urllib.parse import urlsplit
+
+from .common import ROOT
+
+# 與前端相同：一次最多讀取 300 秒的視窗，翻頁預設 30 秒
+CHUNK_SECONDS = 300
+PAGE_SECONDS = 30
+
+_PAGE_LINK = re.compile(r'href="/edf/(\d+)/"')
+_SIGNAL_ID = re.compile(r'data-signal-id="(\d+)"')
+_DURATION = re.compile(r'const totalDuration = ([0-9.eE+-]+);')
+
+
+class Stats:
+    """各端點的延遲、狀態與傳輸量（執行緒安全）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = {}
+        self.errors = {}
+        self.bytes = {}
+        self.sessions = 0
+
+    def add(self, endpoint, seconds, size, ok):
+        with self._lock:
+            self.latencies.setdefault(endpoint, []).append(seconds)
+            self.bytes[endpoint] = self.bytes.get(endpoint, 0) + size
+            if not ok:
+                self.errors[endpoint] = self.errors.get(endpoint, 0) + 1
+
+    def session_done(self):
+        with self._lock:
+            self.sessions += 1
+
+
+def percentile(ordered, fraction):
+    """最近秩法的百分位數（ordered 需已排序）"""
+    if not ordered:
+        return 0.0
+    rank = max(0, min(len(ordered) - 1, math.ceil(fraction * len(ordered)) - 1))
+    return ordered[rank]
+
+
+def summarize(stats, elapsed):
+    endpoints = {}
+    for endpoint, timings in sorted(stats.latencies.items()):
+        ordered = sorted(timings)
+        errors = stats.errors.get(endpoint, 0)
+        endpoints[endpoint] = {
+            'requests': len(ordered),
+            'errors': errors,
+            'error_rate': errors / len(ordered),
+            'rps': len(ordered) / elapsed,
+            'p50_ms': percentile(ordered, 0.50) * 1000,
+            'p95_ms': percentile(ordered, 0.95) * 1000,
+            'p99_ms': percentile(ordered, 0.99) * 1000,
+            'max_ms': ordered[-1] * 1000,
+            'mb': stats.bytes.get(endpoint, 0) / 1e6,
+        }
+    requests = sum(result['requests'] for result in endpoints.values())
+    errors = sum(result['errors'] for result in endpoints.values())
+    return {
+        'elapsed_s': elapsed,
+        'sessions': stats.sessions,
+        'requests': requests,
+        'errors': errors,
+        'error_rate': errors / requests if requests else 0.0,
+        'rps': requests / elapsed,
+        'endpoints': endpoints,
+    }
+
+
+def format_summary(summary):
+    lines = [f"{'endpoint':<18} {'requests':>8} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} "
+             f"{'max ms':>9} {'errors':>7} {'MB':>8}"]
+    for endpoint, result in summary['endpoints'].items():
+        lines.append(f"{endpoint:<18} {result['requests']:8d} {result['rps']:8.1f} {result['p50_ms']:9.1f} "
+                     f"{result['p95_ms']:9.1f} {result['p99_ms']:9.1f} {result['max_ms']:9.1f} "
+                     f"{result['error_rate']:7.1%} {result['mb']:8.1f}")
+    lines.append(f"{summary['sessions']} sessions, {summary['requests']} requests in {summary['elapsed_s']:.1f} s "
+                 f"({summary['rps']:.1f} req/s, {summary['sessions'] / summary['elapsed_s']:.2f} sessions/s), "
+                 f"errors {summary['error_rate']:.2%}")
+    return '\n'.join(lines)
+
+
+class Client:
+    """單一虛擬使用者的 keep-alive 連線；連線中斷時重新連線"""
+
+    def __init__(self, url, stats, timeout):
+        parts = urlsplit(url)
+        self.host = parts.hostname
+        self.port = parts.port
+        self.secure = parts.scheme == 'https'
+        self.stats = stats
+        self.timeout = timeout
+        self.connection = None
+
+    def _connect(self):
+        cls = http.client.HTTPSConnection if self.secure else http.client.HTTPConnection
+        return cls(self.host, self.port, timeout=self.timeout)
+
+    def get(self, endpoint, path, expected=(200,)):
+        """回傳 (狀態碼, 內容)；逾時或連線錯誤記為錯誤並回傳 (None, b'')"""
+        start = time.perf_counter()
+        status, body = None, b''
+        try:
+            if self.connection is None:
+                self.connection = self._connect()
+            self.connection.request('GET', path)
+            response = self.connection.getresponse()
+            body = response.read()
+            status = response.status
+            if response.will_close:
+                self.close()
+        except (OSError, http.client.HTTPException):
+            self.close()
+        self.stats.add(endpoint, time.perf_counter() - start, len(body), status in expected)
+        return status, body
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+
+def discover_recordings(url, timeout):
+    """從首頁的連結取得所有錄製的 id"""
+    client = Client(url, Stats(), timeout)
+    status, body = client.get('index', '/')
+    client.close()
+    if status != 200:
+        raise SystemExit(f"cannot load {url}/ (HTTP {status})")
+    return sorted({int(pk) for pk in _PAGE_LINK.findall(body.decode('utf-8', 'replace'))})
+
+
+def run_session(client, pk, rng, args):
+    """一次完整的檢視流程；檢視頁讀取失敗時提前結束"""
+    def think():
+        if args.think > 0:
+            time.sleep(rng.expovariate(1 / args.think))
+
+    status, body = client.get('view_edf', f"/edf/{pk}/")
+    if status != 200:
+        return
+    page = body.decode('utf-8', 'replace')
+    signal_ids = list(dict.fromkeys(_SIGNAL_ID.findall(page)))
+    match = _DURATION.search(page)
+    duration = float(match.group(1)) if match else 0.0
+
+    for signal_id in signal_ids:
+        client.get('signal_data', f"/signal/{signal_id}/data/")
+    # 沒有睡眠週期檔的錄製回傳 404，與前端相同視為正常
+    client.get('hypnogram_data', f"/edf/{pk}/hypnogram/", expected=(200, 404))
+    if not signal_ids or duration <= 0:
+        return
+    think()
+
+    signals = ','.join(signal_ids)
+
+    def window(endpoint, start, seconds):
+        for offset in range(0, int(seconds), CHUNK_SECONDS):
+            chunk_start = start + offset
+            chunk_end = min(start + seconds, chunk_start + CHUNK_SECONDS)
+            client.get(endpoint, f"/edf/{pk}/window/?signals={signals}&start={chunk_start:.3f}"
+                                 f"&end={chunk_end:.3f}&format=bin")
+
+    # 從隨機位置開始，讓不同使用者讀取錄製的不同部分
+    pages = max(0, args.pages)
+    span = min(duration, (pages + 1) * PAGE_SECONDS)
+    current = rng.uniform(0, duration - span) if duration > span else 0.0
+    for _ in range(pages):
+        current = min(duration - PAGE_SECONDS, current + PAGE_SECONDS) if duration > PAGE_SECONDS else 0.0
+        window('edf_window', current, min(PAGE_SECONDS, duration))
+        think()
+
+    for seconds in args.zoom:
+        seconds = min(seconds, duration)
+        start = max(0.0, min(current, duration - seconds))
+        window('edf_window.zoom', start, seconds)
+        think()
+
+
+def worker(index, url, recordings, stats, deadline, remaining, args):
+    rng = random.Random(args.seed * 1000003 + index)
+    client = Client(url, stats, args.timeout)
+    try:
+        while time.monotonic() < deadline:
+            if remaining is not None:
+                with remaining['lock']:
+                    if remaining['count'] <= 0:
+                        break
+                    remaining['count'] -= 1
+            run_session(client, rng.choice(recordings), rng, args)
+            stats.session_done()
+    finally:
+        client.close()
+
+
+def _wait_for_server(url, process, timeout):
+    parts = urlsplit(url)
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise SystemExit(f"server exited with code {process.returncode}")
+        try:
+            connection = http.client.HTTPConnection(parts.hostname, parts.port, timeout=1)
+            connection.request('GET', '/')
+            connection.getresponse().read()
+            connection.close()
+            return
+        except (OSError, http.client.HTTPException):
+            time.sleep(0.2)
+    raise SystemExit(f"server did not respond within {timeout:g} s")
+
+
+def start_server(url, command):
+    """在背景啟動伺服器（預設為 runserver，不自動重新載入）並等候可連線"""
+    parts = urlsplit(url)
+    if command:
+        argv = shlex.split(command)
+    else:
+        argv = [sys.executable, 'manage.py', 'runserver', '--noreload', f"{parts.hostname}:{parts.port}"]
+    process = subprocess.Popen(argv, cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        _wait_for_server(url, process, 30)
+    except BaseException:
+        process.terminate()
+        process.wait()
+        raise
+    return process
+
+
+def run(args):
+    url = args.url.rstrip('/')
+    if not urlsplit(url).port:
+        url = f"{url}:{443 if url.startswith('https') else 80}"
+    server = start_server(url, args.server_cmd) if args.start_server else None
+    try:
+        recordings = args.edf or discover_recordings(url, args.timeout)
+        if not recordings:
+            raise SystemExit('no recordings on the server; upload or import_edf some first')
+
+        stats = Stats()
+        remaining = {'count': args.sessions, 'lock': threading.Lock()} if args.sessions else None
+        duration = args.duration if args.duration else float('inf')
+        print(f"{args.concurrency} users, {len(recordings)} recordings, "
+              f"{f'{args.sessions} sessions' if args.sessions else f'{args.duration:g} s'} ...", file=sys.stderr)
+        start = time.monotonic()
+        deadline = start + duration
+        threads = [threading.Thread(target=worker, args=(k, url, recordings, stats, deadline, remaining, args),
+                                    daemon=True)
+                   for k in range(args.concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.monotonic() - start
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    summary = summarize(stats, elapsed)
+    summary['config'] = {
+        'url': url, 'concurrency': args.concurrency, 'recordings': recordings, 'pages': args.pages,
+        'zoom': args.zoom, 'think': args.think, 'seed': args.seed, 'server_cmd': args.server_cmd or '',
+    }
+    print(format_summary(summary))
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, indent=2, sort_keys=True)
+        print(f"results written to {args.json}", file=sys.stderr)
+    return 1 if summary['errors'] and args.fail_on_error else 0
+
+
+def _numbers(text, cast):
+    return [cast(value) for value in text.split(',') if value.strip()]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.load', description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default='http://127.0.0.1:8000')
+    parser.add_argument('--concurrency', type=int, default=8, help='同時的虛擬使用者數')
+    parser.add_argument('--duration', type=float, default=60.0, help='執行秒數（指定 --sessions 時為上限，0 為不限）')
+    parser.add_argument('--sessions', type=int, default=0, help='總共執行的檢視流程數')
+    parser.add_argument('--edf', type=lambda text: _numbers(text, int), help='以逗號分隔的錄製 id，預設取首頁全部')
+    parser.add_argument('--pages', type=int, default=10, help='每次流程往後翻頁的次數（30 秒）')
+    parser.add_argument('--zoom', type=lambda text: _numbers(text, float), default=[120.0, 1800.0],
+                        help='翻頁後依序縮小到的視窗長度（秒）')
+    parser.add_argument('--think', type=float, default=1.0, help='步驟間的平均思考時間（秒，0 為不等待）')
+    parser.add_argument('--timeout', type=float, default=60.0, help='單一請求的逾時秒數')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--start-server', action='store_true', help='在背景啟動伺服器，結束後關閉')
+    parser.add_argument('--server-cmd', help='搭配 --start-server 的啟動指令，預設為 manage.py runserver --noreload')
+    parser.add_argument('--json', help='結果 JSON 路徑')
+    parser.add_argument('--fail-on-error', action='store_true', help='有錯誤時以結束碼 1 結束')
+    args = parser.parse_args(argv)
+    if args.concurrency < 1:
+        parser.error('--concurrency must be at least 1')
+    if not args.duration and not args.sessions:
+        parser.error('--duration 0 requires --sessions')
+    return run(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,128 @@
+"""
+基準測試套件：標頭與註記解析、read_signal_data、signal_data / hypnogram_data 端點
+每個套件回傳 {案例名稱: 統計 dict}
+"""
+from collections import namedtuple
+
+from .common import measure, summarize
+
+# 合成資料的規模（channels 個信號，取樣率依序循環使用 rates）
+PROFILES = {
+    'quick': {'channels': 4, 'rates': (256, 128), 'hours': 1.0, 'record_duration': 1.0, 'repeat': 5},
+    'standard': {'channels': 8, 'rates': (256, 256, 256, 256, 128, 128, 100, 256), 'hours': 8.0,
+                 'record_duration': 1.0, 'repeat': 10},
+    'long-records': {'channels': 8, 'rates': (256,), 'hours': 8.0, 'record_duration': 30.0, 'repeat': 10},
+}
+
+# read_signal_data 的視窗長度（秒，None 為整段）與輸出點數上限
+READ_WINDOWS = (10, 30, 300, 3600, None)
+READ_MAX_SAMPLES = (1000, 10000)
+
+Context = namedtuple('Context', ['edf_path', 'hypnogram_path', 'edf_file', 'client', 'repeat'])
+
+
+def _window_name(seconds):
+    return 'full' if seconds is None else f"{seconds}s"
+
+
+def parse_suite(ctx):
+    """標頭解析、parse_edf_file（含寫入資料庫）與睡眠週期註記解析"""
+    from viewer.edf_annotations import load_annotations
+    from viewer.edf_header import read_edf_header
+    from viewer.edf_parser import parse_edf_file
+    from viewer.models import EDFFile
+
+    def read_header():
+        with open(ctx.edf_path, 'rb') as f:
+            return read_edf_header(f, strict=True)
+
+    def parse():
+        edf_file = EDFFile(title='bench')
+        edf_file.file.name = ctx.edf_file.file.name
+        return parse_edf_file(edf_file)
+
+    results = {}
+    timings, header = measure(read_header, ctx.repeat * 10)
+    results['parse.header'] = dict(summarize(timings), signals=header.num_signals)
+    timings, _ = measure(parse, ctx.repeat)
+    results['parse.parse_edf_file'] = dict(summarize(timings), signals=header.num_signals)
+    if ctx.hypnogram_path:
+        timings, annotations = measure(lambda: load_annotations(ctx.hypnogram_path), ctx.repeat)
+        results['parse.hypnogram'] = dict(summarize(timings), annotations=len(annotations))
+    return results
+
+
+def read_suite(ctx):
+    """
+    read_signal_data：各視窗長度與下採樣比例（視窗樣本數 / 輸出點數上限）
+    先以原始資料計時，再建立金字塔後計時縮小檢視的情況
+    """
+    from viewer.edf_reader import get_edf_handle, read_signal_data
+    from viewer.pyramid import build_pyramid
+
+    path = ctx.edf_path
+    handle = get_edf_handle(path)
+    signal_index = 0
+    rate = float(handle.sampling_rate(signal_index))
+    duration = handle.total_duration
+
+    def cases(prefix):
+        results = {}
+        for seconds in READ_WINDOWS:
+            if seconds is not None and seconds >= duration:
+                continue
+            start, end = (None, None) if seconds is None else (duration / 2, duration / 2 + seconds)
+            samples = int((seconds or duration) * rate)
+            for max_samples in READ_MAX_SAMPLES:
+                timings, data = measure(
+                    lambda: read_signal_data(path, signal_index, start, end, max_samples), ctx.repeat)
+                results[f"{prefix}.{_window_name(seconds)}.{max_samples}"] = dict(
+                    summarize(timings), samples=samples, points=len(data),
+                    ratio=round(samples / max(1, len(data)), 2))
+        return results
+
+    results = cases('read.raw')
+    build_pyramid(path)
+    results.update({name: result for name, result in cases('read.pyramid').items()
+                    if result['ratio'] >= 4})
+    return results
+
+
+def views_suite(ctx):
+    """signal_data（快取未命中與命中、JSON 與二進位）與 hypnogram_data"""
+    from django.conf import settings
+    from django.core.cache import caches
+
+    cache = caches[getattr(settings, 'EDF_WINDOW_CACHE', 'edf_windows')]
+    signal = ctx.edf_file.signals.first()
+    duration = ctx.edf_file.duration
+
+    def get(url):
+        response = ctx.client.get(url)
+        if response.status_code != 200:
+            raise RuntimeError(f"{url}: HTTP {response.status_code}")
+        return len(response.content)
+
+    results = {}
+    for seconds in (30, 300, None):
+        query = '' if seconds is None else f"start={duration / 2}&end={duration / 2 + seconds}"
+        for fmt in ('json', 'bin'):
+            url = f"/signal/{signal.id}/data/?{query}" + ('&format=bin' if fmt == 'bin' else '')
+            timings, size = measure(lambda: get(url), ctx.repeat, setup=cache.clear)
+            results[f"views.signal_data.{_window_name(seconds)}.{fmt}.cold"] = dict(summarize(timings), bytes=size)
+            timings, size = measure(lambda: get(url), ctx.repeat)
+            results[f"views.signal_data.{_window_name(seconds)}.{fmt}.cached"] = dict(summarize(timings), bytes=size)
+
+    if ctx.hypnogram_path:
+        for name, query in (('full', ''), ('1h', f"start={duration / 2}&end={duration / 2 + 3600}")):
+            url = f"/edf/{ctx.edf_file.pk}/hypnogram/?{query}"
+            timings, size = measure(lambda: get(url), ctx.repeat)
+            results[f"views.hypnogram_data.{name}"] = dict(summarize(timings), bytes=size)
+    return results
+
+
+SUITES = {
+    'parse': parse_suite,
+    'read': read_suite,
+    'views': views_suite,
+}
@@ -0,0 +1,220 @@
+"""
+可重現的合成 EDF / EDF+ / BDF 與睡眠週期檔產生器
+相同參數與 seed 產生位元組完全相同的檔案；依資料記錄分塊寫入，記憶體用量與錄製長度無關
+"""
+from collections import namedtuple
+
+import numpy as np
+
+ChannelSpec = namedtuple('ChannelSpec', ['label', 'rate', 'units', 'physical_min', 'physical_max'])
+
+ANNOTATION_LABEL = 'EDF Annotations'
+
+# 依序循環使用的 PSG 通道（標籤、單位、物理範圍）
+PSG_CHANNELS = (
+    ('EEG C4-M1', 'uV', -500.0, 500.0),
+    ('EEG C3-M2', 'uV', -500.0, 500.0),
+    ('EEG F4-M1', 'uV', -500.0, 500.0),
+    ('EEG O2-M1', 'uV', -500.0, 500.0),
+    ('EOG E1-M2', 'uV', -1000.0, 1000.0),
+    ('EOG E2-M2', 'uV', -1000.0, 1000.0),
+    ('EMG Chin', 'uV', -200.0, 200.0),
+    ('ECG', 'mV', -5.0, 5.0),
+)
+
+SLEEP_STAGES = ('W', '1', '2', '3', 'R')
+
+# 睡眠階段的轉移機率（每 30 秒 epoch），列與欄依 SLEEP_STAGES 順序
+_STAGE_TRANSITIONS = np.array([
+    [0.90, 0.08, 0.01, 0.00, 0.01],
+    [0.05, 0.70, 0.23, 0.00, 0.02],
+    [0.02, 0.03, 0.85, 0.07, 0.03],
+    [0.01, 0.00, 0.09, 0.90, 0.00],
+    [0.03, 0.02, 0.05, 0.00, 0.90],
+])
+
+_DIGITAL_MIN = -32768
+_DIGITAL_MAX = 32767
+
+# BDF 的 24 位元數位範圍
+_BDF_DIGITAL_MIN = -8388608
+_BDF_DIGITAL_MAX = 8388607
+
+# 每次產生與寫入的資料量上限（樣本數）
+_CHUNK_SAMPLES = 4 * 1024 * 1024
+
+
+def psg_channels(count=8, rates=(256,)):
+    """count 個 PSG 通道，取樣率依序循環使用 rates"""
+    channels = []
+    for i in range(count):
+        label, units, low, high = PSG_CHANNELS[i % len(PSG_CHANNELS)]
+        if i >= len(PSG_CHANNELS):
+            label = f"{label} #{i // len(PSG_CHANNELS) + 1}"
+        channels.append(ChannelSpec(label, rates[i % len(rates)], units, low, high))
+    return channels
+
+
+def _field(value, width):
+    return str(value)[:width].ljust(width).encode('latin1')
+
+
+def _header(labels, samples_per_record, num_records, record_duration, reserved='', units=None, physical=None,
+            digital=None, version=None):
+    count = len(labels)
+    units = units or [''] * count
+    physical = physical or [(-1.0, 1.0)] * count
+    digital = digital or [(_DIGITAL_MIN, _DIGITAL_MAX)] * count
+
+    header = ((version or _field('0', 8)) + _field('X X X Synthetic', 80) + _field('Startdate 01-JAN-2020 X X X', 80)
+              + _field('01.01.20', 8) + _field('22.00.00', 8) + _field(256 * (count + 1), 8)
+              + _field(reserved, 44) + _field(num_records, 8) + _field(f"{record_duration:g}", 8) + _field(count, 4))
+    columns = (
+        (labels, 16),
+        (['AgAgCl electrode'] * count, 80),
+        (units, 8),
+        ([f"{low:g}" for low, _ in physical], 8),
+        ([f"{high:g}" for _, high in physical], 8),
+        ([low for low, _ in digital], 8),
+        ([high for _, high in digital], 8),
+        (['HP:0.1Hz LP:75Hz'] * count, 80),
+        (samples_per_record, 8),
+        ([''] * count, 32),
+    )
+    for values, width in columns:
+        header += b''.join(_field(value, width) for value in values)
+    return header
+
+
+def _number(value):
+    return f"{value:.6f}".rstrip('0').rstrip('.')
+
+
+def _tal(onset, duration=None, texts=()):
+    """TAL 位元組；沒有文字時為記錄的時間標記（+onset\x14\x14）"""
+    tal = ('+' if onset >= 0 else '') + _number(onset)
+    if duration:
+        tal += '\x15' + _number(duration)
+    return (tal + '\x14' + ''.join(f"{text}\x14" for text in texts or ('',)) + '\x00').encode('utf-8')
+
+
+def _annotation_records(onsets, record_duration, annotations):
+    """每筆記錄的 TAL 位元組：時間標記加上 onset 落在該記錄內的註記"""
+    records = [[_tal(onset)] for onset in onsets]
+    for onset, duration, text in annotations:
+        k = min(len(onsets) - 1, max(0, int(np.searchsorted(onsets, onset, side='right')) - 1))
+        records[k].append(_tal(onset, duration, (text,)))
+    return [b''.join(parts) for parts in records]
+
+
+def _synthesize(rng, channel, phase, first_sample, count, digital_max=_DIGITAL_MAX):
+    """
+    類 EEG 的合成信號：低頻（delta）與 alpha 正弦加上隨機雜訊與緩慢漂移
+    回傳數位值（int32），物理範圍約使用一半
+    """
+    t = (first_sample + np.arange(count)) / channel.rate
+    delta = np.sin(2 * np.pi * 1.5 * t + phase)
+    alpha = 0.5 * np.sin(2 * np.pi * min(10.0, channel.rate / 4) * t)
+    drift = 0.2 * np.sin(2 * np.pi * t / 600.0)
+    noise = 0.3 * rng.standard_normal(count)
+    signal = 0.25 * (delta + alpha + drift + noise)
+    return np.clip(np.round(signal * digital_max), -digital_max - 1, digital_max).astype('<i4')
+
+
+def _sample_bytes(samples, sample_bytes):
+    """數位值轉為 little-endian 的 2（EDF）或 3（BDF）位元組，回傳 (樣本數, sample_bytes) 的 uint8 陣列"""
+    if sample_bytes == 2:
+        return samples.astype('<i2').view(np.uint8).reshape(-1, 2)
+    return samples.astype('<i4').view(np.uint8).reshape(-1, 4)[:, :3]
+
+
+def write_edf(path, channels, duration, record_duration=1.0, seed=0, edf_plus=False, annotations=(), bdf=False,
+              record_onsets=None):
+    """
+    寫入合成 EDF 檔
+    channels 為 ChannelSpec 列表，duration 為錄製長度（秒，取整為記錄數），
+    edf_plus 為 True 時加入 "EDF Annotations" 信號（EDF+C），annotations 為 [(onset, duration, text), ...]
+    bdf 為 True 時寫成 24 位元的 BDF；record_onsets 為每筆記錄的開始時間（秒）時寫成不連續的 EDF+D / BDF+D
+    （記錄數由 record_onsets 決定，忽略 duration）
+    """
+    if record_onsets is not None:
+        edf_plus = True
+        num_records = len(record_onsets)
+    else:
+        num_records = max(1, int(round(duration / record_duration)))
+    sample_bytes = 3 if bdf else 2
+    digital_min, digital_max = (_BDF_DIGITAL_MIN, _BDF_DIGITAL_MAX) if bdf else (_DIGITAL_MIN, _DIGITAL_MAX)
+    samples_per_record = [int(round(channel.rate * record_duration)) for channel in channels]
+    labels = [channel.label for channel in channels]
+    units = [channel.units for channel in channels]
+    physical = [(channel.physical_min, channel.physical_max) for channel in channels]
+    digital = [(digital_min, digital_max)] * len(channels)
+
+    tal_records = None
+    reserved = '24BIT' if bdf else ''
+    if edf_plus:
+        onsets = record_onsets if record_onsets is not None else [k * record_duration for k in range(num_records)]
+        tal_records = _annotation_records(onsets, record_duration, annotations)
+        tal_samples = -(-max(len(raw) for raw in tal_records) // sample_bytes)
+        samples_per_record.append(tal_samples)
+        labels.append(ANNOTATION_LABEL)
+        units.append('')
+        physical.append((-1.0, 1.0))
+        digital.append((digital_min, digital_max))
+        reserved = ('BDF' if bdf else 'EDF') + ('+D' if record_onsets is not None else '+C')
+
+    rng = np.random.default_rng(seed)
+    phases = rng.uniform(0, 2 * np.pi, len(channels))
+    record_bytes = sum(samples_per_record) * sample_bytes
+    records_per_chunk = max(1, _CHUNK_SAMPLES // sum(samples_per_record))
+    with open(path, 'wb') as f:
+        f.write(_header(labels, samples_per_record, num_records, record_duration, reserved, units, physical, digital,
+                        b'\xffBIOSEMI' if bdf else None))
+        for first in range(0, num_records, records_per_chunk):
+            count = min(records_per_chunk, num_records - first)
+            block = np.empty((count, record_bytes), dtype=np.uint8)
+            column = 0
+            for channel, phase, spr in zip(channels, phases, samples_per_record):
+                samples = _synthesize(rng, channel, phase, first * spr, count * spr, digital_max)
+                width = spr * sample_bytes
+                block[:, column:column + width] = _sample_bytes(samples, sample_bytes).reshape(count, width)
+                column += width
+            if tal_records is not None:
+                tal_bytes = samples_per_record[-1] * sample_bytes
+                raw = b''.join(tal_records[k].ljust(tal_bytes, b'\x00') for k in range(first, first + count))
+                block[:, column:] = np.frombuffer(raw, dtype=np.uint8).reshape(count, -1)
+            f.write(block.tobytes())
+    return path
+
+
+def hypnogram_events(duration, epoch_seconds=30, seed=0):
+    """
+    以馬可夫鏈產生睡眠階段序列，連續相同階段合併為一筆註記
+    回傳 [(onset, duration, 'Sleep stage X'), ...]
+    """
+    rng = np.random.default_rng(seed)
+    epochs = max(1, int(duration // epoch_seconds))
+    stage = 0
+    stages = []
+    for _ in range(epochs):
+        stages.append(stage)
+        stage = int(rng.choice(len(SLEEP_STAGES), p=_STAGE_TRANSITIONS[stage]))
+
+    events = []
+    start = 0
+    for k in range(1, epochs + 1):
+        if k == epochs or stages[k] != stages[start]:
+            events.append((start * epoch_seconds, (k - start) * epoch_seconds,
+                           f"Sleep stage {SLEEP_STAGES[stages[start]]}"))
+            start = k
+    return events
+
+
+def write_hypnogram(path, events, duration):
+    """寫入只含 annotation 信號的 EDF+ 睡眠週期檔（Sleep-EDF 的格式：單筆資料記錄）"""
+    raw = _tal(0) + b''.join(_tal(onset, length, (text,)) for onset, length, text in events)
+    samples = (len(raw) + 1) // 2
+    with open(path, 'wb') as f:
+        f.write(_header([ANNOTATION_LABEL], [samples], 1, float(duration), 'EDF+C'))
+        f.write(raw.ljust(samples * 2, b'\x00'))
+    return path
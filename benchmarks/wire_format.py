@@ -0,0 +1,55 @@
+"""
+比較 /signal/<id>/data/ 的 JSON 與二進位（float32）格式
+回報每個請求的回應大小與伺服器處理時間
+
+用法：
+    python -m benchmarks.wire_format path/to/recording.edf [--repeat 20]
+"""
+import argparse
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+
+if __package__ in (None, ''):
+    # 以 python benchmarks/wire_format.py 執行時
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.common import import_edf, setup_django, time_requests
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('edf_path')
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--window', type=float, default=300.0, help='視窗長度（秒）')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='edf-bench-')
+    try:
+        setup_django(workdir)
+        from django.test import Client
+
+        edf_file = import_edf(args.edf_path)
+        signal = edf_file.signals.first()
+        client = Client()
+
+        cases = [
+            ('overview', ''),
+            (f'{args.window:g}s window', f'start=0&end={args.window}'),
+        ]
+        print(f"{'case':<16} {'format':<6} {'bytes':>10} {'median ms':>10} {'p95 ms':>8}")
+        for name, query in cases:
+            base = f'/signal/{signal.id}/data/?{query}'
+            for fmt, url in (('json', base), ('bin', f'{base}&format=bin')):
+                size, timings = time_requests(client, url, args.repeat)
+                timings.sort()
+                p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+                print(f"{name:<16} {fmt:<6} {size:>10} {statistics.median(timings) * 1000:>10.2f} {p95 * 1000:>8.2f}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
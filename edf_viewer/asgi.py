@@ -0,0 +1,14 @@
+import os
+
+from django.core.asgi import get_asgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'edf_viewer.settings')
+# 信號資料相關端點使用非同步 view（見 settings.EDF_ASYNC_VIEWS）
+os.environ.setdefault('EDF_ASYNC_VIEWS', '1')
+
+application = get_asgi_application()
+
+# 需在 Django 設定完成後匯入
+from viewer.offload import CancelOnDisconnect  # noqa: E402
+
+application = CancelOnDisconnect(application)
@@ -18,6 +18,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'viewer.metrics.ServerTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -46,6 +47,7 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'edf_viewer.wsgi.application'
+ASGI_APPLICATION = 'edf_viewer.asgi.application'
 
 DATABASES = {
     'default': {
@@ -76,3 +78,47 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 FILE_UPLOAD_MAX_MEMORY_SIZE = 52428800  # 50MB
 DATA_UPLOAD_MAX_MEMORY_SIZE = 52428800
+
+# 快取：edf_windows 存放解碼後的信號視窗（以總位元組數為上限的 LRU）
+# 可改為 django.core.cache.backends.filebased.FileBasedCache 等其他 backend
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'edf_windows': {
+        'BACKEND': 'viewer.window_cache.ByteBoundedLRUCache',
+        'TIMEOUT': None,
+        'OPTIONS': {'MAX_BYTES': 256 * 1024 * 1024},
+    },
+}
+EDF_WINDOW_CACHE = 'edf_windows'
+
+# 預讀：偵測到連續翻頁時，在背景把接下來幾個視窗讀入 edf_windows（0 表示停用）
+EDF_PREFETCH_WINDOWS = 2
+EDF_PREFETCH_WORKERS = 2
+# 已預讀但尚未被請求的資料量上限（bytes）
+EDF_PREFETCH_MAX_BYTES = 32 * 1024 * 1024
+
+# 上傳處理時另存每個信號連續的數位值檔（<檔名>.channels/；EDF 為 int16，BDF 為 int32），單一信號讀取改為直接切片
+# EDF 約多佔用與原檔相同的磁碟空間，BDF 每個樣本 4 bytes（原檔 3 bytes）約為 4/3 倍；預設不建立，已存在的檔案讀取時一律自動使用
+EDF_CHANNEL_STORE = False
+
+# 各階段耗時的 Server-Timing 標頭與 /metrics/（Prometheus 文字格式）
+EDF_METRICS = True
+
+# ASGI（edf_viewer/asgi.py 設定 EDF_ASYNC_VIEWS=1）：signal_data、edf_window、hypnogram_data 改用非同步 view，
+# 讀檔與解碼交給最多 EDF_ASYNC_WORKERS 個執行緒，同一檔案同時最多 EDF_ASYNC_PER_FILE 個請求在解碼
+EDF_ASYNC_VIEWS = os.environ.get('EDF_ASYNC_VIEWS') == '1'
+EDF_ASYNC_WORKERS = 4
+EDF_ASYNC_PER_FILE = 2
+
+# 上傳後的 EDF 檔案不會再改變，信號資料回應可讓瀏覽器長期快取（秒）
+EDF_HTTP_CACHE_MAX_AGE = 60 * 60 * 24 * 365
+
+# 上傳處理：True 時在伺服器內的執行緒池處理；False 時由 manage.py run_ingest_workers 處理
+EDF_INGEST_IN_PROCESS = True
+EDF_INGEST_WORKERS = 2
+# 執行中的工作每 EDF_INGEST_HEARTBEAT_SECONDS 秒更新一次 heartbeat；
+# 超過 EDF_INGEST_STALE_SECONDS 秒沒有更新視為 worker 已當機，重新排入佇列
+EDF_INGEST_HEARTBEAT_SECONDS = 30
+EDF_INGEST_STALE_SECONDS = 300
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import EDFFile, Signal
+from .models import Derivation, EDFFile, IngestJob, Montage, Signal
 
 
 @admin.register(EDFFile)
@@ -14,3 +14,28 @@ class SignalAdmin(admin.ModelAdmin):
     list_display = ['signal_label', 'edf_file', 'units', 'sampling_rate']
     search_fields = ['signal_label', 'edf_file__title']
     list_filter = ['edf_file']
+
+
+@admin.register(IngestJob)
+class IngestJobAdmin(admin.ModelAdmin):
+    list_display = ['edf_file', 'status', 'attempts', 'worker', 'created_at', 'heartbeat_at', 'finished_at']
+    list_filter = ['status']
+    actions = ['retry']
+
+    @admin.action(description='重新排入佇列')
+    def retry(self, request, queryset):
+        from .ingest import retry_job
+
+        for job in queryset:
+            retry_job(job.pk)
+
+
+class DerivationInline(admin.TabularInline):
+    model = Derivation
+    extra = 1
+
+
+@admin.register(Montage)
+class MontageAdmin(admin.ModelAdmin):
+    list_display = ['name', 'description']
+    inlines = [DerivationInline]
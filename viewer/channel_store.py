@@ -0,0 +1,77 @@
+import json
+import os
+
+import numpy as np
+
+
+def channel_store_dir(file_path):
+    """逐信號連續存放的 sidecar 目錄，與 EDF 檔案放在一起"""
+    return f"{file_path}.channels"
+
+
+def channel_store_path(file_path, signal_index):
+    return os.path.join(channel_store_dir(file_path), f"signal_{signal_index}.npy")
+
+
+def build_channel_store(file_path):
+    """
+    將資料記錄轉置為每個信號各自連續的數位值陣列（EDF 為 int16、BDF 為 int32，不縮放）
+    另存 layout.json 記錄每個信號的 gain/offset 與樣本數；單次串流讀取，記憶體用量與檔案長度無關
+    """
+    from .edf_reader import get_edf_handle
+
+    handle = get_edf_handle(file_path)
+    os.makedirs(channel_store_dir(file_path), exist_ok=True)
+
+    outputs = {}
+    for i in range(handle.num_signals):
+        if handle.samples_per_record[i] == 0:
+            continue
+        total = handle.channel_sample_count(i, 0, handle.num_data_records)
+        tmp_path = channel_store_path(file_path, i) + '.tmp'
+        out = np.lib.format.open_memmap(tmp_path, mode='w+', dtype=handle.sample_dtype, shape=(total,))
+        outputs[i] = [out, tmp_path, 0]
+
+    for block in handle.iter_record_blocks(0, handle.num_data_records):
+        for i, output in outputs.items():
+            columns = handle.channel_slice(i)
+            raw = (block[:, columns] if block.ndim == 2 else block[columns]).ravel()
+            output[0][output[2]:output[2] + len(raw)] = raw
+            output[2] += len(raw)
+
+    output = None
+    layout = []
+    for i in list(outputs):
+        out, tmp_path, _ = outputs.pop(i)
+        out.flush()
+        # 釋放最後一個參考（解除映射）後才取代檔案，Windows 不允許取代映射中的檔案
+        del out
+        os.replace(tmp_path, channel_store_path(file_path, i))
+        layout.append({
+            'signal_index': i,
+            'label': handle.labels[i],
+            'samples': handle.channel_sample_count(i, 0, handle.num_data_records),
+            'sampling_rate': float(handle.sampling_rate(i)),
+            'gain': float(handle.gain[i]),
+            'offset': float(handle.offset[i]),
+            'dtype': handle.sample_dtype.str,
+        })
+
+    with open(os.path.join(channel_store_dir(file_path), 'layout.json'), 'w') as f:
+        json.dump({'signals': layout}, f, indent=1)
+
+
+def load_channel_store(file_path, signal_index, total_samples, source_mtime, dtype='<i2'):
+    """
+    以記憶體映射載入信號的連續樣本；不存在、過期或長度不符時回傳 None
+    """
+    path = channel_store_path(file_path, signal_index)
+    try:
+        if os.stat(path).st_mtime_ns < source_mtime:
+            return None
+        samples = np.load(path, mmap_mode='r')
+    except (OSError, ValueError):
+        return None
+    if samples.shape != (total_samples,) or samples.dtype != np.dtype(dtype):
+        return None
+    return samples
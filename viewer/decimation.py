@@ -0,0 +1,154 @@
+import math
+
+import numpy as np
+
+# 可用的下採樣模式
+DECIMATION_MODES = ('minmax', 'lttb', 'stride')
+
+
+class _Decimator:
+    """
+    串流下採樣器基底：逐塊 feed() 樣本，最後 finish() 取得結果
+    僅保留未滿一個區間的殘餘樣本，記憶體上限取決於輸出點數
+    """
+
+    def __init__(self, bucket_size):
+        self.bucket_size = bucket_size
+        self._pending = np.empty(0)
+        self._out = []
+
+    def feed(self, samples):
+        if self._pending.size:
+            samples = np.concatenate((self._pending, samples))
+        full = (len(samples) // self.bucket_size) * self.bucket_size
+        if full:
+            self._reduce(samples[:full].reshape(-1, self.bucket_size))
+        self._pending = samples[full:].copy()
+
+    def finish(self):
+        if self._pending.size:
+            self._reduce_tail(self._pending)
+            self._pending = np.empty(0)
+        return np.concatenate(self._out) if self._out else np.empty(0)
+
+    def _reduce(self, buckets):
+        raise NotImplementedError
+
+    def _reduce_tail(self, samples):
+        self._reduce(samples.reshape(1, -1))
+
+
+class _PassThrough(_Decimator):
+    """不下採樣，直接串接"""
+
+    def __init__(self):
+        super().__init__(1)
+
+    def feed(self, samples):
+        self._out.append(samples)
+
+
+class StrideDecimator(_Decimator):
+    """每 step 個樣本取一點（舊版行為）"""
+
+    def __init__(self, step):
+        super().__init__(1)
+        self.step = step
+        self._position = 0
+
+    def feed(self, samples):
+        first = (-self._position) % self.step
+        self._out.append(samples[first::self.step])
+        self._position += len(samples)
+
+
+class MinMaxDecimator(_Decimator):
+    """每個區間輸出最小值與最大值（依出現先後），保留尖峰與偽影"""
+
+    def _reduce(self, buckets):
+        rows = np.arange(len(buckets))
+        argmin = buckets.argmin(axis=1)
+        argmax = buckets.argmax(axis=1)
+        lo = buckets[rows, argmin]
+        hi = buckets[rows, argmax]
+        min_first = argmin <= argmax
+        pairs = np.empty((len(buckets), 2))
+        pairs[:, 0] = np.where(min_first, lo, hi)
+        pairs[:, 1] = np.where(min_first, hi, lo)
+        self._out.append(pairs.ravel())
+
+
+class LTTBDecimator(_Decimator):
+    """
+    Largest-Triangle-Three-Buckets 串流版本
+    每個區間選一點，使其與前一個選取點及下一個區間平均值形成的三角形面積最大
+    """
+
+    def __init__(self, bucket_size):
+        super().__init__(bucket_size)
+        self._prev = None          # 前一個選取點 (x, y)
+        self._held = None          # 等待下一個區間平均值的區間
+        self._held_x0 = 0
+        self._position = 0
+
+    def _reduce(self, buckets):
+        for bucket in buckets:
+            self._push(bucket)
+
+    def _push(self, bucket):
+        x0 = self._position
+        self._position += len(bucket)
+        if self._prev is None:
+            # 第一個樣本固定保留
+            self._prev = (0.0, float(bucket[0]))
+            self._out.append(bucket[:1].copy())
+        if self._held is not None:
+            next_x = x0 + (len(bucket) - 1) / 2.0
+            self._select(next_x, float(bucket.mean()))
+        self._held = bucket
+        self._held_x0 = x0
+
+    def _select(self, next_x, next_y):
+        bucket = self._held
+        prev_x, prev_y = self._prev
+        xs = np.arange(self._held_x0, self._held_x0 + len(bucket), dtype=np.float64)
+        area = np.abs((prev_x - next_x) * (bucket - prev_y) - (prev_x - xs) * (next_y - prev_y))
+        i = int(area.argmax())
+        self._prev = (float(xs[i]), float(bucket[i]))
+        self._out.append(bucket[i:i + 1].copy())
+
+    def finish(self):
+        if self._pending.size:
+            self._push(self._pending)
+            self._pending = np.empty(0)
+        if self._held is not None:
+            # 最後一個區間以其最後一個樣本作為終點
+            self._select(self._position - 1.0, float(self._held[-1]))
+            self._held = None
+        return np.concatenate(self._out) if self._out else np.empty(0)
+
+
+def make_decimator(mode, total_samples, max_samples):
+    """
+    依模式建立下採樣器
+    回傳 (decimator, samples_per_point)；samples_per_point 為每個輸出點涵蓋的平均輸入樣本數
+    """
+    if mode not in DECIMATION_MODES:
+        raise ValueError(f"unknown decimation mode: {mode}")
+
+    if total_samples <= max_samples or max_samples <= 0:
+        return _PassThrough(), 1.0
+
+    if mode == 'stride':
+        step = max(1, total_samples // max_samples)
+        return StrideDecimator(step), float(step)
+
+    if mode == 'minmax':
+        buckets = max(1, max_samples // 2)
+        bucket_size = math.ceil(total_samples / buckets)
+        return MinMaxDecimator(bucket_size), bucket_size / 2.0
+
+    # LTTB：保留第一點，其餘每個區間一點
+    buckets = max(1, max_samples - 1)
+    bucket_size = math.ceil(total_samples / buckets)
+    return LTTBDecimator(bucket_size), float(bucket_size)
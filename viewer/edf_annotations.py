@@ -0,0 +1,131 @@
+import re
+
+import numpy as np
+
+ANNOTATION_LABEL = 'EDF Annotations'
+
+# 睡眠階段標籤對應
+STAGE_MAPPING = {
+    'Sleep stage W': 'W',
+    'Sleep stage 1': 'N1',
+    'Sleep stage 2': 'N2',
+    'Sleep stage 3': 'N3',
+    'Sleep stage 4': 'N3',
+    'Sleep stage R': 'REM',
+    'Sleep stage ?': 'unknown',
+    'W': 'W',
+    'N1': 'N1',
+    'N2': 'N2',
+    'N3': 'N3',
+    'REM': 'REM',
+    '1': 'N1',
+    '2': 'N2',
+    '3': 'N3',
+    'R': 'REM',
+}
+
+# TAL：+onset[\x15duration]\x14text\x14text...\x14
+_TAL_PATTERN = re.compile(rb'([+-]\d+(?:\.\d*)?)(?:\x15(\d+(?:\.\d*)?))?\x14(.*?)\x14?$', re.DOTALL)
+
+
+def normalize_stage(description):
+    """將 annotation 文字轉為睡眠階段代碼"""
+    return STAGE_MAPPING.get(description, description.split()[-1] if 'Sleep stage' in description else description)
+
+
+def annotation_signal_indices(handle):
+    return [i for i, label in enumerate(handle.labels) if label == ANNOTATION_LABEL]
+
+
+def iter_record_tals(raw):
+    """
+    解析一筆資料記錄中的 TAL 位元組
+    產生 (onset, duration, [texts])；每筆記錄第一個 TAL 為時間標記，texts 為空
+    """
+    for tal in raw.split(b'\x00'):
+        if not tal:
+            continue
+        match = _TAL_PATTERN.match(tal)
+        if match is None:
+            continue
+        onset = float(match.group(1))
+        duration = float(match.group(2)) if match.group(2) else 0.0
+        texts = [t.decode('utf-8', 'replace') for t in match.group(3).split(b'\x14') if t]
+        yield onset, duration, texts
+
+
+def annotation_record_bytes(handle, signal_index, start_record=0, end_record=None):
+    """逐筆產生 annotation 信號在每筆資料記錄中的原始位元組"""
+    if end_record is None:
+        end_record = handle.num_data_records
+    columns = handle.channel_byte_slice(signal_index)
+    for block in handle.iter_record_bytes(start_record, end_record):
+        if block.ndim != 2:
+            continue
+        for row in np.ascontiguousarray(block[:, columns]):
+            yield row.tobytes()
+
+
+def read_record_onsets(handle):
+    """
+    EDF+ 每筆資料記錄的開始時間（秒）：取自第一個 annotation 信號中每筆記錄的第一個 TAL（時間標記）
+    沒有 annotation 信號時視為連續記錄；無法解析的記錄以前一筆接續推算
+    """
+    duration = handle.duration_per_record
+    indices = annotation_signal_indices(handle)
+    if not indices:
+        return np.arange(handle.num_data_records) * duration
+
+    onsets = []
+    for raw in annotation_record_bytes(handle, indices[0]):
+        match = _TAL_PATTERN.match(raw.split(b'\x00', 1)[0])
+        onsets.append(float(match.group(1)) if match else None)
+    for record, onset in enumerate(onsets):
+        if onset is None:
+            onsets[record] = onsets[record - 1] + duration if record else 0.0
+    return np.asarray(onsets, dtype=np.float64)
+
+
+def read_edf_annotations(file_path):
+    """
+    讀取 EDF+ 檔案中 "EDF Annotations" 信號的所有註記
+    回傳 [(onset, duration, description), ...]（依 onset 排序）；
+    檔案不是 EDF+ 或沒有 annotation 信號時拋出 ValueError
+    """
+    from .edf_reader import EDFHandle
+
+    handle = EDFHandle(file_path)
+    try:
+        indices = annotation_signal_indices(handle)
+        if not indices:
+            raise ValueError(f"no '{ANNOTATION_LABEL}' signal in {file_path}")
+
+        annotations = []
+        for signal_index in indices:
+            for raw in annotation_record_bytes(handle, signal_index):
+                for onset, duration, texts in iter_record_tals(raw):
+                    for text in texts:
+                        annotations.append((onset, duration, text))
+    finally:
+        handle.close()
+
+    annotations.sort(key=lambda a: a[0])
+    return annotations
+
+
+def load_annotations(file_path):
+    """
+    讀取註記：優先使用原生 TAL 解析，失敗時若已安裝 mne 則改用 mne
+    """
+    try:
+        return read_edf_annotations(file_path)
+    except ValueError:
+        try:
+            import mne
+        except ImportError:
+            raise
+    annotations = mne.read_annotations(file_path)
+    return [
+        (float(onset), float(duration), str(description))
+        for onset, duration, description in zip(annotations.onset, annotations.duration, annotations.description)
+    ]
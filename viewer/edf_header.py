@@ -0,0 +1,226 @@
+import os
+
+import numpy as np
+
+# 每個信號在標頭中各欄位的寬度（bytes），依 EDF 規格順序排列
+SIGNAL_FIELD_WIDTHS = (
+    ('labels', 16),
+    ('transducers', 80),
+    ('physical_dims', 8),
+    ('physical_min', 8),
+    ('physical_max', 8),
+    ('digital_min', 8),
+    ('digital_max', 8),
+    ('prefilters', 80),
+    ('samples_per_record', 8),
+    ('reserved', 32),
+)
+
+_NUMERIC_FIELDS = {
+    'physical_min': np.float64,
+    'physical_max': np.float64,
+    'digital_min': np.float64,
+    'digital_max': np.float64,
+    'samples_per_record': np.int64,
+}
+
+
+class EDFHeader:
+    """
+    EDF 標頭與資料記錄配置
+    每個信號的數值欄位以 NumPy 陣列保存，並預先算好縮放因子與記錄內的位置
+    """
+
+    def __init__(self, num_header_bytes, num_data_records, duration_per_record, samples_per_record,
+                 physical_min, physical_max, digital_min, digital_max, labels=None, transducers=None,
+                 physical_dims=None, prefilters=None, version='', patient_info='', recording_info='',
+                 start_date='', start_time='', sample_bytes=2, discontinuous=False):
+        self.version = version
+        self.patient_info = patient_info
+        self.recording_info = recording_info
+        self.start_date = start_date
+        self.start_time = start_time
+
+        self.num_header_bytes = int(num_header_bytes)
+        self.num_data_records = int(num_data_records)
+        self.duration_per_record = float(duration_per_record) if duration_per_record > 0 else 1.0
+        # EDF 為 16 位元樣本，BDF 為 24 位元；EDF+D / BDF+D 的資料記錄在時間上可以不連續
+        self.sample_bytes = int(sample_bytes)
+        self.discontinuous = bool(discontinuous)
+
+        self.samples_per_record = np.asarray(samples_per_record, dtype=np.int64)
+        self.num_signals = len(self.samples_per_record)
+        self.physical_min = np.asarray(physical_min, dtype=np.float64)
+        self.physical_max = np.asarray(physical_max, dtype=np.float64)
+        self.digital_min = np.asarray(digital_min, dtype=np.float64)
+        self.digital_max = np.asarray(digital_max, dtype=np.float64)
+
+        blank = [''] * self.num_signals
+        self.labels = list(labels) if labels is not None else blank
+        self.transducers = list(transducers) if transducers is not None else blank
+        self.physical_dims = list(physical_dims) if physical_dims is not None else blank
+        self.prefilters = list(prefilters) if prefilters is not None else blank
+
+        # 計算縮放因子（數位範圍為零時不縮放）
+        dig_range = self.digital_max - self.digital_min
+        valid = dig_range != 0
+        self.gain = np.ones(self.num_signals)
+        self.gain[valid] = (self.physical_max[valid] - self.physical_min[valid]) / dig_range[valid]
+        self.offset = np.where(valid, self.physical_min - self.gain * self.digital_min, 0.0)
+
+        # 每個信號在單筆記錄內的起始樣本位置與位元組位置
+        self.sample_offsets = np.concatenate(([0], np.cumsum(self.samples_per_record)[:-1])).astype(np.int64)
+        self.byte_offsets = self.sample_offsets * self.sample_bytes
+        self.samples_per_record_total = int(self.samples_per_record.sum())
+        self.bytes_per_record = self.samples_per_record_total * self.sample_bytes
+
+    @property
+    def total_duration(self):
+        return self.num_data_records * self.duration_per_record
+
+    @property
+    def sampling_rates(self):
+        return self.samples_per_record / self.duration_per_record
+
+    @property
+    def sample_dtype(self):
+        """解碼後數位值的 dtype（24 位元樣本以 int32 保存）"""
+        return np.dtype('<i2') if self.sample_bytes == 2 else np.dtype('<i4')
+
+
+def _signal_field(data, pos, width, num_signals):
+    """以固定寬度一次切出所有信號的欄位文字"""
+    raw = np.frombuffer(data, dtype=f'S{width}', count=num_signals, offset=pos)
+    return np.char.strip(np.char.decode(raw, 'latin1'))
+
+
+def _to_numbers(name, values, dtype, strict):
+    """將欄位文字轉為數值陣列；非 strict 時無法解析的值視為 0"""
+    try:
+        return values.astype(np.float64).astype(dtype)
+    except ValueError:
+        if strict:
+            raise ValueError(f"EDF header parse error: invalid {name}")
+    out = np.zeros(len(values), dtype=dtype)
+    for i, value in enumerate(values):
+        try:
+            out[i] = float(value)
+        except ValueError:
+            pass
+    return out
+
+
+def parse_edf_header(data, strict=False):
+    """
+    從完整標頭位元組（256 + 信號數 × 256）解析 EDFHeader
+    strict 為 True 時信號數值欄位無法解析即拋出 ValueError，否則視為 0
+    """
+    if len(data) < 256:
+        raise ValueError("EDF header parse error: file too small")
+
+    header = bytes(data[:256]).decode('latin1')
+    try:
+        num_signals = int(header[252:256].strip())
+        num_header_bytes = int(header[184:192].strip()) or (256 + num_signals * 256)
+        num_data_records = int(header[236:244].strip())
+    except ValueError as e:
+        raise ValueError(f"EDF header parse error: {e}")
+
+    try:
+        duration_per_record = float(header[244:252].strip())
+    except ValueError:
+        duration_per_record = 1.0
+
+    # BDF：版本欄位為 0xFF "BIOSEMI"，或保留欄位標示 24BIT / BDF+
+    reserved = header[192:236].strip()
+    sample_bytes = 3 if data[0] == 0xFF or reserved.startswith(('24BIT', 'BDF+')) else 2
+
+    if len(data) < 256 + num_signals * 256:
+        raise ValueError("EDF header parse error: truncated signal header")
+
+    fields = {}
+    pos = 256
+    for name, width in SIGNAL_FIELD_WIDTHS:
+        values = _signal_field(data, pos, width, num_signals)
+        if name in _NUMERIC_FIELDS:
+            values = _to_numbers(name, values, _NUMERIC_FIELDS[name], strict)
+        else:
+            values = values.tolist()
+        fields[name] = values
+        pos += width * num_signals
+    del fields['reserved']
+
+    return EDFHeader(
+        num_header_bytes=num_header_bytes,
+        num_data_records=num_data_records,
+        duration_per_record=duration_per_record,
+        version=header[0:8].strip(),
+        patient_info=header[8:88].strip(),
+        recording_info=header[88:168].strip(),
+        start_date=header[168:176].strip(),
+        start_time=header[176:184].strip(),
+        sample_bytes=sample_bytes,
+        discontinuous=reserved.startswith(('EDF+D', 'BDF+D')),
+        **fields,
+    )
+
+
+def read_edf_header(f, strict=False):
+    """
+    從檔案開頭讀取並解析標頭：固定部分與信號部分各讀取一次
+    記錄數為 -1（錄製中尚未寫入）時由檔案大小推算完整記錄的筆數
+    """
+    f.seek(0)
+    main = f.read(256)
+    try:
+        num_signals = int(main[252:256].decode('latin1').strip())
+    except ValueError as e:
+        raise ValueError(f"EDF header parse error: {e}")
+    header = parse_edf_header(main + f.read(num_signals * 256), strict=strict)
+    if header.num_data_records == -1 and header.bytes_per_record > 0:
+        f.seek(0, os.SEEK_END)
+        header.num_data_records = max(0, f.tell() - header.num_header_bytes) // header.bytes_per_record
+    return header
+
+
+def edf_header_size(data):
+    """
+    由檔案開頭 256 bytes 檢查固定標頭並回傳完整標頭的長度（256 + 信號數 × 256）
+    不是 EDF / BDF 標頭時拋出 ValueError；用於串流上傳時盡早拒絕錯誤的檔案
+    """
+    if len(data) < 256:
+        raise ValueError("EDF header parse error: file too small")
+    if data[0:1] != b'0' and data[0] != 0xFF:
+        raise ValueError("EDF header parse error: not an EDF or BDF file")
+    header = bytes(data[:256]).decode('latin1')
+    try:
+        num_signals = int(header[252:256].strip())
+        declared = int(header[184:192].strip() or 0)
+    except ValueError as e:
+        raise ValueError(f"EDF header parse error: {e}")
+    if num_signals <= 0:
+        raise ValueError(f"EDF header parse error: invalid number of signals {num_signals}")
+    size = 256 + num_signals * 256
+    if declared and declared != size:
+        raise ValueError(f"EDF header parse error: header size {declared} does not match {num_signals} signals")
+    return size
+
+
+def check_edf_layout(data, file_size):
+    """
+    解析完整標頭，確認宣告的記錄數 × 記錄大小與檔案大小一致（記錄數為 -1 時只要求整數筆記錄）
+    回傳 EDFHeader，不一致時拋出 ValueError
+    """
+    header = parse_edf_header(data, strict=True)
+    if header.num_signals and (header.samples_per_record <= 0).any():
+        raise ValueError("EDF header parse error: samples per record must be positive")
+    data_bytes = file_size - header.num_header_bytes
+    if header.num_data_records == -1:
+        if data_bytes <= 0 or data_bytes % header.bytes_per_record:
+            raise ValueError(f"{data_bytes} data bytes is not a whole number of "
+                             f"{header.bytes_per_record}-byte records")
+    elif header.num_data_records <= 0 or data_bytes != header.num_data_records * header.bytes_per_record:
+        expected = header.num_header_bytes + header.num_data_records * header.bytes_per_record
+        raise ValueError(f"header declares {header.num_data_records} records × {header.bytes_per_record} bytes "
+                         f"({expected} bytes in total) but the file is {file_size} bytes")
+    return header
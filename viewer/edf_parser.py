@@ -1,116 +1,108 @@
-import struct
 from datetime import datetime
+from django.db import transaction
 from django.utils import timezone
-from .models import Signal
+from .edf_annotations import load_annotations, normalize_stage
+from .edf_header import read_edf_header
+from .models import Annotation, EDFFile, Signal
 
 def parse_edf_file(edf_file_obj):
-    """解析 EDF 檔案並儲存元數據和信號信息"""
+    """解析 EDF 檔案並儲存元數據、資料記錄配置和信號信息"""
     file_path = edf_file_obj.file.path
-    
+
+    # 一次讀取完整標頭（固定部分 + 所有信號欄位）
     with open(file_path, 'rb') as f:
-        # 讀取 EDF 檔案頭（256 bytes）
-        header = f.read(256).decode('latin1')
-        
-        # 解析基本信息
-        version = header[0:8].strip()
-        patient_info = header[8:88].strip()
-        recording_info = header[88:168].strip()
-        start_date = header[168:176].strip()
-        start_time = header[176:184].strip()
-        num_header_bytes = int(header[184:192].strip())
-        reserved = header[192:236].strip()
-        num_data_records = int(header[236:244].strip())
-        try:
-            duration_per_record = float(header[244:252].strip())
-            if duration_per_record <= 0:
-                duration_per_record = 1.0
-        except ValueError:
-            duration_per_record = 1.0
-        num_signals = int(header[252:256].strip())
-        
-        # 計算總時長（秒）
-        total_duration = num_data_records * duration_per_record
-        
-        # 更新 EDF 物件
-        edf_file_obj.patient_name = patient_info[:50]
-        edf_file_obj.num_signals = num_signals
-        edf_file_obj.duration = total_duration
-        
-        # 解析開始時間
-        try:
-            rec_date = datetime.strptime(f"{start_date} {start_time}", "%d.%m.%y %H.%M.%S")
-            edf_file_obj.recording_date = timezone.make_aware(rec_date)
-        except:
-            pass
-        
+        header = read_edf_header(f, strict=True)
+
+    signals = build_edf_rows(edf_file_obj, header, recording_duration(file_path, header))
+
+    # 元數據與所有信號在同一個交易內寫入
+    with transaction.atomic():
         edf_file_obj.save()
-        
-        # 讀取信號標籤部分（每個信號 16 bytes）
-        signal_labels = []
-        f.seek(256)
-        for i in range(num_signals):
-            label = f.read(16).decode('latin1').strip()
-            signal_labels.append(label)
-        
-        # 讀取轉換器信息
-        transducers = []
-        for i in range(num_signals):
-            transducer = f.read(80).decode('latin1').strip()
-            transducers.append(transducer)
-        
-        # 讀取物理單位
-        physical_dims = []
-        for i in range(num_signals):
-            phys_dim = f.read(8).decode('latin1').strip()
-            physical_dims.append(phys_dim)
-        
-        # 讀取物理最小值
-        phys_mins = []
-        for i in range(num_signals):
-            phys_min = float(f.read(8).decode('latin1').strip())
-            phys_mins.append(phys_min)
-        
-        # 讀取物理最大值
-        phys_maxs = []
-        for i in range(num_signals):
-            phys_max = float(f.read(8).decode('latin1').strip())
-            phys_maxs.append(phys_max)
-        
-        # 讀取數位最小值
-        dig_mins = []
-        for i in range(num_signals):
-            dig_min = int(f.read(8).decode('latin1').strip())
-            dig_mins.append(dig_min)
-        
-        # 讀取數位最大值
-        dig_maxs = []
-        for i in range(num_signals):
-            dig_max = int(f.read(8).decode('latin1').strip())
-            dig_maxs.append(dig_max)
-        
-        # 讀取預濾波信息
-        prefilters = []
-        for i in range(num_signals):
-            prefilter = f.read(80).decode('latin1').strip()
-            prefilters.append(prefilter)
-        
-        # 讀取每筆錄音中的樣本數
-        samples_per_record = []
-        for i in range(num_signals):
-            spr = int(f.read(8).decode('latin1').strip())
-            samples_per_record.append(spr)
-        
-        # 計算採樣率
-        for i in range(num_signals):
-            sampling_rate = samples_per_record[i] / duration_per_record
-            
-            Signal.objects.create(
-                edf_file=edf_file_obj,
-                signal_index=i,  # 新增：保存索引
-                signal_label=signal_labels[i],
-                transducer=transducers[i],
-                units=physical_dims[i],
-                physical_min=phys_mins[i],
-                physical_max=phys_maxs[i],
-                sampling_rate=sampling_rate,
-            )
+        Signal.objects.bulk_create(signals)
+
+    return header
+
+
+def recording_duration(file_path, header):
+    """記錄總長度（秒）；EDF+D 由最後一筆資料記錄的時間標記計算，包含記錄之間的空隙"""
+    if not header.discontinuous:
+        return header.total_duration
+    from .edf_reader import get_edf_handle
+
+    return get_edf_handle(file_path, lambda: header).total_duration
+
+
+def build_edf_rows(edf_file_obj, header, duration=None):
+    """將標頭內容寫入 EDF 物件（不儲存），並建立尚未儲存的 Signal 列表"""
+    edf_file_obj.patient_name = header.patient_info[:50]
+    edf_file_obj.num_signals = header.num_signals
+    edf_file_obj.duration = duration if duration is not None else header.total_duration
+    edf_file_obj.num_header_bytes = header.num_header_bytes
+    edf_file_obj.num_data_records = header.num_data_records
+    edf_file_obj.record_duration = header.duration_per_record
+    edf_file_obj.bytes_per_record = header.bytes_per_record
+    edf_file_obj.sample_bytes = header.sample_bytes
+    edf_file_obj.discontinuous = header.discontinuous
+
+    # 解析開始時間
+    try:
+        rec_date = datetime.strptime(f"{header.start_date} {header.start_time}", "%d.%m.%y %H.%M.%S")
+        edf_file_obj.recording_date = timezone.make_aware(rec_date)
+    except:
+        pass
+
+    sampling_rates = header.sampling_rates
+    return [
+        Signal(
+            edf_file=edf_file_obj,
+            signal_index=i,
+            signal_label=header.labels[i],
+            transducer=header.transducers[i],
+            units=header.physical_dims[i],
+            physical_min=float(header.physical_min[i]),
+            physical_max=float(header.physical_max[i]),
+            sampling_rate=float(sampling_rates[i]),
+            digital_min=int(header.digital_min[i]),
+            digital_max=int(header.digital_max[i]),
+            gain=float(header.gain[i]),
+            offset=float(header.offset[i]),
+            samples_per_record=int(header.samples_per_record[i]),
+            byte_offset=int(header.byte_offsets[i]),
+        )
+        for i in range(header.num_signals)
+    ]
+
+
+def build_annotation_rows(edf_file_obj, annotations):
+    """由 [(onset, duration, description), ...] 建立尚未儲存的 Annotation 列表"""
+    return [
+        Annotation(
+            edf_file=edf_file_obj,
+            onset=onset,
+            duration=duration,
+            description=description[:255],
+            stage=normalize_stage(description)[:32],
+        )
+        for onset, duration, description in annotations
+    ]
+
+
+def parse_hypnogram_file(edf_file_obj, only_if_unparsed=False):
+    """
+    解析睡眠週期檔的註記並取代資料庫中原有的註記，記錄解析時間；沒有睡眠週期檔時回傳 0
+    only_if_unparsed 為 True 時已解析過（包含同時進行的背景處理）就不再寫入並回傳 None
+    """
+    if not edf_file_obj.hypnogram_file:
+        return 0
+    rows = build_annotation_rows(edf_file_obj, load_annotations(edf_file_obj.hypnogram_file.path))
+    with transaction.atomic():
+        # 鎖住 EDF 列，讓背景處理與 view 的補解析依序執行，避免重複寫入註記
+        locked = EDFFile.objects.select_for_update().only('hypnogram_parsed_at').get(pk=edf_file_obj.pk)
+        if only_if_unparsed and locked.hypnogram_parsed_at is not None:
+            edf_file_obj.hypnogram_parsed_at = locked.hypnogram_parsed_at
+            return None
+        edf_file_obj.annotations.all().delete()
+        Annotation.objects.bulk_create(rows)
+        edf_file_obj.hypnogram_parsed_at = timezone.now()
+        EDFFile.objects.filter(pk=edf_file_obj.pk).update(hypnogram_parsed_at=edf_file_obj.hypnogram_parsed_at)
+    return len(rows)
@@ -1,162 +1,593 @@
-import struct
+import logging
 import math
-from functools import lru_cache
+import mmap
+import os
+import threading
+import time
+from collections import OrderedDict, namedtuple
 
-# 文件快取：避免重複打開同一個文件
-_file_cache = {}
+import numpy as np
 
-def read_signal_data(file_path, signal_index, start_time=None, end_time=None, max_samples=10000, return_rate=False):
+from .decimation import MinMaxDecimator, make_decimator
+from .channel_store import load_channel_store
+from .edf_header import read_edf_header
+from . import metrics
+from .filters import StreamingFIR, design_kernel
+from .pyramid import load_pyramid, read_pyramid_window
+
+# EDF 檔案控制代碼快取：以路徑為鍵，mtime/大小改變時失效
+_handle_cache = OrderedDict()
+_handle_cache_lock = threading.Lock()
+_HANDLE_CACHE_SIZE = 32
+
+logger = logging.getLogger(__name__)
+
+# 單次讀取的資料區塊大小上限（bytes）
+_READ_BLOCK_BYTES = 16 * 1024 * 1024
+
+
+def decode_samples(raw, sample_bytes):
     """
-    讀取 EDF 檔案中的信號數據（優化版本）
-    使用增量讀取，避免一次性載入大量數據
+    將原始位元組（最後一維）轉為數位值：16 位元直接以 int16 檢視，不複製；
+    24 位元（BDF）放到 int32 的高三個位元組後算術右移 8 位，一次完成符號延伸
     """
-    with open(file_path, 'rb') as f:
-        # 讀取檔案頭
-        header = f.read(256).decode('latin1')
-        
-        try:
-            num_signals = int(header[252:256].strip())
-            num_header_bytes = int(header[184:192].strip()) or (256 + num_signals * 256)
-            num_data_records = int(header[236:244].strip())
-            duration_per_record = float(header[244:252].strip())
-        except (ValueError, IndexError) as e:
-            raise ValueError(f"EDF header parse error: {e}")
-        
-        if duration_per_record <= 0:
-            duration_per_record = 1.0
-        
-        if signal_index < 0 or signal_index >= num_signals:
-            raise ValueError(f"signal_index {signal_index} out of range [0, {num_signals-1}]")
-        
-        # 讀取樣本數配置
-        samples_per_record = _read_samples_per_record(f, num_signals, num_header_bytes)
-        
-        if samples_per_record[signal_index] == 0:
-            raise ValueError(f"Signal {signal_index} has no samples")
-        
-        sampling_rate = samples_per_record[signal_index] / duration_per_record
-        
-        # 讀取縮放參數
-        phys_mins = _read_physical_mins(f, num_signals, num_header_bytes)
-        phys_maxs = _read_physical_maxs(f, num_signals, num_header_bytes)
-        dig_mins = _read_digital_mins(f, num_signals, num_header_bytes)
-        dig_maxs = _read_digital_maxs(f, num_signals, num_header_bytes)
-        
-        # 計算縮放因子
-        if dig_maxs[signal_index] == dig_mins[signal_index]:
-            gain = 1.0
-            offset = 0.0
-        else:
-            gain = (phys_maxs[signal_index] - phys_mins[signal_index]) / (dig_maxs[signal_index] - dig_mins[signal_index])
-            offset = phys_mins[signal_index] - gain * dig_mins[signal_index]
-        
-        bytes_per_record = sum(samples_per_record) * 2
-        total_duration = num_data_records * duration_per_record
-        
-        # 限制請求範圍
+    usable = raw.shape[-1] - raw.shape[-1] % sample_bytes
+    if usable != raw.shape[-1]:
+        raw = raw[..., :usable]
+    if sample_bytes == 2:
+        return raw.view('<i2')
+    packed = np.zeros(raw.shape[:-1] + (usable // 3, 4), dtype=np.uint8)
+    packed[..., 1:] = raw.reshape(raw.shape[:-1] + (usable // 3, 3))
+    return packed.view('<i4')[..., 0] >> 8
+
+
+class EDFHandle:
+    """
+    記憶體映射的 EDF 檔案
+    開啟時一次解析完整標頭（或使用已保存的配置），之後讀取資料不需要再做任何標頭 I/O
+    標頭欄位（num_signals、samples_per_record、gain、offset…）可直接由 handle 取用
+    """
+
+    def __init__(self, file_path, header=None):
+        self.path = file_path
+        stat = os.stat(file_path)
+        self.mtime = stat.st_mtime_ns
+        self.size = stat.st_size
+
+        if self.size < 256:
+            raise ValueError("EDF header parse error: file too small")
+
+        with open(file_path, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        self.header = header if header is not None else read_edf_header(self._mm)
+        self._pyramids = {}
+        self._channel_stores = {}
+        self._record_index = None
+
+    def __getattr__(self, name):
+        # 只有在 handle 本身沒有該屬性時才會呼叫
+        if name == 'header':
+            raise AttributeError(name)
+        return getattr(self.header, name)
+
+    def sampling_rate(self, signal_index):
+        return self.samples_per_record[signal_index] / self.duration_per_record
+
+    @property
+    def record_onsets(self):
+        """
+        EDF+D 每筆資料記錄的開始時間（秒）：第一次使用時由 annotation 信號的時間標記建立，之後重複使用
+        記錄在時間上連續的檔案回傳 None
+        """
+        if not self.discontinuous:
+            return None
+        if self._record_index is None:
+            from .edf_annotations import read_record_onsets
+
+            onsets = read_record_onsets(self)
+            self._record_index = (onsets, onsets + self.duration_per_record)
+        return self._record_index[0]
+
+    @property
+    def total_duration(self):
+        onsets = self.record_onsets
+        if onsets is None or not len(onsets):
+            return self.header.total_duration
+        return float(onsets[-1]) + self.duration_per_record
+
+    def record_time(self, record):
+        """資料記錄（可為陣列）的開始時間（秒）"""
+        onsets = self.record_onsets
+        if onsets is None or not len(onsets):
+            return record * self.duration_per_record
+        record = np.asarray(record)
+        known = np.minimum(record, len(onsets) - 1)
+        return onsets[known] + (record - known) * self.duration_per_record
+
+    def record_gaps(self, start_record, end_record):
+        """[start_record, end_record) 範圍內相鄰記錄之間的空隙：[(空隙開始時間, 長度), ...]"""
+        onsets = self.record_onsets
+        end_record = min(end_record, len(onsets)) if onsets is not None else 0
+        if end_record - start_record < 2:
+            return []
+        ends = self._record_index[1][start_record:end_record - 1]
+        gaps = onsets[start_record + 1:end_record] - ends
+        return [(float(ends[i]), float(gaps[i])) for i in np.flatnonzero(gaps > 1e-9)]
+
+    def record_range(self, start_time=None, end_time=None):
+        """
+        將時間範圍（秒）轉換為資料記錄範圍 [start_record, end_record)
+        EDF+D 以記錄時間索引二分搜尋：從第一筆結束時間晚於 start 的記錄，到最後一筆開始時間早於 end 的記錄
+        """
+        total_duration = self.total_duration
         start_time = max(0.0, start_time or 0.0)
         end_time = min(total_duration, end_time) if end_time is not None else total_duration
-        
-        # 計算記錄範圍
-        start_record = int(start_time // duration_per_record)
-        end_record = int(math.ceil(end_time / duration_per_record))
-        end_record = min(end_record, num_data_records)
-        
-        # 計算每條記錄內的樣本偏移
-        samples_before_target = sum(samples_per_record[:signal_index])
-        target_samples = samples_per_record[signal_index]
-        
-        # 讀取數據（優化版本）
-        all_data = []
-        try:
-            for record in range(start_record, end_record):
-                f.seek(num_header_bytes + record * bytes_per_record + samples_before_target * 2)
-                
-                for _ in range(target_samples):
-                    try:
-                        raw_value = struct.unpack('<h', f.read(2))[0]
-                        physical_value = raw_value * gain + offset
-                        all_data.append(physical_value)
-                    except struct.error:
-                        break
-        except Exception as e:
-            print(f"Error reading signal data: {e}")
-        
-        # 下採樣 - 只在必要時進行
-        if len(all_data) > max_samples:
-            step = max(1, len(all_data) // max_samples)
-            all_data = all_data[::step]
-        
-        if return_rate:
-            return all_data, sampling_rate
-        return all_data
-
-
-def _read_samples_per_record(f, num_signals, num_header_bytes):
-    """讀取每筆錄音中的樣本數"""
-    offset = 256 + num_signals * (16 + 80 + 8 + 8 + 8 + 8 + 8 + 80)
-    f.seek(offset)
-    samples = []
-    for i in range(num_signals):
-        try:
-            spr = int(f.read(8).decode('latin1').strip())
-        except ValueError:
-            spr = 0
-        samples.append(spr)
-    return samples
-
-
-def _read_physical_mins(f, num_signals, num_header_bytes):
-    """讀取物理最小值"""
-    offset = 256 + num_signals * (16 + 80 + 8)
-    f.seek(offset)
-    values = []
-    for i in range(num_signals):
-        try:
-            val = float(f.read(8).decode('latin1').strip())
-        except ValueError:
-            val = 0.0
-        values.append(val)
-    return values
-
-
-def _read_physical_maxs(f, num_signals, num_header_bytes):
-    """讀取物理最大值"""
-    offset = 256 + num_signals * (16 + 80 + 8 + 8)
-    f.seek(offset)
-    values = []
-    for i in range(num_signals):
-        try:
-            val = float(f.read(8).decode('latin1').strip())
-        except ValueError:
-            val = 0.0
-        values.append(val)
-    return values
-
-
-def _read_digital_mins(f, num_signals, num_header_bytes):
-    """讀取數位最小值"""
-    offset = 256 + num_signals * (16 + 80 + 8 + 8 + 8)
-    f.seek(offset)
-    values = []
-    for i in range(num_signals):
+
+        onsets = self.record_onsets
+        if onsets is not None and len(onsets):
+            start_record = int(np.searchsorted(self._record_index[1], start_time, side='right'))
+            end_record = int(np.searchsorted(onsets, end_time, side='left'))
+            return start_record, max(start_record, min(end_record, self.num_data_records))
+
+        start_record = int(start_time // self.duration_per_record)
+        end_record = int(math.ceil(end_time / self.duration_per_record))
+        end_record = min(end_record, self.num_data_records)
+        return start_record, end_record
+
+    def iter_record_bytes(self, start_record, end_record, block_bytes=_READ_BLOCK_BYTES):
+        """
+        逐塊產生 [start_record, end_record) 資料記錄的原始位元組
+        每次產生 (記錄數, 每記錄位元組數) 的 uint8 陣列（直接映射，不複製）；
+        檔案被截斷時最後產生一維的殘餘位元組
+        """
+        if self.bytes_per_record <= 0:
+            return
+        records_per_block = max(1, block_bytes // self.bytes_per_record)
+        record = start_record
+        while record < end_record:
+            count = min(records_per_block, end_record - record)
+            begin = self.num_header_bytes + record * self.bytes_per_record
+            available = max(0, min(count * self.bytes_per_record, self.size - begin))
+            full_records = available // self.bytes_per_record
+            if full_records:
+                yield np.frombuffer(self._mm, dtype=np.uint8, count=full_records * self.bytes_per_record,
+                                    offset=begin).reshape(full_records, self.bytes_per_record)
+            if full_records < count:
+                tail_bytes = available - full_records * self.bytes_per_record
+                if tail_bytes:
+                    yield np.frombuffer(self._mm, dtype=np.uint8, count=tail_bytes,
+                                        offset=begin + full_records * self.bytes_per_record)
+                return
+            record += count
+
+    def iter_record_blocks(self, start_record, end_record, block_bytes=_READ_BLOCK_BYTES):
+        """
+        逐塊產生 [start_record, end_record) 的資料記錄
+        每次產生 (記錄數, 每記錄樣本數) 的數位值陣列：EDF 為 int16（直接映射，不複製），BDF 為 int32；
+        檔案被截斷時最後產生一維的殘餘樣本
+        """
+        for raw in self.iter_record_bytes(start_record, end_record, block_bytes):
+            samples = decode_samples(raw, self.sample_bytes)
+            if samples.size:
+                yield samples
+
+    def channel_slice(self, signal_index):
+        """信號在單筆記錄中的樣本切片"""
+        start = int(self.sample_offsets[signal_index])
+        return slice(start, start + int(self.samples_per_record[signal_index]))
+
+    def channel_byte_slice(self, signal_index):
+        """信號在單筆記錄中的位元組切片"""
+        start = int(self.byte_offsets[signal_index])
+        return slice(start, start + int(self.samples_per_record[signal_index]) * self.sample_bytes)
+
+    def channel_sample_count(self, signal_index, start_record, end_record):
+        """[start_record, end_record) 範圍內信號實際可讀到的樣本數（考慮檔案截斷）"""
+        if self.bytes_per_record <= 0 or end_record <= start_record:
+            return 0
+        spr = int(self.samples_per_record[signal_index])
+        begin = self.num_header_bytes + start_record * self.bytes_per_record
+        available = max(0, min((end_record - start_record) * self.bytes_per_record, self.size - begin))
+        full_records, tail_bytes = divmod(available, self.bytes_per_record)
+        tail = min(max(0, tail_bytes // self.sample_bytes - int(self.sample_offsets[signal_index])), spr)
+        return full_records * spr + tail
+
+    def pyramid(self, signal_index):
+        """取得信號的 min/max 金字塔（找到後快取），尚未建立時回傳 None"""
+        pyramid = self._pyramids.get(signal_index)
+        if pyramid is None:
+            total = self.channel_sample_count(signal_index, 0, self.num_data_records)
+            pyramid = load_pyramid(self.path, signal_index, total, self.mtime, self.sample_dtype)
+            if pyramid is not None:
+                self._pyramids[signal_index] = pyramid
+        return pyramid
+
+    def channel_store(self, signal_index):
+        """取得信號的連續數位值（記憶體映射，找到後快取），尚未建立時回傳 None"""
+        samples = self._channel_stores.get(signal_index)
+        if samples is None:
+            total = self.channel_sample_count(signal_index, 0, self.num_data_records)
+            samples = load_channel_store(self.path, signal_index, total, self.mtime, self.sample_dtype)
+            if samples is not None:
+                self._channel_stores[signal_index] = samples
+        return samples
+
+    def close(self):
         try:
-            val = int(f.read(8).decode('latin1').strip())
-        except ValueError:
-            val = 0
-        values.append(val)
-    return values
-
-
-def _read_digital_maxs(f, num_signals, num_header_bytes):
-    """讀取數位最大值"""
-    offset = 256 + num_signals * (16 + 80 + 8 + 8 + 8 + 8)
-    f.seek(offset)
-    values = []
-    for i in range(num_signals):
+            self._mm.close()
+        except BufferError:
+            # 仍有陣列引用映射內容，交由垃圾回收關閉
+            pass
+
+
+def _cached_handle(file_path):
+    stat = os.stat(file_path)
+    with _handle_cache_lock:
+        handle = _handle_cache.get(file_path)
+        if handle is not None and handle.mtime == stat.st_mtime_ns and handle.size == stat.st_size:
+            _handle_cache.move_to_end(file_path)
+            return handle
+    return None
+
+
+def peek_edf_handle(file_path):
+    """
+    已開啟且仍有效的 EDFHandle，不開啟檔案也不讀取資料庫；EDF+D 還需已建立記錄時間索引
+    尚未就緒時回傳 None
+    """
+    handle = _cached_handle(file_path)
+    if handle is None or (handle.discontinuous and handle._record_index is None):
+        return None
+    return handle
+
+
+def get_edf_handle(file_path, header_loader=None):
+    """
+    取得快取的 EDFHandle
+    檔案的 mtime 或大小改變時重新開啟；超過容量時淘汰最久未使用者
+    header_loader 可回傳已保存的 EDFHeader（例如資料庫中的配置），僅在需要開啟檔案時呼叫；
+    回傳 None 時改為讀取檔案標頭
+    """
+    handle = _cached_handle(file_path)
+    if handle is not None:
+        return handle
+
+    with metrics.timed('open'):
+        handle = EDFHandle(file_path, header=header_loader() if header_loader else None)
+
+    with _handle_cache_lock:
+        _handle_cache[file_path] = handle
+        _handle_cache.move_to_end(file_path)
+        while len(_handle_cache) > _HANDLE_CACHE_SIZE:
+            _handle_cache.popitem(last=False)
+    return handle
+
+
+def invalidate_edf_handle(file_path):
+    """從快取移除檔案（例如刪除或覆寫檔案前）"""
+    with _handle_cache_lock:
+        handle = _handle_cache.pop(file_path, None)
+    if handle is not None:
+        handle.close()
+
+
+# gaps：EDF+D 視窗內記錄之間的時間空隙 [(開始時間, 長度), ...]，data 中空隙兩側的樣本直接相接
+SignalWindow = namedtuple('SignalWindow', ['data', 'sampling_rate', 't0', 'sample_interval', 'gaps'],
+                          defaults=((),))
+
+
+def decode_channel(handle, block, signal_index):
+    """從資料記錄區塊切出信號並轉為物理值（float64）"""
+    columns = handle.channel_slice(signal_index)
+    # 檔案尾端不完整的記錄為一維，只取得到的部分
+    raw = block[:, columns] if block.ndim == 2 else block[columns]
+    return raw.astype(np.float64).ravel() * handle.gain[signal_index] + handle.offset[signal_index]
+
+
+def iter_channel_samples(handle, signal_index, start_record, end_record):
+    """逐塊產生信號的物理值（float64），一次只解碼一個區塊；有連續樣本檔時直接切片讀取"""
+    samples = handle.channel_store(signal_index)
+    if samples is not None:
+        spr = int(handle.samples_per_record[signal_index])
+        yield from _iter_stored_samples(handle, signal_index, samples, start_record * spr, end_record * spr)
+        return
+    for block in handle.iter_record_blocks(start_record, end_record):
+        yield decode_channel(handle, block, signal_index)
+
+
+def _iter_stored_samples(handle, signal_index, samples, first, last):
+    """由連續樣本檔逐塊解碼 [first, last) 的樣本（超出檔案長度的部分自動截去）"""
+    step = _READ_BLOCK_BYTES // 8
+    last = min(last, len(samples))
+    for begin in range(first, last, step):
+        raw = samples[begin:min(begin + step, last)]
+        yield raw.astype(np.float64) * handle.gain[signal_index] + handle.offset[signal_index]
+
+
+# 衍生通道（導程）：positive - negative，兩者皆為信號索引
+Derivation = namedtuple('Derivation', ['positive', 'negative'])
+
+
+def _resample(samples, src_per_record, dst_per_record):
+    """以線性內插將區塊內的樣本由每記錄 src 個轉為 dst 個（取樣率不同的信號相減前對齊）"""
+    if src_per_record == dst_per_record:
+        return samples
+    count = len(samples) * dst_per_record // src_per_record
+    positions = np.arange(count) * (src_per_record / dst_per_record)
+    return np.interp(positions, np.arange(len(samples)), samples)
+
+
+def _source_samples_per_record(handle, source):
+    """信號或導程在單筆記錄中的樣本數（導程取兩者中較高的取樣率）"""
+    if isinstance(source, Derivation):
+        return max(int(handle.samples_per_record[source.positive]), int(handle.samples_per_record[source.negative]))
+    return int(handle.samples_per_record[source])
+
+
+def _source_sample_count(handle, source, start_record, end_record):
+    if isinstance(source, Derivation):
+        spr = _source_samples_per_record(handle, source)
+        return min(
+            handle.channel_sample_count(i, start_record, end_record) * spr // int(handle.samples_per_record[i])
+            for i in source
+        )
+    return handle.channel_sample_count(source, start_record, end_record)
+
+
+def _decode_source(handle, block, source):
+    """解碼信號；導程則在同一區塊內解碼兩個信號、對齊取樣率後直接相減"""
+    if not isinstance(source, Derivation):
+        return decode_channel(handle, block, source)
+    spr = _source_samples_per_record(handle, source)
+    positive, negative = (
+        _resample(decode_channel(handle, block, i), int(handle.samples_per_record[i]), spr) for i in source
+    )
+    count = min(len(positive), len(negative))
+    return positive[:count] - negative[:count]
+
+
+def _check_source(handle, source):
+    for signal_index in (source if isinstance(source, Derivation) else (source,)):
+        _check_signal_index(handle, signal_index)
+
+
+def _check_signal_index(handle, signal_index):
+    if signal_index < 0 or signal_index >= handle.num_signals:
+        raise ValueError(f"signal_index {signal_index} out of range [0, {handle.num_signals-1}]")
+
+    if handle.samples_per_record[signal_index] == 0:
+        raise ValueError(f"Signal {signal_index} has no samples")
+
+
+def _read_pyramid(handle, signal_index, start_record, total_samples, decimator):
+    """縮小檢視時由金字塔取得 min/max 包絡；無法使用時回傳 None"""
+    if not isinstance(decimator, MinMaxDecimator):
+        return None
+    pyramid = handle.pyramid(signal_index)
+    if pyramid is None:
+        return None
+    first_sample = start_record * int(handle.samples_per_record[signal_index])
+    result = read_pyramid_window(pyramid, handle.channel_sample_count(signal_index, 0, handle.num_data_records),
+                                 first_sample, total_samples, decimator.bucket_size)
+    if result is None:
+        return None
+    envelope, samples_per_point = result
+    return envelope * handle.gain[signal_index] + handle.offset[signal_index], samples_per_point
+
+
+class _FilteredChannel:
+    """
+    濾波後再下採樣：輸入為含前後邊界記錄的延伸範圍，輸出只保留視窗內的樣本
+    """
+
+    def __init__(self, kernel, at_file_start, skip, count, decimator):
+        self.fir = StreamingFIR(kernel, at_file_start)
+        self.decimator = decimator
+        self.position = self.fir.first_output - skip  # 下一個輸出樣本相對於視窗開頭的位置
+        self.count = count
+
+    def feed(self, samples):
+        self._emit(self.fir.feed(samples))
+
+    def finish(self, at_file_end):
+        self._emit(self.fir.finish(at_file_end))
+
+    def _emit(self, filtered):
+        begin = max(0, -self.position)
+        end = min(len(filtered), self.count - self.position)
+        if end > begin:
+            self.decimator.feed(filtered[begin:end])
+        self.position += len(filtered)
+
+
+class _Stopwatch:
+    """
+    在區塊迴圈內累加各階段耗時，讀取結束時才一次寫入 metrics（迴圈內不加鎖）
+    lap(stage) 將上一個時間點到現在的耗時計入 stage
+    """
+
+    def __init__(self):
+        self.totals = {}
+        self.mark()
+
+    def mark(self):
+        self._last = time.perf_counter()
+
+    def lap(self, stage):
+        now = time.perf_counter()
+        self.totals[stage] = self.totals.get(stage, 0.0) + now - self._last
+        self._last = now
+
+    def flush(self):
+        for stage, seconds in self.totals.items():
+            metrics.record(stage, seconds)
+
+
+def _iter_blocks_from(handle, start_record, end_record):
+    """iter_record_blocks 並附上每個區塊第一筆記錄的編號"""
+    record = start_record
+    for block in handle.iter_record_blocks(start_record, end_record):
+        yield record, block
+        record += block.shape[0] if block.ndim == 2 else 1
+
+
+def read_signal_windows(file_path, signal_indices, start_time=None, end_time=None, max_samples=10000, mode='minmax',
+                        header_loader=None, filters=None):
+    """
+    一次讀取多個信號的同一時間視窗
+    資料記錄只讀取一次，每個區塊同時解碼所有需要的信號（各自的樣本數與下採樣）
+    signal_indices 中也可以是 Derivation：在同一次解碼中相減，之後才濾波與下採樣
+    filters 為 FilterSpec 時先套用 FIR 再下採樣；前後多讀取足夠的相鄰記錄，相鄰視窗的結果可無縫接合
+    回傳與 signal_indices 順序相同的 SignalWindow 列表
+    """
+    handle = get_edf_handle(file_path, header_loader)
+    for source in signal_indices:
+        _check_source(handle, source)
+
+    start_record, end_record = handle.record_range(start_time, end_time)
+    t0 = float(handle.record_time(start_record))
+    gaps = handle.record_gaps(start_record, end_record)
+
+    results = {}
+    decoders = {}
+    kernels = {}
+    watch = _Stopwatch()
+    for source in set(signal_indices):
+        total_samples = _source_sample_count(handle, source, start_record, end_record)
+        decimator, samples_per_point = make_decimator(mode, total_samples, max_samples)
+        sampling_rate = _source_samples_per_record(handle, source) / handle.duration_per_record
+
+        kernel = design_kernel(filters, float(sampling_rate)) if filters else None
+        if kernel is not None:
+            kernels[source] = (kernel, total_samples)
+            decoders[source] = (decimator, samples_per_point)
+            continue
+
+        # 縮小檢視時優先使用金字塔，不必解碼原始資料（導程的包絡無法由金字塔求得）
+        envelope = None
+        if not isinstance(source, Derivation):
+            watch.mark()
+            envelope = _read_pyramid(handle, source, start_record, total_samples, decimator)
+            watch.lap('pyramid')
+        if envelope is not None:
+            results[source] = envelope
+            metrics.inc('edf_pyramid_reads_total')
+        else:
+            decoders[source] = (decimator, samples_per_point)
+
+    # 濾波需要的邊界記錄數（kernel 半長）
+    margin = max((math.ceil((len(kernel) // 2) / _source_samples_per_record(handle, source))
+                  for source, (kernel, _) in kernels.items()), default=0)
+    read_start = max(0, start_record - margin)
+    read_end = min(handle.num_data_records, end_record + margin)
+
+    feeders = {}
+    for source, (decimator, _) in decoders.items():
+        if source in kernels:
+            kernel, total_samples = kernels[source]
+            skip = (start_record - read_start) * _source_samples_per_record(handle, source)
+            feeders[source] = _FilteredChannel(kernel, read_start == 0, skip, total_samples, decimator)
+
+    # 有連續樣本檔的信號直接切片讀取，不必走訪交錯的資料記錄
+    stored = {}
+    for source in decoders:
+        if not isinstance(source, Derivation):
+            samples = handle.channel_store(source)
+            if samples is not None:
+                stored[source] = samples
+
+    if decoders:
+        # 解碼時間包含記憶體映射分頁讀入磁碟的時間
+        bytes_read = 0
+        samples_decoded = 0
+        watch.mark()
         try:
-            val = int(f.read(8).decode('latin1').strip())
-        except ValueError:
-            val = 0
-        values.append(val)
-    return values
+            for source, samples in stored.items():
+                spr = int(handle.samples_per_record[source])
+                if source in feeders:
+                    target, stage, first, last = feeders[source], 'filter', read_start * spr, read_end * spr
+                else:
+                    target, stage, first, last = decoders[source][0], 'downsample', start_record * spr, end_record * spr
+                for chunk in _iter_stored_samples(handle, source, samples, first, last):
+                    watch.lap('decode')
+                    bytes_read += len(chunk) * samples.itemsize
+                    samples_decoded += len(chunk)
+                    target.feed(chunk)
+                    watch.lap(stage)
+            interleaved = [source for source in decoders if source not in stored]
+            blocks = _iter_blocks_from(handle, read_start, read_end) if interleaved else ()
+            for record, block in blocks:
+                bytes_read += block.size * handle.sample_bytes
+                # 未濾波的信號只取視窗內的記錄
+                if block.ndim == 2:
+                    inner = block[max(0, start_record - record):max(0, end_record - record)]
+                else:
+                    inner = block if start_record <= record < end_record else block[:0]
+                for source in interleaved:
+                    if source in feeders:
+                        samples = _decode_source(handle, block, source)
+                        watch.lap('decode')
+                        feeders[source].feed(samples)
+                        watch.lap('filter')
+                    elif inner.size:
+                        samples = _decode_source(handle, inner, source)
+                        watch.lap('decode')
+                        decoders[source][0].feed(samples)
+                        watch.lap('downsample')
+                    else:
+                        continue
+                    samples_decoded += len(samples)
+            for feeder in feeders.values():
+                feeder.finish(read_end >= handle.num_data_records)
+            watch.lap('filter' if feeders else 'downsample')
+        except Exception as e:
+            # 不回傳讀到一半的視窗：呼叫端會把結果長期快取
+            logger.warning(f"Error reading signal data from {file_path}: {e}")
+            metrics.inc('edf_read_errors_total')
+            raise
+
+        for source, (decimator, samples_per_point) in decoders.items():
+            results[source] = (decimator.finish(), samples_per_point)
+        watch.lap('downsample')
+        metrics.inc('edf_bytes_read_total', bytes_read)
+        metrics.inc('edf_samples_decoded_total', samples_decoded)
+    watch.flush()
+
+    windows = []
+    for source in signal_indices:
+        data, samples_per_point = results[source]
+        sampling_rate = float(_source_samples_per_record(handle, source) / handle.duration_per_record)
+        windows.append(SignalWindow(
+            data=data,
+            sampling_rate=sampling_rate,
+            t0=t0,
+            sample_interval=samples_per_point / sampling_rate,
+            gaps=gaps,
+        ))
+    return windows
+
+
+def read_signal_window(file_path, signal_index, start_time=None, end_time=None, max_samples=10000, mode='minmax',
+                       header_loader=None, filters=None):
+    """
+    讀取信號視窗並以串流方式下採樣
+    回傳 SignalWindow：data 為 NumPy 陣列，t0 為第一點的時間（秒），
+    sample_interval 為輸出點之間的平均間隔（秒）
+    """
+    return read_signal_windows(file_path, [signal_index], start_time, end_time, max_samples, mode, header_loader,
+                               filters)[0]
+
+
+def read_signal_data(file_path, signal_index, start_time=None, end_time=None, max_samples=10000, return_rate=False,
+                     mode='minmax'):
+    """
+    讀取 EDF 檔案中的信號數據（優化版本）
+    使用快取的記憶體映射檔案，逐塊解碼並下採樣，記憶體用量不隨時間範圍增長
+    """
+    window = read_signal_window(file_path, signal_index, start_time, end_time, max_samples, mode)
+    all_data = window.data.tolist()
+
+    if return_rate:
+        return all_data, window.sampling_rate
+    return all_data
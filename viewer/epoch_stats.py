@@ -0,0 +1,142 @@
+import math
+import os
+
+import numpy as np
+
+EPOCH_SECONDS = 30.0
+
+# sidecar 陣列第一維的欄位順序
+STAT_FIELDS = ('min', 'max', 'mean', 'rms', 'flat_fraction', 'clip_count')
+
+
+def stats_path(file_path):
+    """每 epoch 統計的 sidecar：(欄位, epoch, 信號) 的 float32 陣列"""
+    return f"{file_path}.stats.npy"
+
+
+def num_epochs(handle, epoch_seconds=EPOCH_SECONDS):
+    return max(1, math.ceil(handle.total_duration / epoch_seconds))
+
+
+class _EpochAccumulator:
+    """
+    串流累積單一信號每個 epoch 的數位值統計
+    每個區塊以 reduceat 一次算出區塊內各 epoch 的部分結果，再併入累積陣列
+    """
+
+    def __init__(self, epochs, samples_per_epoch, digital_min, digital_max):
+        self.samples_per_epoch = samples_per_epoch
+        self.digital_min = digital_min
+        self.digital_max = digital_max
+        self.position = 0
+        self.last = None
+        self.min = np.full(epochs, np.inf)
+        self.max = np.full(epochs, -np.inf)
+        self.sum = np.zeros(epochs)
+        self.sumsq = np.zeros(epochs)
+        self.count = np.zeros(epochs)
+        self.flat = np.zeros(epochs)
+        self.clip = np.zeros(epochs)
+
+    def feed(self, raw):
+        n = len(raw)
+        if not n:
+            return
+        epochs = len(self.count)
+        first = min(int(self.position // self.samples_per_epoch), epochs - 1)
+        last = min(int((self.position + n - 1) // self.samples_per_epoch), epochs - 1)
+
+        # 區塊內每個 epoch 的起點（相對於區塊開頭）
+        bounds = np.ceil(np.arange(first + 1, last + 1) * self.samples_per_epoch).astype(np.int64) - self.position
+        starts = np.concatenate(([0], bounds))
+        span = slice(first, last + 1)
+
+        values = raw.astype(np.float64)
+        previous = np.empty(n, dtype=raw.dtype)
+        previous[1:] = raw[:-1]
+        previous[0] = raw[0] if self.last is None else self.last
+        flat = raw == previous
+        if self.last is None:
+            flat[0] = False
+        clipped = (raw <= self.digital_min) | (raw >= self.digital_max)
+
+        self.min[span] = np.minimum(self.min[span], np.minimum.reduceat(values, starts))
+        self.max[span] = np.maximum(self.max[span], np.maximum.reduceat(values, starts))
+        self.sum[span] += np.add.reduceat(values, starts)
+        self.sumsq[span] += np.add.reduceat(values * values, starts)
+        self.count[span] += np.diff(np.append(starts, n))
+        self.flat[span] += np.add.reduceat(flat, starts)
+        self.clip[span] += np.add.reduceat(clipped, starts)
+
+        self.position += n
+        self.last = raw[-1]
+
+    def finish(self, gain, offset):
+        """轉為物理值的統計（沒有樣本的 epoch 為 NaN），回傳 (欄位, epoch) 陣列"""
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = self.sum / self.count
+            mean_sq = self.sumsq / self.count
+            lo = self.min * gain + offset
+            hi = self.max * gain + offset
+            rms = np.sqrt(np.maximum(0.0, gain * gain * mean_sq + 2 * gain * offset * mean + offset * offset))
+            out = np.stack([
+                np.minimum(lo, hi),
+                np.maximum(lo, hi),
+                mean * gain + offset,
+                rms,
+                self.flat / self.count,
+                self.clip,
+            ])
+        out[:, self.count == 0] = np.nan
+        return out
+
+
+def build_epoch_stats(file_path, epoch_seconds=EPOCH_SECONDS):
+    """
+    單次串流讀取所有資料記錄，計算每個信號每個 epoch 的
+    min、max、mean、RMS、平坦（與前一樣本相同）比例與削峰（等於數位上下限）次數
+    """
+    from .edf_reader import get_edf_handle
+
+    handle = get_edf_handle(file_path)
+    epochs = num_epochs(handle, epoch_seconds)
+
+    accumulators = {}
+    for i in range(handle.num_signals):
+        if handle.samples_per_record[i] == 0:
+            continue
+        accumulators[i] = _EpochAccumulator(
+            epochs,
+            epoch_seconds * handle.sampling_rate(i),
+            handle.digital_min[i],
+            handle.digital_max[i],
+        )
+
+    for block in handle.iter_record_blocks(0, handle.num_data_records):
+        for i, accumulator in accumulators.items():
+            columns = handle.channel_slice(i)
+            accumulator.feed((block[:, columns] if block.ndim == 2 else block[columns]).ravel())
+
+    stats = np.full((len(STAT_FIELDS), epochs, handle.num_signals), np.nan, dtype=np.float32)
+    for i, accumulator in accumulators.items():
+        stats[:, :, i] = accumulator.finish(handle.gain[i], handle.offset[i])
+
+    tmp_path = stats_path(file_path) + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        np.save(f, stats)
+    os.replace(tmp_path, stats_path(file_path))
+    return stats
+
+
+def load_epoch_stats(file_path, source_mtime):
+    """以記憶體映射載入統計 sidecar；不存在或過期時回傳 None"""
+    path = stats_path(file_path)
+    try:
+        if os.stat(path).st_mtime_ns < source_mtime:
+            return None
+        stats = np.load(path, mmap_mode='r')
+    except (OSError, ValueError):
+        return None
+    if stats.ndim != 3 or stats.shape[0] != len(STAT_FIELDS):
+        return None
+    return stats
@@ -0,0 +1,149 @@
+import struct
+
+import numpy as np
+
+from .edf_reader import _check_signal_index, decode_channel, get_edf_handle
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'f32': 'application/octet-stream',
+    'npy': 'application/octet-stream',
+}
+
+# 匯出時每次解碼的資料量（bytes），決定串流時的記憶體上限
+_EXPORT_BLOCK_BYTES = 1024 * 1024
+
+
+def _npy_header(shape):
+    """NumPy .npy 1.0 格式的檔頭（little-endian float32、C order）"""
+    text = "{'descr': '<f4', 'fortran_order': False, 'shape': %r, }" % (shape,)
+    # 檔頭總長度需為 64 的倍數，並以換行結尾
+    padding = 64 - (10 + len(text) + 1) % 64
+    text = text + ' ' * (padding % 64) + '\n'
+    return b'\x93NUMPY\x01\x00' + struct.pack('<H', len(text)) + text.encode('latin1')
+
+
+class SignalExport:
+    """
+    以原始解析度匯出一個或多個信號的時間範圍
+    多個信號時需有相同的取樣率，輸出為逐樣本的列（time, ch1, ch2…）；
+    資料逐塊解碼產生，記憶體用量與範圍長度無關
+    """
+
+    def __init__(self, file_path, signal_indices, start_time=None, end_time=None, fmt='f32', labels=None,
+                 header_loader=None):
+        if fmt not in EXPORT_FORMATS:
+            raise ValueError(f"unknown export format: {fmt}")
+        if not signal_indices:
+            raise ValueError("no signals to export")
+
+        self.handle = handle = get_edf_handle(file_path, header_loader)
+        for signal_index in signal_indices:
+            _check_signal_index(handle, signal_index)
+        rates = {int(handle.samples_per_record[i]) for i in signal_indices}
+        if len(rates) > 1:
+            raise ValueError("signals with different sampling rates cannot be exported together")
+
+        self.signal_indices = list(signal_indices)
+        self.fmt = fmt
+        self.labels = list(labels) if labels is not None else [handle.labels[i] for i in signal_indices]
+        self.samples_per_record = rates.pop()
+        self.sampling_rate = float(handle.sampling_rate(signal_indices[0]))
+        self.start_record, self.end_record = handle.record_range(start_time, end_time)
+        self.t0 = float(handle.record_time(self.start_record))
+        self.num_samples = min(handle.channel_sample_count(i, self.start_record, self.end_record)
+                               for i in self.signal_indices)
+
+    @property
+    def content_type(self):
+        return EXPORT_FORMATS[self.fmt]
+
+    @property
+    def shape(self):
+        if len(self.signal_indices) == 1:
+            return (self.num_samples,)
+        return (self.num_samples, len(self.signal_indices))
+
+    @property
+    def frame_bytes(self):
+        return 4 * len(self.signal_indices)
+
+    @property
+    def preamble(self):
+        if self.fmt == 'npy':
+            return _npy_header(self.shape)
+        if self.fmt == 'csv':
+            return (','.join(['time'] + [label.replace(',', ' ') for label in self.labels]) + '\n').encode('utf-8')
+        return b''
+
+    @property
+    def content_length(self):
+        """二進位格式的總長度；CSV 每列長度不固定，回傳 None"""
+        if self.fmt == 'csv':
+            return None
+        return len(self.preamble) + self.num_samples * self.frame_bytes
+
+    def _iter_frames(self, first_sample=0):
+        """從第 first_sample 個樣本開始，逐塊產生 (樣本編號, (樣本數, 信號數) float64 陣列)"""
+        handle = self.handle
+        spr = self.samples_per_record
+        records_per_block = max(1, _EXPORT_BLOCK_BYTES // max(1, handle.bytes_per_record))
+        record = self.start_record + first_sample // spr
+        skip = first_sample % spr
+        sample = first_sample - skip
+
+        for block in handle.iter_record_blocks(record, self.end_record,
+                                               block_bytes=records_per_block * handle.bytes_per_record):
+            columns = [decode_channel(handle, block, i) for i in self.signal_indices]
+            count = min(min(len(c) for c in columns), self.num_samples - sample)
+            if count <= 0:
+                return
+            frames = np.empty((count, len(columns)))
+            for j, column in enumerate(columns):
+                frames[:, j] = column[:count]
+            if skip:
+                frames = frames[skip:]
+                sample += skip
+                skip = 0
+            if len(frames):
+                yield sample, frames
+            sample += len(frames)
+
+    def _encode(self, sample, frames):
+        if self.fmt == 'csv':
+            # 依各樣本所在記錄的開始時間計算（EDF+D 的空隙反映在時間欄）
+            positions = sample + np.arange(len(frames))
+            records = self.start_record + positions // self.samples_per_record
+            times = self.handle.record_time(records) + (positions % self.samples_per_record) / self.sampling_rate
+            row = ','.join(['%.6f'] + ['%.6g'] * frames.shape[1]) + '\n'
+            values = np.column_stack((times, frames)).ravel().tolist()
+            return ((row * len(frames)) % tuple(values)).encode('ascii')
+        return frames.astype('<f4').tobytes()
+
+    def iter_bytes(self, first_byte=0, last_byte=None):
+        """
+        產生輸出內容；二進位格式可指定位元組範圍 [first_byte, last_byte]（供 HTTP Range 使用）
+        只解碼範圍內的資料記錄
+        """
+        preamble = self.preamble
+        if last_byte is None:
+            last_byte = float('inf')
+
+        if first_byte < len(preamble):
+            yield preamble[first_byte:min(len(preamble), last_byte + 1)]
+        position = len(preamble)
+
+        first_sample = 0
+        if self.fmt != 'csv':
+            first_sample = max(0, first_byte - position) // self.frame_bytes
+            position += first_sample * self.frame_bytes
+
+        for sample, frames in self._iter_frames(first_sample):
+            if position > last_byte:
+                return
+            chunk = self._encode(sample, frames)
+            begin = max(0, first_byte - position)
+            end = min(len(chunk), last_byte + 1 - position)
+            if end > begin:
+                yield chunk[begin:end]
+            position += len(chunk)
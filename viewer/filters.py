@@ -0,0 +1,136 @@
+import math
+from collections import namedtuple
+from functools import lru_cache
+
+import numpy as np
+
+# 高通 / 低通截止頻率與市電陷波頻率（Hz），None 表示不使用
+FilterSpec = namedtuple('FilterSpec', ['hp', 'lp', 'notch'])
+
+# 陷波的半頻寬（Hz）
+NOTCH_HALF_WIDTH = 1.0
+
+# 濾波器長度上限（秒），避免極低的高通截止頻率產生過長的 kernel
+MAX_KERNEL_SECONDS = 30.0
+
+
+def parse_filter_spec(hp=None, lp=None, notch=None):
+    """
+    由查詢參數建立 FilterSpec；都未指定時回傳 None
+    數值不合法時拋出 ValueError
+    """
+    values = {}
+    for name, raw in (('hp', hp), ('lp', lp), ('notch', notch)):
+        if raw in (None, ''):
+            values[name] = None
+            continue
+        value = float(raw)
+        if not value > 0 or math.isinf(value):
+            raise ValueError(f"{name} must be a positive frequency: {raw}")
+        values[name] = value
+    spec = FilterSpec(**values)
+    if spec.hp is not None and spec.lp is not None and spec.hp >= spec.lp:
+        raise ValueError(f"hp ({spec.hp}) must be below lp ({spec.lp})")
+    if not any(v is not None for v in spec):
+        return None
+    return spec
+
+
+def filter_key(spec):
+    """快取鍵使用的文字表示"""
+    if spec is None:
+        return ''
+    return ','.join(f"{name}={value!r}" for name, value in zip(spec._fields, spec) if value is not None)
+
+
+def _lowpass(cutoff, sampling_rate, taps):
+    n = np.arange(taps) - (taps - 1) / 2
+    h = np.sinc(2 * cutoff / sampling_rate * n) * np.hamming(taps)
+    return h / h.sum()
+
+
+def _delta(taps):
+    h = np.zeros(taps)
+    h[taps // 2] = 1.0
+    return h
+
+
+def _taps_for(transition, sampling_rate):
+    """Hamming 窗 FIR 所需的長度（奇數）"""
+    taps = int(math.ceil(3.3 * sampling_rate / transition))
+    taps = min(taps, int(MAX_KERNEL_SECONDS * sampling_rate))
+    return max(3, taps | 1)
+
+
+@lru_cache(maxsize=64)
+def design_kernel(spec, sampling_rate):
+    """
+    設計線性相位 FIR（視窗化 sinc）：高通、低通、陷波各自設計後卷積成單一 kernel
+    截止頻率達到 Nyquist 的部分略過（例如低取樣率的呼吸信號）；沒有可套用的濾波時回傳 None
+    """
+    nyquist = sampling_rate / 2
+    kernels = []
+    if spec.hp is not None and spec.hp < nyquist:
+        taps = _taps_for(spec.hp, sampling_rate)
+        kernels.append(_delta(taps) - _lowpass(spec.hp, sampling_rate, taps))
+    if spec.lp is not None and spec.lp < nyquist:
+        taps = _taps_for(min(max(spec.lp * 0.2, 1.0), nyquist - spec.lp), sampling_rate)
+        kernels.append(_lowpass(spec.lp, sampling_rate, taps))
+    if spec.notch is not None and spec.notch + NOTCH_HALF_WIDTH < nyquist and spec.notch > NOTCH_HALF_WIDTH:
+        taps = _taps_for(NOTCH_HALF_WIDTH, sampling_rate)
+        band = (_lowpass(spec.notch + NOTCH_HALF_WIDTH, sampling_rate, taps)
+                - _lowpass(spec.notch - NOTCH_HALF_WIDTH, sampling_rate, taps))
+        kernels.append(_delta(taps) - band)
+    if not kernels:
+        return None
+
+    kernel = kernels[0]
+    for other in kernels[1:]:
+        kernel = np.convolve(kernel, other)
+    kernel.setflags(write=False)
+    return kernel
+
+
+class StreamingFIR:
+    """
+    以 FFT 分段卷積逐塊套用零相位（置中）的 FIR
+    輸出第 k 個樣本對應輸入第 k 個樣本；串流從檔案開頭開始或在檔案結尾結束時，
+    以端點值延伸補齊，其餘邊界由呼叫端多讀取的相鄰記錄提供
+    """
+
+    def __init__(self, kernel, at_file_start):
+        self.kernel = kernel
+        self.half = len(kernel) // 2
+        self.at_file_start = at_file_start
+        self._history = None
+        self._last = 0.0
+        # 第一個輸出樣本對應的輸入位置（相對於串流開頭）
+        self.first_output = 0 if at_file_start else self.half
+
+    def feed(self, samples):
+        if not len(samples):
+            return samples
+        if self._history is None:
+            self._history = np.full(self.half, samples[0]) if self.at_file_start else np.empty(0)
+        self._last = samples[-1]
+        buf = np.concatenate((self._history, samples))
+        count = len(buf) - (len(self.kernel) - 1)
+        if count <= 0:
+            self._history = buf
+            return np.empty(0)
+        self._history = buf[count:]
+        return _convolve_valid(buf, self.kernel)
+
+    def finish(self, at_file_end):
+        """檔案結尾時以最後一個值補齊剩下的輸出"""
+        if not at_file_end or self._history is None:
+            return np.empty(0)
+        return self.feed(np.full(self.half, self._last))
+
+
+def _convolve_valid(x, kernel):
+    """FFT 卷積，只保留完整重疊的部分（長度 len(x) - len(kernel) + 1）"""
+    n = len(x) + len(kernel) - 1
+    nfft = 1 << (n - 1).bit_length()
+    y = np.fft.irfft(np.fft.rfft(x, nfft) * np.fft.rfft(kernel, nfft), nfft)
+    return y[len(kernel) - 1:len(x)]
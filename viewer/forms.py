@@ -12,10 +12,10 @@ class EDFUploadForm(forms.ModelForm):
             }),
             'file': forms.FileInput(attrs={
                 'class': 'form-control',
-                'accept': '.edf'
+                'accept': '.edf,.bdf'
             }),
             'hypnogram_file': forms.FileInput(attrs={  # 新增
                 'class': 'form-control',
-                'accept': '.edf'
+                'accept': '.edf,.bdf'
             }),
         }
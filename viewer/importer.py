@@ -0,0 +1,185 @@
+import hashlib
+import os
+import re
+import shutil
+
+from .edf_header import read_edf_header
+
+_HASH_CHUNK_BYTES = 8 * 1024 * 1024
+
+# 檔名中代表 PSG / Hypnogram 的字樣（例如 SC4001E0-PSG.edf、SC4001EC-Hypnogram.edf）
+_ROLE_PATTERN = re.compile(r'[-_ ]?(psg|hypnogram)$', re.IGNORECASE)
+
+# Sleep-EDF 的錄製編號（去掉最後一個字元）：SC4001E0 與 SC4001EC 同屬 SC4001E
+_SLEEP_EDF_PREFIX = re.compile(r'^s[ct]\d{4}[a-z0-9]$')
+
+
+def file_sha256(path):
+    """以固定大小區塊串流計算檔案的 SHA-256"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(_HASH_CHUNK_BYTES), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _is_hypnogram(path):
+    return 'hypnogram' in os.path.basename(path).lower()
+
+
+def _match_key(path):
+    stem = os.path.splitext(os.path.basename(path))[0]
+    return _ROLE_PATTERN.sub('', stem).lower()
+
+
+def discover_edf_files(root):
+    """
+    在目錄下尋找 EDF 檔案並配對 Hypnogram
+    回傳 [(edf_path, hypnogram_path or None), ...]
+    配對規則：去掉 -PSG / -Hypnogram 後檔名相同；Sleep-EDF 命名（SC4001E0 / SC4001EC）允許最後一個字元不同
+    每個 Hypnogram 只配對一次，完全相同的檔名優先
+    """
+    edf_paths = []
+    hypnogram_paths = []
+    for dirpath, _, filenames in os.walk(root):
+        for name in sorted(filenames):
+            if not name.lower().endswith(('.edf', '.bdf')):
+                continue
+            path = os.path.join(dirpath, name)
+            (hypnogram_paths if _is_hypnogram(path) else edf_paths).append(path)
+
+    by_key = {}
+    by_prefix = {}
+    for path in sorted(hypnogram_paths):
+        key = (os.path.dirname(path), _match_key(path))
+        by_key.setdefault(key, path)
+        if _SLEEP_EDF_PREFIX.match(key[1][:-1]):
+            by_prefix.setdefault((key[0], key[1][:-1]), []).append(path)
+
+    edf_paths.sort()
+    pairs = {}
+    for path in edf_paths:
+        hypnogram = by_key.get((os.path.dirname(path), _match_key(path)))
+        if hypnogram is not None:
+            pairs[path] = hypnogram
+    used = set(pairs.values())
+    for path in edf_paths:
+        if path in pairs:
+            continue
+        key = _match_key(path)
+        candidates = by_prefix.get((os.path.dirname(path), key[:-1]), []) if _SLEEP_EDF_PREFIX.match(key[:-1]) else []
+        hypnogram = next((h for h in candidates if h not in used), None)
+        if hypnogram is not None:
+            used.add(hypnogram)
+        pairs[path] = hypnogram
+    return [(path, pairs[path]) for path in edf_paths]
+
+
+def _copy_into_media(src, media_root, subdir, content_hash, link):
+    """
+    以內容雜湊命名放入媒體目錄（同內容只存一份），回傳相對於 MEDIA_ROOT 的名稱
+    link 為 True 時建立符號連結而不複製
+    """
+    name = f"{subdir}/{content_hash[:16]}_{os.path.basename(src)}"
+    dest = os.path.join(media_root, name)
+    os.makedirs(os.path.dirname(dest), exist_ok=True)
+    if not os.path.exists(dest):
+        tmp = dest + '.tmp'
+        if link:
+            os.symlink(os.path.abspath(src), tmp)
+        else:
+            shutil.copyfile(src, tmp)
+        os.replace(tmp, dest)
+    return name
+
+
+# worker 行程共用的設定（由 init_worker 設定，避免每個工作重複傳送已匯入的雜湊集合）
+_worker_options = {}
+
+
+def init_worker(media_root, known_hashes, link=False, build_derived=True, channel_store=False):
+    _worker_options.update(
+        media_root=media_root, known_hashes=frozenset(known_hashes), link=link, build_derived=build_derived,
+        channel_store=channel_store)
+
+
+def inspect_edf(edf_path, hypnogram_path):
+    """
+    在 worker 行程中執行：計算雜湊、解析標頭與睡眠週期註記、放入媒體目錄並建立金字塔與 epoch 統計
+    不使用資料庫；回傳可 pickle 的結果 dict，失敗時帶 error 欄位
+    """
+    media_root = _worker_options['media_root']
+    link = _worker_options['link']
+    result = {'path': edf_path, 'hypnogram': hypnogram_path, 'bytes': 0}
+    try:
+        result['bytes'] = os.path.getsize(edf_path)
+        content_hash = file_sha256(edf_path)
+        result['hash'] = content_hash
+        if content_hash in _worker_options['known_hashes']:
+            result['skipped'] = True
+            return result
+
+        with open(edf_path, 'rb') as f:
+            result['header'] = read_edf_header(f, strict=True)
+        from .edf_parser import recording_duration
+        result['duration'] = recording_duration(edf_path, result['header'])
+
+        result['file_name'] = _copy_into_media(edf_path, media_root, 'edf_files', content_hash, link)
+        if hypnogram_path:
+            result['hypnogram_name'] = _copy_into_media(
+                hypnogram_path, media_root, 'edf_hypnogram', file_sha256(hypnogram_path), link)
+            from .edf_annotations import load_annotations
+            try:
+                result['annotations'] = load_annotations(hypnogram_path)
+            except (ValueError, ImportError) as e:
+                result['warning'] = f"hypnogram not parsed: {e}"
+
+        if _worker_options['build_derived']:
+            from .epoch_stats import build_epoch_stats
+            from .pyramid import build_pyramid
+            if _worker_options.get('channel_store'):
+                from .channel_store import build_channel_store
+                build_channel_store(os.path.join(media_root, result['file_name']))
+            build_pyramid(os.path.join(media_root, result['file_name']))
+            build_epoch_stats(os.path.join(media_root, result['file_name']))
+    except Exception as e:
+        result['error'] = f"{type(e).__name__}: {e}"
+    return result
+
+
+def commit_batch(results):
+    """
+    將一批 inspect_edf 的結果寫入資料庫（單一交易，每個檔案各自的 savepoint）
+    回傳 [(result, error or None), ...]；同一次匯入中內容重複的檔案標記為 skipped
+    """
+    from django.db import transaction
+    from django.utils import timezone
+    from .edf_parser import build_annotation_rows, build_edf_rows
+    from .models import Annotation, EDFFile, Signal
+
+    outcomes = []
+    with transaction.atomic():
+        for result in results:
+            if EDFFile.objects.filter(content_hash=result['hash']).exists():
+                result['skipped'] = True
+                outcomes.append((result, None))
+                continue
+            try:
+                with transaction.atomic():
+                    edf_file = EDFFile(
+                        title=os.path.splitext(os.path.basename(result['path']))[0],
+                        content_hash=result['hash'],
+                    )
+                    edf_file.file.name = result['file_name']
+                    if result.get('hypnogram_name'):
+                        edf_file.hypnogram_file.name = result['hypnogram_name']
+                    if 'annotations' in result:
+                        edf_file.hypnogram_parsed_at = timezone.now()
+                    signals = build_edf_rows(edf_file, result['header'], result.get('duration'))
+                    edf_file.save()
+                    Signal.objects.bulk_create(signals)
+                    Annotation.objects.bulk_create(build_annotation_rows(edf_file, result.get('annotations', [])))
+                outcomes.append((result, None))
+            except Exception as e:
+                outcomes.append((result, f"{type(e).__name__}: {e}"))
+    return outcomes
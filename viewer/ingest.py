@@ -0,0 +1,222 @@
+import logging
+import os
+import socket
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .channel_store import build_channel_store
+from .edf_parser import parse_edf_file, parse_hypnogram_file
+from .epoch_stats import build_epoch_stats
+from .importer import file_sha256
+from .models import EDFFile, IngestJob
+from .pyramid import build_pyramid
+
+logger = logging.getLogger(__name__)
+
+
+def _hash_stage(edf_file):
+    # 分段上傳在接收時已累進計算
+    if edf_file.content_hash:
+        return
+    edf_file.content_hash = file_sha256(edf_file.file.path)
+    EDFFile.objects.filter(pk=edf_file.pk).update(content_hash=edf_file.content_hash)
+
+
+def _parse_stage(edf_file):
+    # 重試時先清除上次留下的信號，確保解析結果完整
+    edf_file.signals.all().delete()
+    parse_edf_file(edf_file)
+
+
+def _annotation_stage(edf_file):
+    # 睡眠週期檔有誤不影響信號檢視；hypnogram 端點會再嘗試並回報錯誤
+    try:
+        parse_hypnogram_file(edf_file)
+    except (ValueError, ImportError, OSError) as e:
+        logger.warning(f"Hypnogram of EDF {edf_file.pk} not parsed: {e}")
+
+
+def _channel_stage(edf_file):
+    # 選用：額外佔用與原檔相同的磁碟空間，換取單一信號讀取不必走訪交錯的資料記錄
+    if getattr(settings, 'EDF_CHANNEL_STORE', False):
+        build_channel_store(edf_file.file.path)
+
+
+def _pyramid_stage(edf_file):
+    build_pyramid(edf_file.file.path)
+
+
+def _stats_stage(edf_file):
+    build_epoch_stats(edf_file.file.path)
+
+
+# 依序執行的處理階段：(名稱, 函式, 是否包在資料庫交易內)
+INGEST_STAGES = [
+    ('hash', _hash_stage, False),
+    ('parse', _parse_stage, True),
+    ('annotations', _annotation_stage, True),
+    ('channels', _channel_stage, False),
+    ('pyramid', _pyramid_stage, False),
+    ('stats', _stats_stage, False),
+]
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            return _executor
+        _executor = ThreadPoolExecutor(
+            max_workers=getattr(settings, 'EDF_INGEST_WORKERS', 2),
+            thread_name_prefix='edf-ingest',
+        )
+    # 伺服器重新啟動時仍在佇列中（或卡在 running）的工作不會再被提交，建立執行緒池時一併接手
+    # 多個行程同時接手也只有一個能搶下工作（見 _claim）
+    requeue_stale_jobs()
+    for job_id in next_queued_job_ids(None):
+        _executor.submit(_run_in_thread, job_id)
+    return _executor
+
+
+def _worker_name():
+    return f"{socket.gethostname()}:{os.getpid()}:{threading.current_thread().name}"
+
+
+def enqueue_ingest(edf_file):
+    """
+    為已存到磁碟的 EDF 檔案建立處理工作
+    EDF_INGEST_IN_PROCESS 為 True 時交給伺服器內的執行緒池，否則等待 run_ingest_workers 處理
+    """
+    job = IngestJob.objects.create(edf_file=edf_file)
+    if getattr(settings, 'EDF_INGEST_IN_PROCESS', True):
+        # 等交易提交後再交給執行緒，避免讀不到剛建立的工作
+        transaction.on_commit(lambda: _get_executor().submit(_run_in_thread, job.pk))
+    return job
+
+
+def _run_in_thread(job_id):
+    close_old_connections()
+    try:
+        run_job(job_id)
+    finally:
+        close_old_connections()
+
+
+def _claim(job_id):
+    """以條件式更新搶下工作，避免多個 worker 重複執行"""
+    now = timezone.now()
+    claimed = IngestJob.objects.filter(pk=job_id, status=IngestJob.QUEUED).update(
+        status=IngestJob.RUNNING,
+        started_at=now,
+        heartbeat_at=now,
+        finished_at=None,
+        worker=_worker_name(),
+        error='',
+    )
+    return claimed == 1
+
+
+class _Heartbeat:
+    """
+    工作執行期間在背景執行緒定期更新 heartbeat_at（單一階段可能比 EDF_INGEST_STALE_SECONDS 還久）
+    worker 當機時停止更新，工作才會被視為卡住
+    """
+
+    def __init__(self, job_id):
+        self.job_id = job_id
+        self.interval = getattr(settings, 'EDF_INGEST_HEARTBEAT_SECONDS', 30)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f'edf-ingest-heartbeat-{job_id}', daemon=True)
+
+    def beat(self):
+        IngestJob.objects.filter(pk=self.job_id, status=IngestJob.RUNNING).update(heartbeat_at=timezone.now())
+
+    def _run(self):
+        try:
+            while not self._stop.wait(self.interval):
+                self.beat()
+        finally:
+            close_old_connections()
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+
+
+def run_job(job_id):
+    """執行單一工作；失敗時記錄錯誤並保留 EDF 檔案，可再重試"""
+    if not _claim(job_id):
+        return None
+
+    job = IngestJob.objects.select_related('edf_file').get(pk=job_id)
+    IngestJob.objects.filter(pk=job_id).update(attempts=job.attempts + 1)
+
+    try:
+        with _Heartbeat(job_id) as heartbeat:
+            for name, stage, atomic in INGEST_STAGES:
+                logger.info(f"Ingest job {job_id}: {name}")
+                heartbeat.beat()
+                if atomic:
+                    with transaction.atomic():
+                        stage(job.edf_file)
+                else:
+                    stage(job.edf_file)
+    except Exception as e:
+        logger.error(f"Ingest job {job_id} failed: {e}")
+        IngestJob.objects.filter(pk=job_id).update(
+            status=IngestJob.FAILED,
+            error=f"{type(e).__name__}: {e}\n{traceback.format_exc()}",
+            finished_at=timezone.now(),
+        )
+        return IngestJob.FAILED
+
+    IngestJob.objects.filter(pk=job_id).update(status=IngestJob.DONE, finished_at=timezone.now())
+    return IngestJob.DONE
+
+
+def _stale_running(older_than=None):
+    """停在 running 且超過時限沒有 heartbeat（worker 當機）的工作"""
+    if older_than is None:
+        older_than = timedelta(seconds=getattr(settings, 'EDF_INGEST_STALE_SECONDS', 300))
+    cutoff = timezone.now() - older_than
+    # 沒有 heartbeat 的舊紀錄以開始時間判斷
+    return Q(status=IngestJob.RUNNING) & (
+        Q(heartbeat_at__lt=cutoff) | Q(heartbeat_at__isnull=True, started_at__lt=cutoff))
+
+
+def retry_job(job_id):
+    """將失敗（或卡住超過時限）的工作重新排入佇列；仍在執行中的工作不受影響"""
+    updated = IngestJob.objects.filter(
+        Q(status=IngestJob.FAILED) | _stale_running(), pk=job_id
+    ).update(status=IngestJob.QUEUED)
+    if updated and getattr(settings, 'EDF_INGEST_IN_PROCESS', True):
+        _get_executor().submit(_run_in_thread, job_id)
+    return bool(updated)
+
+
+def requeue_stale_jobs(older_than=None):
+    """
+    worker 當機時工作會停在 running；heartbeat 中斷超過時限者重新排入佇列
+    回傳重新排入的數量
+    """
+    return IngestJob.objects.filter(_stale_running(older_than)).update(status=IngestJob.QUEUED)
+
+
+def next_queued_job_ids(limit):
+    return list(
+        IngestJob.objects.filter(status=IngestJob.QUEUED).order_by('created_at').values_list('pk', flat=True)[:limit]
+    )
@@ -0,0 +1,89 @@
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from viewer.importer import commit_batch, discover_edf_files, init_worker, inspect_edf
+from viewer.models import EDFFile
+
+
+class Command(BaseCommand):
+    help = '批次匯入目錄中的 EDF（與對應的 Hypnogram）檔案'
+
+    def add_arguments(self, parser):
+        parser.add_argument('directory')
+        parser.add_argument('--workers', type=int, default=4, help='解析檔案的行程數')
+        parser.add_argument('--batch-size', type=int, default=50, help='每個資料庫交易寫入的檔案數')
+        parser.add_argument('--link', action='store_true', help='以符號連結放入媒體目錄而不複製')
+        parser.add_argument('--no-derived', action='store_true', help='不建立金字塔等衍生資料')
+        parser.add_argument('--channel-store', action='store_true',
+                            default=getattr(settings, 'EDF_CHANNEL_STORE', False),
+                            help='另存每個信號連續的 int16 檔（預設依 EDF_CHANNEL_STORE）')
+
+    def handle(self, *args, **options):
+        pairs = discover_edf_files(options['directory'])
+        if not pairs:
+            raise CommandError(f"No EDF files found in {options['directory']}")
+
+        known_hashes = set(EDFFile.objects.exclude(content_hash='').values_list('content_hash', flat=True))
+        total = len(pairs)
+        self.stdout.write(f"Found {total} EDF file(s), {sum(1 for _, h in pairs if h)} with hypnogram")
+
+        counts = {'imported': 0, 'skipped': 0, 'failed': 0}
+        processed_bytes = 0
+        done = 0
+        pending = []
+        started = time.perf_counter()
+
+        def report(result, status):
+            elapsed = time.perf_counter() - started
+            rate = processed_bytes / elapsed / 1e6 if elapsed else 0.0
+            self.stdout.write(f"[{done}/{total}] {status:<8} {result['path']}  ({done / elapsed:.1f} files/s, {rate:.1f} MB/s)")
+
+        def flush():
+            for result, error in commit_batch(pending):
+                if result.get('skipped'):
+                    counts['skipped'] += 1
+                    report(result, 'skipped')
+                elif error:
+                    counts['failed'] += 1
+                    report(result, 'failed')
+                    self.stderr.write(f"  {error}")
+                else:
+                    counts['imported'] += 1
+                    report(result, 'imported')
+            pending.clear()
+
+        with ProcessPoolExecutor(
+            max_workers=max(1, options['workers']),
+            initializer=init_worker,
+            initargs=(str(settings.MEDIA_ROOT), known_hashes, options['link'], not options['no_derived'],
+                      options['channel_store']),
+        ) as executor:
+            futures = [executor.submit(inspect_edf, edf_path, hypnogram) for edf_path, hypnogram in pairs]
+            for future in as_completed(futures):
+                result = future.result()
+                done += 1
+                processed_bytes += result['bytes']
+                if result.get('error'):
+                    counts['failed'] += 1
+                    report(result, 'failed')
+                    self.stderr.write(f"  {result['error']}")
+                elif result.get('skipped'):
+                    counts['skipped'] += 1
+                    report(result, 'skipped')
+                else:
+                    if result.get('warning'):
+                        self.stderr.write(f"  {result['path']}: {result['warning']}")
+                    pending.append(result)
+                    if len(pending) >= options['batch_size']:
+                        flush()
+            if pending:
+                flush()
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {counts['imported']}, skipped {counts['skipped']}, failed {counts['failed']} "
+            f"in {elapsed:.1f}s ({processed_bytes / elapsed / 1e6 if elapsed else 0:.1f} MB/s)"
+        ))
@@ -0,0 +1,48 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from viewer.ingest import next_queued_job_ids, requeue_stale_jobs, run_job
+
+
+def _run(job_id):
+    close_old_connections()
+    try:
+        return run_job(job_id)
+    finally:
+        close_old_connections()
+
+
+class Command(BaseCommand):
+    help = '處理佇列中的 EDF 上傳工作（搭配 EDF_INGEST_IN_PROCESS = False）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=2, help='同時處理的工作數')
+        parser.add_argument('--poll-interval', type=float, default=2.0, help='佇列為空時的等待秒數')
+        parser.add_argument('--once', action='store_true', help='處理完目前佇列後結束')
+
+    def handle(self, *args, **options):
+        workers = max(1, options['workers'])
+        self.stdout.write(f"Ingest workers started ({workers} threads)")
+
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='edf-ingest') as executor:
+            while True:
+                requeued = requeue_stale_jobs()
+                if requeued:
+                    self.stdout.write(f"Requeued {requeued} stale job(s)")
+
+                job_ids = next_queued_job_ids(workers)
+                if not job_ids:
+                    if options['once']:
+                        break
+                    time.sleep(options['poll_interval'])
+                    continue
+
+                futures = {executor.submit(_run, job_id): job_id for job_id in job_ids}
+                wait(futures)
+                for future, job_id in futures.items():
+                    status = future.result()
+                    if status is not None:
+                        self.stdout.write(f"Job {job_id}: {status}")
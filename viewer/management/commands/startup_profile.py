@@ -0,0 +1,112 @@
+import json
+import os
+import subprocess
+import sys
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# 啟動時不應載入的大型套件（應在第一次使用時才載入）
+HEAVY_PACKAGES = ('numpy', 'mne', 'scipy', 'matplotlib', 'pandas')
+
+# 在全新的直譯器中執行：載入 WSGI / ASGI 應用程式與 URLconf（等同 worker 收到第一個請求前的狀態）
+_PROBE = '''
+import importlib, json, sys, time
+
+def rss_kb():
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+base = rss_kb()
+started = time.perf_counter()
+importlib.import_module(sys.argv[1])
+from django.urls import get_resolver
+get_resolver().url_patterns
+elapsed = time.perf_counter() - started
+print(json.dumps({
+    'seconds': elapsed,
+    'rss_kb': rss_kb(),
+    'base_rss_kb': base,
+    'modules': len(sys.modules),
+    'loaded': sorted({name.split('.')[0] for name in sys.modules}),
+}))
+'''
+
+
+def _run_probe(module, importtime=False):
+    cmd = [sys.executable]
+    if importtime:
+        cmd += ['-X', 'importtime']
+    cmd += ['-c', _PROBE, module]
+    env = dict(os.environ, DJANGO_SETTINGS_MODULE=os.environ.get('DJANGO_SETTINGS_MODULE', 'edf_viewer.settings'))
+    proc = subprocess.run(cmd, cwd=str(settings.BASE_DIR), env=env, capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise CommandError(f"Importing {module} failed:\n{proc.stderr[-2000:]}")
+    return json.loads(proc.stdout.strip().splitlines()[-1]), proc.stderr
+
+
+def _import_times_by_package(stderr):
+    """彙總 -X importtime 輸出：每個頂層套件的 self 時間（秒）"""
+    totals = defaultdict(float)
+    for line in stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        parts = line[len('import time:'):].split('|')
+        if len(parts) != 3 or not parts[0].strip().isdigit():
+            continue
+        totals[parts[2].strip().split('.')[0]] += int(parts[0]) / 1e6
+    return sorted(totals.items(), key=lambda item: item[1], reverse=True)
+
+
+class Command(BaseCommand):
+    help = '量測 WSGI / ASGI 應用程式的冷啟動匯入時間與記憶體用量'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--module', default='edf_viewer.wsgi', help='要載入的模組（例如 edf_viewer.asgi）')
+        parser.add_argument('--repeat', type=int, default=3, help='量測次數（取最快一次）')
+        parser.add_argument('--top', type=int, default=10, help='列出匯入最久的套件數')
+        parser.add_argument('--max-seconds', type=float, help='匯入時間超過此值時以錯誤結束')
+        parser.add_argument('--max-rss-mb', type=float, help='RSS 超過此值時以錯誤結束')
+        parser.add_argument('--json', action='store_true', help='以 JSON 輸出結果')
+
+    def handle(self, *args, **options):
+        module = options['module']
+        runs = [_run_probe(module)[0] for _ in range(max(1, options['repeat']))]
+        _, importtime = _run_probe(module, importtime=True)
+
+        result = {
+            'module': module,
+            'seconds': min(run['seconds'] for run in runs),
+            'rss_mb': max(run['rss_kb'] for run in runs) / 1024,
+            'interpreter_rss_mb': min(run['base_rss_kb'] for run in runs) / 1024,
+            'modules': runs[0]['modules'],
+            'heavy_packages': [name for name in HEAVY_PACKAGES if name in runs[0]['loaded']],
+            'packages': [
+                {'name': name, 'seconds': seconds}
+                for name, seconds in _import_times_by_package(importtime)[:options['top']]
+            ],
+        }
+
+        if options['json']:
+            self.stdout.write(json.dumps(result, indent=2))
+        else:
+            self.stdout.write(f"{module}: {result['seconds'] * 1000:.0f} ms, "
+                              f"RSS {result['rss_mb']:.1f} MB (interpreter {result['interpreter_rss_mb']:.1f} MB), "
+                              f"{result['modules']} modules")
+            heavy = ', '.join(result['heavy_packages']) or 'none'
+            self.stdout.write(f"Heavy packages loaded at startup: {heavy}")
+            for package in result['packages']:
+                self.stdout.write(f"  {package['name']:<24} {package['seconds'] * 1000:8.1f} ms")
+
+        if options['max_seconds'] is not None and result['seconds'] > options['max_seconds']:
+            raise CommandError(f"Startup took {result['seconds']:.3f}s (limit {options['max_seconds']}s)")
+        if options['max_rss_mb'] is not None and result['rss_mb'] > options['max_rss_mb']:
+            raise CommandError(f"Startup RSS {result['rss_mb']:.1f} MB (limit {options['max_rss_mb']} MB)")
@@ -0,0 +1,205 @@
+import bisect
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connection
+from django.db.backends.signals import connection_created
+
+# 延遲直方圖的上限（秒）
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_lock = threading.Lock()
+_counters = {}
+_histograms = {}
+
+# 目前請求的各階段耗時（供 Server-Timing 使用）；不在請求內（背景預讀、上傳處理）時為 None
+# 用 ContextVar 而非 thread-local：非同步 view 交給其他執行緒的工作（sync_to_async、解碼執行緒池）也會累加到同一請求
+_timings = contextvars.ContextVar('edf_timings', default=None)
+
+_HELP = {
+    'edf_request_seconds': 'Request latency by view',
+    'edf_stage_seconds': 'Time spent in each stage of serving signal data',
+    'edf_bytes_read_total': 'Bytes of EDF data records and channel store read',
+    'edf_samples_decoded_total': 'Samples decoded to physical values',
+    'edf_pyramid_reads_total': 'Windows served from the min/max pyramid',
+    'edf_read_errors_total': 'Errors while reading signal data',
+    'edf_requests_total': 'Requests by view and status class',
+    'edf_requests_cancelled_total': 'Requests cancelled because the client disconnected',
+}
+
+
+def enabled():
+    # 讀取模組也會在未設定 Django 的環境（例如獨立腳本）中使用
+    return settings.configured and getattr(settings, 'EDF_METRICS', True)
+
+
+def _labels_key(labels):
+    return tuple(sorted(labels.items())) if labels else ()
+
+
+def inc(name, value=1, **labels):
+    """累加計數器"""
+    if not enabled():
+        return
+    key = (name, _labels_key(labels))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def observe(name, seconds, **labels):
+    """記錄一次延遲到直方圖"""
+    key = (name, _labels_key(labels))
+    index = bisect.bisect_left(LATENCY_BUCKETS, seconds)
+    with _lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = [[0] * (len(LATENCY_BUCKETS) + 1), 0.0, 0]
+        histogram[0][index] += 1
+        histogram[1] += seconds
+        histogram[2] += 1
+
+
+def record(stage, seconds):
+    """記錄一個處理階段的耗時：寫入直方圖，並累加到目前請求的 Server-Timing"""
+    if not enabled():
+        return
+    observe('edf_stage_seconds', seconds, stage=stage)
+    timings = _timings.get()
+    if timings is not None:
+        timings[stage] = timings.get(stage, 0.0) + seconds
+
+
+@contextmanager
+def timed(stage):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(stage, time.perf_counter() - started)
+
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+def _header(lines, name, kind):
+    if name in _HELP:
+        lines.append(f"# HELP {name} {_HELP[name]}")
+    lines.append(f"# TYPE {name} {kind}")
+
+
+def render(extra_counters=()):
+    """
+    Prometheus 文字格式
+    extra_counters 為 [(名稱, 值), ...]，例如由快取統計在抓取時換算的計數
+    """
+    with _lock:
+        counters = sorted(_counters.items())
+        histograms = sorted((key, (list(h[0]), h[1], h[2])) for key, h in _histograms.items())
+
+    lines = []
+    seen = set()
+    for (name, labels), value in counters:
+        if name not in seen:
+            _header(lines, name, 'counter')
+            seen.add(name)
+        lines.append(f"{name}{_format_labels(labels)} {value}")
+    for name, value in extra_counters:
+        _header(lines, name, 'counter')
+        lines.append(f"{name} {value}")
+
+    for (name, labels), (buckets, total, count) in histograms:
+        if name not in seen:
+            _header(lines, name, 'histogram')
+            seen.add(name)
+        cumulative = 0
+        for bound, bucket in zip(LATENCY_BUCKETS + (float('inf'),), buckets):
+            cumulative += bucket
+            le = '+Inf' if bound == float('inf') else repr(bound)
+            lines.append(f"{name}_bucket{_format_labels(labels, [('le', le)])} {cumulative}")
+        lines.append(f"{name}_sum{_format_labels(labels)} {total!r}")
+        lines.append(f"{name}_count{_format_labels(labels)} {count}")
+    return '\n'.join(lines) + '\n'
+
+
+def _time_query(execute, sql, params, many, context):
+    if _timings.get() is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        record('db', time.perf_counter() - started)
+
+
+def _install_query_timer(sender, connection, **kwargs):
+    # 每個執行緒各自的連線都要加上（非同步 view 的查詢在 sync_to_async 的執行緒執行）
+    if _time_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_time_query)
+
+
+connection_created.connect(_install_query_timer, dispatch_uid='edf_metrics_query_timer')
+
+
+class ServerTimingMiddleware:
+    """
+    量測每個請求：資料庫查詢與讀取路徑各階段的耗時加總後放在 Server-Timing 標頭，
+    同時記錄每個 view 的延遲直方圖（WSGI 與 ASGI 皆可使用）
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not enabled():
+            return self.get_response(request)
+
+        # 中介層載入前就已建立的連線（例如 runserver 啟動時的檢查）不會收到 connection_created
+        _install_query_timer(None, connection)
+        token = _timings.set({})
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            timings = _timings.get()
+            _timings.reset(token)
+        return self._finish(request, response, timings, time.perf_counter() - started)
+
+    async def __acall__(self, request):
+        if not enabled():
+            return await self.get_response(request)
+
+        token = _timings.set({})
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            timings = _timings.get()
+            _timings.reset(token)
+        return self._finish(request, response, timings, time.perf_counter() - started)
+
+    def _finish(self, request, response, timings, elapsed):
+        match = getattr(request, 'resolver_match', None)
+        view = match.url_name if match is not None and match.url_name else 'other'
+        observe('edf_request_seconds', elapsed, view=view)
+        inc('edf_requests_total', view=view, status=f"{response.status_code // 100}xx")
+
+        entries = [f"{stage};dur={seconds * 1000:.2f}" for stage, seconds in timings.items()]
+        entries.append(f"total;dur={elapsed * 1000:.2f}")
+        response['Server-Timing'] = ', '.join(entries)
+        return response
@@ -0,0 +1,63 @@
+# Generated by Django 4.2.7 on 2026-10-18 04:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('viewer', '0004_ingestjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='edffile',
+            name='bytes_per_record',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='edffile',
+            name='num_data_records',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='edffile',
+            name='num_header_bytes',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='edffile',
+            name='record_duration',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='signal',
+            name='byte_offset',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='signal',
+            name='digital_max',
+            field=models.IntegerField(default=32767),
+        ),
+        migrations.AddField(
+            model_name='signal',
+            name='digital_min',
+            field=models.IntegerField(default=-32768),
+        ),
+        migrations.AddField(
+            model_name='signal',
+            name='gain',
+            field=models.FloatField(default=1.0),
+        ),
+        migrations.AddField(
+            model_name='signal',
+            name='offset',
+            field=models.FloatField(default=0.0),
+        ),
+        migrations.AddField(
+            model_name='signal',
+            name='samples_per_record',
+            field=models.IntegerField(default=0),
+        ),
+    ]
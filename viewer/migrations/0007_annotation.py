@@ -0,0 +1,29 @@
+# Generated by Django 4.2.7 on 2026-10-18 04:58
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('viewer', '0006_edffile_content_hash'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Annotation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('onset', models.FloatField()),
+                ('duration', models.FloatField(default=0)),
+                ('description', models.CharField(max_length=255)),
+                ('stage', models.CharField(blank=True, max_length=32)),
+                ('edf_file', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='annotations', to='viewer.edffile')),
+            ],
+            options={
+                'ordering': ['onset'],
+                'indexes': [models.Index(fields=['edf_file', 'onset'], name='viewer_anno_edf_fil_1e3a6a_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 4.2.7 on 2026-10-18 05:07
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+# AASM 建議的睡眠判讀導程
+AASM_DERIVATIONS = [
+    ('F4-M1', 'F4', 'M1'),
+    ('C4-M1', 'C4', 'M1'),
+    ('O2-M1', 'O2', 'M1'),
+    ('F3-M2', 'F3', 'M2'),
+    ('C3-M2', 'C3', 'M2'),
+    ('O1-M2', 'O1', 'M2'),
+    ('E1-M2', 'E1', 'M2'),
+    ('E2-M1', 'E2', 'M1'),
+]
+
+
+def create_aasm_montage(apps, schema_editor):
+    Montage = apps.get_model('viewer', 'Montage')
+    Derivation = apps.get_model('viewer', 'Derivation')
+    montage = Montage.objects.create(name='AASM', description='AASM recommended PSG derivations')
+    Derivation.objects.bulk_create([
+        Derivation(montage=montage, position=i, label=label, positive=positive, negative=negative)
+        for i, (label, positive, negative) in enumerate(AASM_DERIVATIONS)
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('viewer', '0007_annotation'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Montage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('description', models.CharField(blank=True, max_length=255)),
+            ],
+            options={
+                'ordering': ['name'],
+            },
+        ),
+        migrations.CreateModel(
+            name='Derivation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('position', models.IntegerField(default=0)),
+                ('label', models.CharField(max_length=100)),
+                ('positive', models.CharField(max_length=100)),
+                ('negative', models.CharField(blank=True, max_length=100)),
+                ('montage', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='derivations', to='viewer.montage')),
+            ],
+            options={
+                'ordering': ['position'],
+            },
+        ),
+        migrations.RunPython(create_aasm_montage, migrations.RunPython.noop),
+    ]
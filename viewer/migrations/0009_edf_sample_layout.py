@@ -0,0 +1,34 @@
+# Generated by Django 4.2.7 on 2026-10-18 05:14
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('viewer', '0008_montage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='edffile',
+            name='discontinuous',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='edffile',
+            name='sample_bytes',
+            field=models.IntegerField(default=2),
+        ),
+        migrations.AlterField(
+            model_name='edffile',
+            name='file',
+            field=models.FileField(upload_to='edf_files/', validators=[django.core.validators.FileExtensionValidator(allowed_extensions=['edf', 'bdf'])]),
+        ),
+        migrations.AlterField(
+            model_name='edffile',
+            name='hypnogram_file',
+            field=models.FileField(blank=True, null=True, upload_to='edf_hypnogram/', validators=[django.core.validators.FileExtensionValidator(allowed_extensions=['edf', 'bdf'])]),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 4.2.7 on 2026-10-18 05:42
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def mark_parsed_hypnograms(apps, schema_editor):
+    # 已有註記的檔案先前已解析過；沒有註記的檔案留待第一次讀取時解析
+    EDFFile = apps.get_model('viewer', 'EDFFile')
+    Annotation = apps.get_model('viewer', 'Annotation')
+    EDFFile.objects.filter(pk__in=Annotation.objects.values('edf_file')).update(hypnogram_parsed_at=F('uploaded_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('viewer', '0010_uploadsession'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='edffile',
+            name='hypnogram_parsed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(mark_parsed_hypnograms, migrations.RunPython.noop),
+    ]
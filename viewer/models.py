@@ -1,3 +1,5 @@
+import uuid
+
 from django.db import models
 from django.core.validators import FileExtensionValidator
 
@@ -5,7 +7,7 @@ class EDFFile(models.Model):
     title = models.CharField(max_length=255)
     file = models.FileField(
         upload_to='edf_files/',
-        validators=[FileExtensionValidator(allowed_extensions=['edf'])]
+        validators=[FileExtensionValidator(allowed_extensions=['edf', 'bdf'])]
     )
     uploaded_at = models.DateTimeField(auto_now_add=True)
     
@@ -15,13 +17,26 @@ class EDFFile(models.Model):
     num_signals = models.IntegerField(default=0)
     duration = models.FloatField(default=0)  # 秒數
 
+    # 資料記錄配置（解析時保存，讀取資料時不必再讀標頭）
+    num_header_bytes = models.IntegerField(default=0)
+    num_data_records = models.IntegerField(default=0)
+    record_duration = models.FloatField(default=0)  # 每筆記錄秒數
+    bytes_per_record = models.IntegerField(default=0)
+    sample_bytes = models.IntegerField(default=2)  # EDF 為 2，BDF（24 位元）為 3
+    discontinuous = models.BooleanField(default=False)  # EDF+D：資料記錄在時間上不連續
+
+    # 檔案內容的 SHA-256：批次匯入時略過內容已存在的檔案（包含網頁上傳的檔案）；上傳本身不去除重複
+    content_hash = models.CharField(max_length=64, blank=True, db_index=True)
+
     # 新增：睡眠週期 EDF
     hypnogram_file = models.FileField(
         upload_to='edf_hypnogram/',
         null=True,
         blank=True,
-        validators=[FileExtensionValidator(allowed_extensions=['edf'])]
+        validators=[FileExtensionValidator(allowed_extensions=['edf', 'bdf'])]
     )
+    # 睡眠週期檔的註記寫入資料庫的時間；None 表示尚未解析（註記可能為零筆，不能以筆數判斷）
+    hypnogram_parsed_at = models.DateTimeField(null=True, blank=True)
     
     class Meta:
         ordering = ['-uploaded_at']
@@ -29,6 +44,40 @@ class EDFFile(models.Model):
     def __str__(self):
         return self.title
 
+    def load_header(self):
+        """
+        由資料庫中保存的配置重建 EDFHeader
+        舊資料（未保存配置）回傳 None，由讀取端改為解析檔案標頭
+        """
+        from .edf_header import EDFHeader
+
+        if not self.num_header_bytes:
+            return None
+        signals = list(self.signals.order_by('signal_index'))
+        if len(signals) != self.num_signals or any(s.samples_per_record <= 0 for s in signals):
+            return None
+        return EDFHeader(
+            num_header_bytes=self.num_header_bytes,
+            num_data_records=self.num_data_records,
+            duration_per_record=self.record_duration,
+            samples_per_record=[s.samples_per_record for s in signals],
+            physical_min=[s.physical_min for s in signals],
+            physical_max=[s.physical_max for s in signals],
+            digital_min=[s.digital_min for s in signals],
+            digital_max=[s.digital_max for s in signals],
+            labels=[s.signal_label for s in signals],
+            transducers=[s.transducer for s in signals],
+            physical_dims=[s.units for s in signals],
+            sample_bytes=self.sample_bytes,
+            discontinuous=self.discontinuous,
+        )
+
+    @property
+    def ingest_status(self):
+        """最近一次背景處理的狀態；沒有工作紀錄（舊資料）時視為完成"""
+        jobs = list(self.ingest_jobs.all())
+        return jobs[0].status if jobs else IngestJob.DONE
+
 
 class Signal(models.Model):
     edf_file = models.ForeignKey(EDFFile, on_delete=models.CASCADE, related_name='signals')
@@ -39,9 +88,130 @@ class Signal(models.Model):
     physical_min = models.FloatField()
     physical_max = models.FloatField()
     sampling_rate = models.FloatField()
+
+    # 解碼所需的配置：物理值 = 數位值 × gain + offset
+    digital_min = models.IntegerField(default=-32768)
+    digital_max = models.IntegerField(default=32767)
+    gain = models.FloatField(default=1.0)
+    offset = models.FloatField(default=0.0)
+    samples_per_record = models.IntegerField(default=0)
+    byte_offset = models.IntegerField(default=0)  # 在單筆資料記錄內的位元組位置
     
     class Meta:
         ordering = ['signal_index']  # 改用 signal_index 排序
     
     def __str__(self):
         return f"{self.edf_file.title} - {self.signal_label}"
+
+
+class IngestJob(models.Model):
+    """上傳後的背景處理工作（解析標頭、建立衍生資料）"""
+
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    ]
+
+    edf_file = models.ForeignKey(EDFFile, on_delete=models.CASCADE, related_name='ingest_jobs')
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=QUEUED, db_index=True)
+    attempts = models.IntegerField(default=0)
+    error = models.TextField(blank=True)
+    worker = models.CharField(max_length=255, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    # 執行中的 worker 定期更新；停止更新超過 EDF_INGEST_STALE_SECONDS 視為 worker 已當機
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.edf_file.title} - {self.status}"
+
+
+class UploadSession(models.Model):
+    """
+    分段上傳（建立 / PUT 分段 / 完成）的進度
+    分段依序直接寫入媒體目錄中的檔案；received 為已連續寫入的位元組數，中斷後從這裡續傳
+    """
+
+    UPLOADING = 'uploading'
+    COMPLETE = 'complete'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (UPLOADING, 'Uploading'),
+        (COMPLETE, 'Complete'),
+        (FAILED, 'Failed'),
+    ]
+
+    token = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
+    title = models.CharField(max_length=255)
+    file_name = models.CharField(max_length=255)  # 相對於 MEDIA_ROOT
+    size = models.BigIntegerField()  # 建立時宣告的檔案大小
+    received = models.BigIntegerField(default=0)
+    header_checked = models.BooleanField(default=False)
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=UPLOADING, db_index=True)
+    error = models.TextField(blank=True)
+    edf_file = models.ForeignKey(EDFFile, null=True, blank=True, on_delete=models.SET_NULL,
+                                 related_name='upload_sessions')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.title} - {self.received}/{self.size}"
+
+
+class Annotation(models.Model):
+    """EDF+ 註記（目前來自睡眠週期檔），處理上傳時解析一次"""
+
+    edf_file = models.ForeignKey(EDFFile, on_delete=models.CASCADE, related_name='annotations')
+    onset = models.FloatField()  # 秒數
+    duration = models.FloatField(default=0)
+    description = models.CharField(max_length=255)
+    stage = models.CharField(max_length=32, blank=True)  # 對應後的睡眠階段代碼
+
+    class Meta:
+        ordering = ['onset']
+        indexes = [models.Index(fields=['edf_file', 'onset'])]
+
+    def __str__(self):
+        return f"{self.edf_file.title} - {self.onset:.0f}s {self.description}"
+
+
+class Montage(models.Model):
+    """導程組合：依信號標籤定義的衍生通道，適用於所有檔案"""
+
+    name = models.CharField(max_length=100, unique=True)
+    description = models.CharField(max_length=255, blank=True)
+
+    class Meta:
+        ordering = ['name']
+
+    def __str__(self):
+        return self.name
+
+
+class Derivation(models.Model):
+    """衍生通道 positive - negative；negative 留空時為原始信號"""
+
+    montage = models.ForeignKey(Montage, on_delete=models.CASCADE, related_name='derivations')
+    position = models.IntegerField(default=0)
+    label = models.CharField(max_length=100)
+    positive = models.CharField(max_length=100)  # 信號標籤
+    negative = models.CharField(max_length=100, blank=True)
+
+    class Meta:
+        ordering = ['position']
+
+    def __str__(self):
+        return f"{self.montage.name} - {self.label}"
@@ -0,0 +1,59 @@
+import re
+from collections import namedtuple
+
+from .edf_reader import Derivation
+
+# 視窗端點使用的通道（欄位與 Signal 相同，可直接取代）；signal_index 可為 Derivation
+MontageChannel = namedtuple('MontageChannel', ['id', 'signal_label', 'units', 'signal_index'])
+
+# 常見的電極別名（耳垂 A1/A2 與乳突 M1/M2 視為同一參考點）
+ELECTRODE_ALIASES = {
+    'A1': 'M1',
+    'A2': 'M2',
+    'LOC': 'E1',
+    'ROC': 'E2',
+}
+
+# 標籤前綴（信號類型），比對時忽略
+_TYPE_PREFIX = re.compile(r'^(EEG|EOG|EMG|ECG|EKG)\s+', re.IGNORECASE)
+
+
+def normalize_label(label):
+    """將信號標籤正規化以便比對：去掉類型前綴、參考（-REF）與大小寫差異"""
+    label = _TYPE_PREFIX.sub('', label.strip()).upper()
+    label = re.sub(r'[-:]?REF$', '', label).strip()
+    return ELECTRODE_ALIASES.get(label, label)
+
+
+def resolve_montage(montage, signals):
+    """
+    依標籤將導程對應到檔案中的信號
+    回傳 (channels, missing)：channels 為 MontageChannel 列表，id 為 "positive-negative" 的信號 id，
+    missing 為找不到信號的導程標籤
+    """
+    by_label = {}
+    for signal in signals:
+        by_label.setdefault(normalize_label(signal.signal_label), signal)
+
+    channels = []
+    missing = []
+    for derivation in montage.derivations.all():
+        positive = by_label.get(normalize_label(derivation.positive))
+        negative = by_label.get(normalize_label(derivation.negative)) if derivation.negative else None
+        if positive is None or (derivation.negative and negative is None):
+            # 檔案中已記錄為導程（例如標籤 C4-M1）時直接使用
+            positive, negative = by_label.get(normalize_label(derivation.label)), None
+            if positive is None:
+                missing.append(derivation.label)
+                continue
+
+        if negative is None:
+            channels.append(MontageChannel(positive.id, derivation.label, positive.units, positive.signal_index))
+        else:
+            channels.append(MontageChannel(
+                f"{positive.id}-{negative.id}",
+                derivation.label,
+                positive.units,
+                Derivation(positive.signal_index, negative.signal_index),
+            ))
+    return channels, missing
@@ -0,0 +1,167 @@
+"""
+非同步 view（ASGI）的阻塞工作分流
+快取命中等快速工作在 asgiref 的共用執行緒執行；讀檔與解碼交給有上限的執行緒池，
+並限制同一檔案同時解碼的請求數，避免少數大視窗請求佔滿所有執行緒
+"""
+import asyncio
+import contextvars
+import threading
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import suppress
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from . import metrics
+
+_executor = None
+_executor_lock = threading.Lock()
+
+# event loop -> {檔案路徑: [Semaphore, 使用中與等候中的請求數]}；asyncio.Semaphore 只能在建立它的 loop 使用
+_file_slots = weakref.WeakKeyDictionary()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'EDF_ASYNC_WORKERS', 4),
+                thread_name_prefix='edf-decode',
+            )
+        return _executor
+
+
+async def _acquire_file_slot(file_path):
+    """同一檔案同時最多 EDF_ASYNC_PER_FILE 個解碼；回傳釋放用的函式（沒有請求使用時移除該檔案的 Semaphore）"""
+    slots = _file_slots.setdefault(asyncio.get_running_loop(), {})
+    entry = slots.get(file_path)
+    if entry is None:
+        entry = slots[file_path] = [asyncio.Semaphore(getattr(settings, 'EDF_ASYNC_PER_FILE', 2)), 0]
+    entry[1] += 1
+
+    def release(acquired=True):
+        if acquired:
+            entry[0].release()
+        entry[1] -= 1
+        if not entry[1] and slots.get(file_path) is entry:
+            del slots[file_path]
+
+    try:
+        await entry[0].acquire()
+    except BaseException:
+        release(acquired=False)
+        raise
+    return release
+
+
+async def lookup(func, *args):
+    """執行快速的同步工作（例如只查詢快取），不佔用解碼執行緒池"""
+    return await sync_to_async(func, thread_sensitive=False)(*args)
+
+
+async def decode(file_path, func, *args):
+    """
+    在解碼執行緒池執行 func(*args)，等候檔案名額與執行緒的時間記為 queue 階段
+    請求被取消時尚未開始的工作不會執行；已在執行的工作會完成（結果仍寫入視窗快取），
+    完成前繼續佔用該檔案的名額
+    """
+    loop = asyncio.get_running_loop()
+    queued = time.perf_counter()
+    context = contextvars.copy_context()
+
+    def call():
+        metrics.record('queue', time.perf_counter() - queued)
+        return func(*args)
+
+    release = await _acquire_file_slot(file_path)
+    try:
+        future = _get_executor().submit(context.run, call)
+    except BaseException:
+        release()
+        raise
+
+    def done(_):
+        # 請求取消後 event loop 可能已關閉（例如 WSGI 下由 async_to_sync 執行）
+        with suppress(RuntimeError):
+            loop.call_soon_threadsafe(release)
+
+    future.add_done_callback(done)
+    try:
+        return await asyncio.shield(asyncio.wrap_future(future))
+    except asyncio.CancelledError:
+        future.cancel()
+        raise
+
+
+async def _iterate(file_path, iterator):
+    done = object()
+    while True:
+        chunk = await decode(file_path, next, iterator, done)
+        if chunk is done:
+            return
+        yield chunk
+
+
+def stream_in_pool(file_path, response):
+    """
+    將串流回應的同步 iterator 改為在解碼執行緒池逐塊產生的非同步 iterator
+    （Django 4.2 的 ASGIHandler 遇到同步 iterator 會先整份讀入記憶體再送出）
+    """
+    if getattr(response, 'streaming', False) and not response.is_async:
+        response.streaming_content = _iterate(file_path, iter(response.streaming_content))
+    return response
+
+
+class CancelOnDisconnect:
+    """
+    ASGI 中介層：讀完請求 body 後持續監聽 http.disconnect，用戶端中斷時取消仍在處理的請求
+    （Django 4.2 的 ASGIHandler 讀完 body 後不再呼叫 receive，關閉分頁或快速翻頁時舊請求會繼續佔用資源）
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return await self.app(scope, receive, send)
+
+        body_read = asyncio.Event()
+        responded = False
+
+        async def receive_request():
+            message = await receive()
+            if message['type'] != 'http.request' or not message.get('more_body', False):
+                body_read.set()
+            return message
+
+        async def send_response(message):
+            nonlocal responded
+            await send(message)
+            if message['type'] == 'http.response.body' and not message.get('more_body', False):
+                responded = True
+
+        async def wait_for_disconnect():
+            await body_read.wait()
+            while (await receive())['type'] != 'http.disconnect':
+                pass
+
+        request = asyncio.ensure_future(self.app(scope, receive_request, send_response))
+        disconnect = asyncio.ensure_future(wait_for_disconnect())
+        try:
+            done, _ = await asyncio.wait([request, disconnect], return_when=asyncio.FIRST_COMPLETED)
+        except asyncio.CancelledError:
+            request.cancel()
+            disconnect.cancel()
+            raise
+        disconnect.cancel()
+        # 回應已送完才中斷（伺服器在回應後送出 http.disconnect）時讓 Django 正常收尾
+        if request in done or responded:
+            return await request
+
+        request.cancel()
+        metrics.inc('edf_requests_cancelled_total')
+        with suppress(asyncio.CancelledError):
+            await request
@@ -0,0 +1,132 @@
+import logging
+import math
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+
+from .window_cache import get_signal_windows, prefetched_bytes
+
+logger = logging.getLogger(__name__)
+
+# 追蹤的 (客戶端, 檔案, 信號組合) 數量上限
+_MAX_TRACKED = 1024
+
+_executor = None
+_executor_lock = threading.Lock()
+
+_sessions = OrderedDict()
+_sessions_lock = threading.Lock()
+
+_stats = {'scheduled': 0, 'completed': 0, 'cancelled': 0, 'skipped_budget': 0}
+
+
+class _Session:
+    """同一客戶端對同一檔案、同一組信號的最近一次請求"""
+
+    def __init__(self):
+        self.start = None
+        self.end = None
+        self.generation = 0
+        self.futures = []
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'EDF_PREFETCH_WORKERS', 2),
+                thread_name_prefix='edf-prefetch',
+            )
+        return _executor
+
+
+def client_key(request):
+    """以 session 或來源位址與 User-Agent 辨識客戶端"""
+    session = getattr(request, 'session', None)
+    if session is not None and session.session_key:
+        return session.session_key
+    return f"{request.META.get('REMOTE_ADDR', '')}|{request.META.get('HTTP_USER_AGENT', '')}"
+
+
+def observe(client, file_path, signal_indices, start_time, end_time, duration, max_samples, mode='minmax',
+            filters=None):
+    """
+    記錄一次視窗請求；與上一次請求首尾相接（往後或往前翻頁）時，
+    在背景把接下來 EDF_PREFETCH_WINDOWS 個同寬度的視窗讀入視窗快取
+    跳到其他位置時取消尚未開始的預讀
+    """
+    count = getattr(settings, 'EDF_PREFETCH_WINDOWS', 2)
+    if not count or start_time is None or end_time is None or end_time <= start_time:
+        return
+
+    session_key = (client, file_path, tuple(signal_indices), mode, max_samples, filters)
+    with _sessions_lock:
+        session = _sessions.get(session_key)
+        if session is None:
+            session = _sessions[session_key] = _Session()
+        _sessions.move_to_end(session_key)
+        while len(_sessions) > _MAX_TRACKED:
+            _sessions.popitem(last=False)
+
+        width = end_time - start_time
+        forward = session.end is not None and math.isclose(start_time, session.end, abs_tol=1e-6)
+        backward = session.start is not None and math.isclose(end_time, session.start, abs_tol=1e-6)
+        session.start, session.end = start_time, end_time
+
+        # 已排程的預讀若剛好是這個視窗，繼續保留；其他情況（跳頁）先取消
+        if not (forward or backward):
+            _cancel(session)
+            return
+        _cancel(session, keep_running=True)
+        generation = session.generation
+
+        if prefetched_bytes() >= getattr(settings, 'EDF_PREFETCH_MAX_BYTES', 32 * 1024 * 1024):
+            _stats['skipped_budget'] += 1
+            return
+
+        step = width if forward else -width
+        anchor = end_time if forward else start_time - width
+        for k in range(count):
+            next_start = anchor + k * step
+            next_end = next_start + width
+            if next_start < 0 or next_start >= duration:
+                break
+            future = _get_executor().submit(
+                _prefetch, session, generation, file_path, list(signal_indices), next_start, next_end,
+                max_samples, mode, filters)
+            session.futures.append(future)
+            _stats['scheduled'] += 1
+
+
+def _cancel(session, keep_running=False):
+    """取消尚未開始的預讀；keep_running 為 False 時執行中的工作完成後也不再接續"""
+    for future in session.futures:
+        if future.cancel():
+            _stats['cancelled'] += 1
+    session.futures = [future for future in session.futures if not future.done()] if keep_running else []
+    if not keep_running:
+        session.generation += 1
+
+
+def _prefetch(session, generation, file_path, signal_indices, start_time, end_time, max_samples, mode, filters):
+    # 使用者已跳到別處時不再讀取
+    if session.generation != generation:
+        return
+    try:
+        get_signal_windows(file_path, signal_indices, start_time, end_time, max_samples, mode,
+                           filters=filters, prefetch=True)
+        with _sessions_lock:
+            _stats['completed'] += 1
+    except Exception as e:
+        logger.warning(f"Prefetch of {file_path} [{start_time}, {end_time}) failed: {e}")
+
+
+def prefetch_stats():
+    with _sessions_lock:
+        stats = dict(_stats)
+        stats['tracked_sessions'] = len(_sessions)
+    stats['windows'] = getattr(settings, 'EDF_PREFETCH_WINDOWS', 2)
+    return stats
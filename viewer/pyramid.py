@@ -0,0 +1,154 @@
+import math
+import os
+
+import numpy as np
+
+# 金字塔層級：每層每個項目涵蓋的原始樣本數（2× … 4096×）
+PYRAMID_FACTORS = tuple(2 ** k for k in range(1, 13))
+
+
+def pyramid_dir(file_path):
+    """金字塔 sidecar 目錄，與 EDF 檔案放在一起"""
+    return f"{file_path}.pyramid"
+
+
+def pyramid_path(file_path, signal_index):
+    return os.path.join(pyramid_dir(file_path), f"signal_{signal_index}.npy")
+
+
+def level_offsets(total_samples):
+    """各層在 sidecar 陣列中的起始位置；最後一個值為總長度"""
+    offsets = [0]
+    for factor in PYRAMID_FACTORS:
+        offsets.append(offsets[-1] + math.ceil(total_samples / factor))
+    return offsets
+
+
+class _LevelBuilder:
+    """
+    串流建立單一層級：每兩個下層項目合併為一個 (min, max)
+    結果寫入 sidecar 陣列，並傳給上一層
+    """
+
+    def __init__(self, out, start, parent=None):
+        self.out = out
+        self.cursor = start
+        self.parent = parent
+        self._carry_min = np.empty(0, dtype=out.dtype)
+        self._carry_max = np.empty(0, dtype=out.dtype)
+
+    def feed(self, mins, maxs):
+        if self._carry_min.size:
+            mins = np.concatenate((self._carry_min, mins))
+            maxs = np.concatenate((self._carry_max, maxs))
+        even = len(mins) - len(mins) % 2
+        if even:
+            self._emit(np.minimum(mins[0:even:2], mins[1:even:2]),
+                       np.maximum(maxs[0:even:2], maxs[1:even:2]))
+        self._carry_min = mins[even:].copy()
+        self._carry_max = maxs[even:].copy()
+
+    def flush(self):
+        if self._carry_min.size:
+            self._emit(self._carry_min, self._carry_max)
+            self._carry_min = self._carry_min[:0]
+            self._carry_max = self._carry_max[:0]
+        if self.parent is not None:
+            self.parent.flush()
+
+    def _emit(self, mins, maxs):
+        n = len(mins)
+        self.out[self.cursor:self.cursor + n, 0] = mins
+        self.out[self.cursor:self.cursor + n, 1] = maxs
+        self.cursor += n
+        if self.parent is not None:
+            self.parent.feed(mins, maxs)
+
+
+def build_pyramid(file_path):
+    """
+    為 EDF 檔案中每個信號建立 min/max 金字塔（數位值；EDF 為 int16、BDF 為 int32）
+    單次串流讀取所有資料記錄，記憶體用量與檔案長度無關
+    """
+    from .edf_reader import get_edf_handle
+
+    handle = get_edf_handle(file_path)
+    os.makedirs(pyramid_dir(file_path), exist_ok=True)
+
+    outputs = {}
+    builders = {}
+    for i in range(handle.num_signals):
+        if handle.samples_per_record[i] == 0:
+            continue
+        total = handle.channel_sample_count(i, 0, handle.num_data_records)
+        offsets = level_offsets(total)
+        tmp_path = pyramid_path(file_path, i) + '.tmp'
+        out = np.lib.format.open_memmap(tmp_path, mode='w+', dtype=handle.sample_dtype, shape=(offsets[-1], 2))
+        builder = None
+        for level in reversed(range(len(PYRAMID_FACTORS))):
+            builder = _LevelBuilder(out, offsets[level], parent=builder)
+        outputs[i] = (out, tmp_path)
+        builders[i] = builder
+
+    for block in handle.iter_record_blocks(0, handle.num_data_records):
+        for i, builder in builders.items():
+            columns = handle.channel_slice(i)
+            raw = (block[:, columns] if block.ndim == 2 else block[columns]).ravel()
+            if raw.size:
+                builder.feed(raw, raw)
+
+    for i in list(builders):
+        builder = builders.pop(i)
+        builder.flush()
+        out, tmp_path = outputs.pop(i)
+        out.flush()
+        # 每個層級都持有同一個映射；全部釋放（解除映射）後才能取代檔案，Windows 不允許取代映射中的檔案
+        while builder is not None:
+            builder.out = None
+            builder = builder.parent
+        del out
+        os.replace(tmp_path, pyramid_path(file_path, i))
+
+
+def load_pyramid(file_path, signal_index, total_samples, source_mtime, dtype='<i2'):
+    """
+    以記憶體映射載入信號的金字塔；不存在、過期或長度不符時回傳 None
+    """
+    path = pyramid_path(file_path, signal_index)
+    try:
+        if os.stat(path).st_mtime_ns < source_mtime:
+            return None
+        pyramid = np.load(path, mmap_mode='r')
+    except (OSError, ValueError):
+        return None
+    if pyramid.shape != (level_offsets(total_samples)[-1], 2) or pyramid.dtype != np.dtype(dtype):
+        return None
+    return pyramid
+
+
+def read_pyramid_window(pyramid, total_samples, first_sample, num_samples, bucket_size):
+    """
+    從金字塔取出 [first_sample, first_sample + num_samples) 的 min/max 包絡
+    選擇不超過 bucket_size 的最粗層級，再合併成每區間一組 (min, max)
+    回傳 (交錯的數位 min/max 陣列, 每個輸出點涵蓋的樣本數)；沒有適用層級時回傳 None
+    """
+    usable = [level for level, factor in enumerate(PYRAMID_FACTORS) if factor <= bucket_size]
+    if not usable:
+        return None
+    level = usable[-1]
+    factor = PYRAMID_FACTORS[level]
+    offsets = level_offsets(total_samples)
+
+    first = offsets[level] + first_sample // factor
+    last = offsets[level] + math.ceil((first_sample + num_samples) / factor)
+    entries = pyramid[first:min(last, offsets[level + 1])]
+    if not len(entries):
+        return None
+
+    # 合併後的區間數不超過直接下採樣時的區間數
+    group = max(1, math.ceil(len(entries) / math.ceil(num_samples / bucket_size)))
+    starts = np.arange(0, len(entries), group)
+    envelope = np.empty((len(starts), 2), dtype=pyramid.dtype)
+    envelope[:, 0] = np.minimum.reduceat(entries[:, 0], starts)
+    envelope[:, 1] = np.maximum.reduceat(entries[:, 1], starts)
+    return envelope.ravel(), factor * group / 2.0
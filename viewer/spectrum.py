@@ -0,0 +1,142 @@
+import hashlib
+from collections import namedtuple
+
+import numpy as np
+
+from .edf_reader import _check_signal_index, get_edf_handle, iter_channel_samples
+
+# 睡眠判讀常用頻帶（Hz）
+FREQUENCY_BANDS = (
+    ('delta', 0.5, 4.0),
+    ('theta', 4.0, 8.0),
+    ('alpha', 8.0, 12.0),
+    ('sigma', 12.0, 16.0),
+    ('beta', 16.0, 30.0),
+)
+
+# 每次批次做 FFT 的 epoch 數（決定計算時的記憶體上限）
+_EPOCH_BATCH = 64
+
+SPECTRUM_OUTPUTS = ('bands', 'psd', 'spectrogram')
+
+Spectrogram = namedtuple('Spectrogram', ['psd', 'freqs', 'epoch_seconds', 'sampling_rate'])
+SpectrumResult = namedtuple('SpectrumResult', ['data', 'freqs', 'epochs'])
+
+
+def _welch(epochs, nperseg, step, sampling_rate):
+    """
+    對 (epoch 數, 每 epoch 樣本數) 矩陣做 Welch PSD
+    以跨步視圖切出重疊的分段，一次對所有分段做 rfft（Hann 窗、去除平均、單邊密度）
+    """
+    window = np.hanning(nperseg)
+    segments = np.lib.stride_tricks.sliding_window_view(epochs, nperseg, axis=1)[:, ::step, :]
+    segments = segments - segments.mean(axis=-1, keepdims=True)
+    spectrum = np.fft.rfft(segments * window, axis=-1)
+    psd = (spectrum.real ** 2 + spectrum.imag ** 2).mean(axis=1) / (sampling_rate * (window ** 2).sum())
+    # 單邊頻譜：除 DC 與 Nyquist 外乘 2
+    psd[:, 1:(nperseg + 1) // 2] *= 2
+    return psd
+
+
+def compute_spectrogram(file_path, signal_index, epoch_seconds=30.0, window_seconds=4.0, overlap=0.5,
+                        header_loader=None):
+    """
+    串流讀取整個信號，計算每個完整 epoch 的 Welch PSD
+    回傳 Spectrogram：psd 為 (epoch 數, 頻率數) 的 float32 陣列
+    """
+    handle = get_edf_handle(file_path, header_loader)
+    _check_signal_index(handle, signal_index)
+    sampling_rate = float(handle.sampling_rate(signal_index))
+
+    samples_per_epoch = int(round(epoch_seconds * sampling_rate))
+    nperseg = int(round(window_seconds * sampling_rate))
+    if not 0 <= overlap < 1:
+        raise ValueError(f"overlap must be in [0, 1): {overlap}")
+    if nperseg < 2 or nperseg > samples_per_epoch:
+        raise ValueError(f"window must be between 2 samples and the epoch length ({epoch_seconds}s)")
+    step = max(1, nperseg - int(overlap * nperseg))
+
+    batch_samples = samples_per_epoch * _EPOCH_BATCH
+    rows = []
+    pending = np.empty(0)
+    for chunk in iter_channel_samples(handle, signal_index, 0, handle.num_data_records):
+        pending = np.concatenate((pending, chunk))
+        while len(pending) >= batch_samples:
+            rows.append(_welch(pending[:batch_samples].reshape(_EPOCH_BATCH, samples_per_epoch), nperseg, step,
+                               sampling_rate).astype(np.float32))
+            pending = pending[batch_samples:]
+
+    # 最後不完整的 epoch 捨去
+    complete = len(pending) // samples_per_epoch
+    if complete:
+        rows.append(_welch(pending[:complete * samples_per_epoch].reshape(complete, samples_per_epoch), nperseg,
+                           step, sampling_rate).astype(np.float32))
+
+    freqs = np.fft.rfftfreq(nperseg, 1.0 / sampling_rate)
+    psd = np.concatenate(rows) if rows else np.empty((0, len(freqs)), dtype=np.float32)
+    return Spectrogram(psd=psd, freqs=freqs, epoch_seconds=samples_per_epoch / sampling_rate,
+                       sampling_rate=sampling_rate)
+
+
+def _spectrogram_key(file_path, mtime, signal_index, epoch_seconds, window_seconds, overlap):
+    raw = f"{file_path}|{mtime}|{signal_index}|{epoch_seconds}|{window_seconds}|{overlap}"
+    return 'edf-spectrogram:' + hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+
+def get_spectrogram(file_path, signal_index, epoch_seconds=30.0, window_seconds=4.0, overlap=0.5,
+                    header_loader=None):
+    """
+    compute_spectrogram 的快取版本（與信號視窗共用快取）
+    鍵為 (檔案, mtime, 信號, epoch 長度, 窗長, 重疊比例)，時間範圍由呼叫端切片，不影響命中
+    """
+    from .window_cache import _window_cache
+
+    handle = get_edf_handle(file_path, header_loader)
+    key = _spectrogram_key(file_path, handle.mtime, signal_index, epoch_seconds, window_seconds, overlap)
+    cache = _window_cache()
+    spectrogram = cache.get(key)
+    if spectrogram is None:
+        spectrogram = compute_spectrogram(file_path, signal_index, epoch_seconds, window_seconds, overlap,
+                                          header_loader)
+        cache.set(key, spectrogram, timeout=None)
+    return spectrogram
+
+
+def epoch_range(spectrogram, start_time=None, end_time=None):
+    """時間範圍（秒）所涵蓋的 epoch 切片"""
+    total = len(spectrogram.psd)
+    first = int(max(0.0, start_time or 0.0) // spectrogram.epoch_seconds)
+    last = total if end_time is None else int(np.ceil(end_time / spectrogram.epoch_seconds))
+    return slice(min(first, total), max(min(last, total), min(first, total)))
+
+
+def band_power(psd, freqs, bands=FREQUENCY_BANDS):
+    """各頻帶的功率（PSD 在頻帶內積分），回傳 (epoch 數, 頻帶數)"""
+    df = freqs[1] - freqs[0] if len(freqs) > 1 else 1.0
+    columns = []
+    for _, low, high in bands:
+        mask = (freqs >= low) & (freqs < high)
+        columns.append(psd[:, mask].sum(axis=1) * df)
+    return np.stack(columns, axis=1) if columns else np.empty((len(psd), 0))
+
+
+def summarize_spectrogram(spectrogram, output='bands', start_time=None, end_time=None, fmax=None):
+    """
+    取出時間範圍內的結果：bands 為 (epoch, 頻帶) 功率，psd 為平均 PSD，spectrogram 為 (epoch, 頻率) PSD
+    fmax 限制 psd / spectrogram 的最高頻率；回傳 float32 的 SpectrumResult
+    """
+    if output not in SPECTRUM_OUTPUTS:
+        raise ValueError(f"unknown output: {output}")
+    epochs = epoch_range(spectrogram, start_time, end_time)
+    psd = spectrogram.psd[epochs]
+    freqs = spectrogram.freqs
+
+    if output == 'bands':
+        return SpectrumResult(band_power(psd, freqs).astype(np.float32), None, epochs)
+    if fmax is not None:
+        keep = freqs <= fmax
+        psd, freqs = psd[:, keep], freqs[keep]
+    if output == 'psd':
+        data = psd.mean(axis=0) if len(psd) else np.zeros(len(freqs))
+        return SpectrumResult(np.asarray(data, dtype=np.float32), freqs, epochs)
+    return SpectrumResult(np.ascontiguousarray(psd, dtype=np.float32), freqs, epochs)
@@ -0,0 +1,561 @@
+import csv
+import hashlib
+import io
+import json
+import os
+import shutil
+import tempfile
+import threading
+from unittest import mock
+
+import numpy as np
+from django.core.files import File
+from asgiref.sync import sync_to_async
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import include, path
+
+from benchmarks.synthetic import ChannelSpec, write_edf
+
+from . import views
+from .ingest import enqueue_ingest, run_job
+from .models import EDFFile, IngestJob, UploadSession
+
+CHANNEL = ChannelSpec('S0', 100, 'uV', -1000.0, 1000.0)
+
+# EDF+D：三筆連續記錄、7 秒空隙、再三筆
+RECORD_ONSETS = [0.0, 1.0, 2.0, 10.0, 11.0, 12.0]
+
+# AsyncViewTests 的 URLconf：信號資料端點使用非同步版本（同 EDF_ASYNC_VIEWS），其餘同 viewer.urls
+urlpatterns = [
+    path('signal/<int:signal_id>/data/', views.signal_data_async),
+    path('edf/<int:pk>/window/', views.edf_window_async),
+    path('signal/<int:signal_id>/export/', views.signal_export_async),
+    path('', include('viewer.urls')),
+]
+
+
+class SyntheticFileMixin:
+    """以 benchmarks.synthetic 產生檔案，放在暫存的 MEDIA_ROOT 並同步執行背景處理"""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        settings = override_settings(MEDIA_ROOT=self.media_root, EDF_INGEST_IN_PROCESS=False)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def ingest(self, path):
+        with open(path, 'rb') as f:
+            edf_file = EDFFile.objects.create(title=os.path.basename(path), file=File(f, name=os.path.basename(path)))
+        job = enqueue_ingest(edf_file)
+        self.assertEqual(run_job(job.pk), IngestJob.DONE)
+        edf_file.refresh_from_db()
+        return edf_file
+
+
+class SyntheticFileTestCase(SyntheticFileMixin, TestCase):
+    pass
+
+
+class BDFTests(SyntheticFileTestCase):
+
+    def test_24bit_extremes(self):
+        path = write_edf(os.path.join(self.media_root, 'extremes.bdf'), [CHANNEL], 2, bdf=True)
+        # 第一筆記錄的前三個樣本改為數位最大值、最小值與 -1（little-endian 24 位元）
+        with open(path, 'r+b') as f:
+            f.seek(2 * 256)
+            f.write(b'\xff\xff\x7f' + b'\x00\x00\x80' + b'\xff\xff\xff')
+        edf_file = self.ingest(path)
+        self.assertEqual(edf_file.sample_bytes, 3)
+        signal = edf_file.signals.get()
+        self.assertEqual((signal.digital_min, signal.digital_max), (-8388608, 8388607))
+
+        response = self.client.get(f'/signal/{signal.id}/export/?format=f32&start=0&end=1')
+        self.assertEqual(response.status_code, 200)
+        data = np.frombuffer(b''.join(response.streaming_content), dtype='<f4')
+        self.assertEqual(len(data), 100)
+        self.assertAlmostEqual(float(data[0]), 1000.0, places=2)
+        self.assertAlmostEqual(float(data[1]), -1000.0, places=2)
+        self.assertAlmostEqual(float(data[2]), 0.0, places=2)
+
+        response = self.client.get(f'/signal/{signal.id}/data/?start=0&end=1&mode=minmax')
+        window = response.json()['data']
+        self.assertAlmostEqual(max(window), 1000.0, places=2)
+        self.assertAlmostEqual(min(window), -1000.0, places=2)
+
+
+class DiscontinuousTests(SyntheticFileTestCase):
+
+    def setUp(self):
+        super().setUp()
+        path = write_edf(os.path.join(self.media_root, 'gaps.edf'), [CHANNEL], None, record_onsets=RECORD_ONSETS)
+        self.edf_file = self.ingest(path)
+        self.signal = self.edf_file.signals.get(signal_label='S0')
+
+    def test_layout(self):
+        self.assertTrue(self.edf_file.discontinuous)
+        self.assertEqual(self.edf_file.duration, 13.0)
+
+    def test_window_inside_gap_is_empty(self):
+        response = self.client.get(f'/signal/{self.signal.id}/data/?start=4&end=8')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['data'], [])
+
+    def test_window_across_gap(self):
+        response = self.client.get(f'/signal/{self.signal.id}/data/?start=0&end=20&format=bin')
+        self.assertEqual(response['X-Signal-T0'], '0.0')
+        self.assertEqual(response['X-Signal-Gaps'], '3.0:7.0')
+        self.assertEqual(response['X-Sample-Count'], '600')
+
+        response = self.client.get(f'/signal/{self.signal.id}/data/?start=0&end=20')
+        self.assertEqual(response.json()['gaps'], [[3.0, 7.0]])
+
+    def test_window_after_gap_starts_at_record_onset(self):
+        response = self.client.get(f'/signal/{self.signal.id}/data/?start=10.5&end=12&format=bin')
+        self.assertEqual(response['X-Signal-T0'], '10.0')
+        self.assertEqual(response['X-Sample-Count'], '200')
+        self.assertFalse(response.has_header('X-Signal-Gaps'))
+
+    def test_export_time_column_follows_record_onsets(self):
+        response = self.client.get(f'/signal/{self.signal.id}/export/?format=csv')
+        self.assertEqual(response.status_code, 200)
+        rows = list(csv.reader(io.StringIO(b''.join(response.streaming_content).decode('utf-8'))))
+        self.assertEqual(rows[0], ['time', 'S0'])
+        times = [float(row[0]) for row in rows[1:]]
+        self.assertEqual(len(times), 600)
+        self.assertAlmostEqual(times[299], 2.99)
+        self.assertAlmostEqual(times[300], 10.0)
+        self.assertAlmostEqual(times[-1], 12.99)
+
+
+class UploadSessionTests(SyntheticFileTestCase):
+
+    def setUp(self):
+        super().setUp()
+        path = write_edf(os.path.join(self.media_root, 'source.edf'), [CHANNEL, CHANNEL._replace(label='S1')], 30)
+        with open(path, 'rb') as f:
+            self.data = f.read()
+
+    def create(self, size=None, filename='night.edf'):
+        response = self.client.post('/upload/sessions/', json.dumps(
+            {'title': 'night', 'filename': filename, 'size': len(self.data) if size is None else size}),
+            content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        return response.json()
+
+    def put(self, session, offset, chunk):
+        return self.client.put(f"{session['url']}?offset={offset}", chunk, content_type='application/octet-stream')
+
+    def upload_path(self, session):
+        return os.path.join(self.media_root, UploadSession.objects.get(token=session['id']).file_name)
+
+    def test_chunks_and_finalize(self):
+        session = self.create()
+        for offset in range(0, len(self.data), 1000):
+            response = self.put(session, offset, self.data[offset:offset + 1000])
+            self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.get(session['url']).json()['offset'], len(self.data))
+
+        response = self.client.post(session['finalize_url'])
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['content_hash'], hashlib.sha256(self.data).hexdigest())
+        edf_file = EDFFile.objects.get(pk=response.json()['edf_file'])
+        with open(edf_file.file.path, 'rb') as f:
+            self.assertEqual(f.read(), self.data)
+        self.assertEqual(run_job(response.json()['job']), IngestJob.DONE)
+
+    def test_offset_conflict(self):
+        session = self.create()
+        self.assertEqual(self.put(session, 0, self.data[:600]).status_code, 200)
+        response = self.put(session, 300, self.data[300:900])
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()['offset'], 600)
+        # 續傳不受影響
+        self.assertEqual(self.put(session, 600, self.data[600:]).status_code, 200)
+        self.assertEqual(self.client.post(session['finalize_url']).status_code, 201)
+
+    def test_finalize_before_complete(self):
+        session = self.create()
+        self.put(session, 0, self.data[:600])
+        response = self.client.post(session['finalize_url'])
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()['offset'], 600)
+
+    def test_oversized_chunk(self):
+        session = self.create()
+        response = self.put(session, 0, self.data + b'\x00')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.client.get(session['url']).json()['offset'], 0)
+
+    def test_size_mismatch_deletes_partial_file(self):
+        session = self.create(size=len(self.data) + 10)
+        path = self.upload_path(session)
+        self.assertTrue(os.path.exists(path))
+        response = self.put(session, 0, self.data[:2000])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['status'], UploadSession.FAILED)
+        self.assertFalse(os.path.exists(path))
+        self.assertEqual(self.put(session, 0, self.data[:2000]).status_code, 409)
+
+    def test_garbage_rejected(self):
+        session = self.create()
+        response = self.put(session, 0, b'\x01' * 600)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('not an EDF or BDF file', response.json()['error'])
+        self.assertFalse(os.path.exists(self.upload_path(session)))
+
+    def test_unknown_record_count(self):
+        data = bytearray(self.data)
+        data[236:244] = b'-1      '
+        self.data = bytes(data)
+        session = self.create()
+        self.assertEqual(self.put(session, 0, self.data).status_code, 200)
+        response = self.client.post(session['finalize_url'])
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(run_job(response.json()['job']), IngestJob.DONE)
+
+        edf_file = EDFFile.objects.get(pk=response.json()['edf_file'])
+        self.assertEqual(edf_file.num_data_records, 30)
+        self.assertEqual(edf_file.duration, 30.0)
+        signal = edf_file.signals.first()
+        response = self.client.get(f'/signal/{signal.id}/data/?start=0&end=10')
+        self.assertEqual(len(response.json()['data']), 1000)
+
+
+class DecimationTests(SyntheticFileTestCase):
+
+    def setUp(self):
+        super().setUp()
+        channel = CHANNEL._replace(rate=500)
+        self.edf_file = self.ingest(write_edf(os.path.join(self.media_root, 'dense.edf'), [channel], 120))
+        self.signal = self.edf_file.signals.get()
+
+    def fetch(self, query):
+        response = self.client.get(f'/signal/{self.signal.id}/data/?{query}')
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def raw(self, start=None, end=None):
+        from .edf_reader import read_signal_window
+        return read_signal_window(self.edf_file.file.path, 0, start, end, max_samples=0).data
+
+    def assert_bucket_extremes(self, raw, data, bucket_size, ordered):
+        pairs = np.array(data).reshape(-1, 2)
+        buckets = [raw[i:i + bucket_size] for i in range(0, len(raw), bucket_size)]
+        self.assertEqual(len(pairs), len(buckets))
+        for pair, bucket in zip(pairs, buckets):
+            self.assertEqual(sorted(pair), [bucket.min(), bucket.max()])
+            if ordered:
+                # 依出現先後
+                self.assertEqual(bool(pair[0] == bucket.min()), bool(bucket.argmin() <= bucket.argmax()))
+
+    def test_minmax_keeps_bucket_extremes(self):
+        from .views import _max_samples_for
+
+        for start, end in ((None, None), (10, 110)):
+            query = f'start={start}&end={end}' if start is not None else ''
+            raw = self.raw(start, end)
+            max_samples = _max_samples_for(start, end, self.edf_file.duration)
+            # 與 make_decimator 的 minmax 分支相同
+            bucket_size = -(-len(raw) // (max_samples // 2))
+            self.assertGreater(bucket_size, 1)
+
+            # 不經金字塔，直接由記錄解碼
+            with mock.patch('viewer.edf_reader._read_pyramid', return_value=None):
+                payload = self.fetch(f'mode=minmax&{query}')
+            self.assert_bucket_extremes(raw, payload['data'], bucket_size, ordered=True)
+
+    def test_pyramid_keeps_bucket_extremes(self):
+        for start, end in ((None, None), (10, 110)):
+            query = f'start={start}&end={end}' if start is not None else ''
+            payload = self.fetch(f'mode=minmax&{query}')
+            # 金字塔合併後的區間大小：每個輸出點涵蓋半個區間
+            bucket_size = round(2 * payload['sample_interval'] * payload['sampling_rate'])
+            self.assertGreater(bucket_size, 1)
+            self.assert_bucket_extremes(self.raw(start, end), payload['data'], bucket_size, ordered=False)
+
+    def test_stride_matches_baseline(self):
+        from .views import _max_samples_for
+
+        for start, end in ((None, None), (10, 110)):
+            query = f'start={start}&end={end}' if start is not None else ''
+            raw = self.raw(start, end)
+            # 舊版 signal_data：all_data[::step]
+            step = max(1, len(raw) // _max_samples_for(start, end, self.edf_file.duration))
+            self.assertGreater(step, 1)
+            np.testing.assert_array_equal(self.fetch(f'mode=stride&{query}')['data'], raw[::step])
+
+
+class WindowTests(SyntheticFileTestCase):
+
+    def setUp(self):
+        super().setUp()
+        channels = [CHANNEL._replace(rate=256), CHANNEL._replace(label='S1'), CHANNEL._replace(label='S2', rate=50)]
+        self.edf_file = self.ingest(write_edf(os.path.join(self.media_root, 'window.edf'), channels, 600))
+        self.signals = list(self.edf_file.signals.order_by('signal_index'))
+
+    def queries(self):
+        for mode in ('minmax', 'lttb', 'stride'):
+            for window in ('', 'start=100&end=400', 'start=30&end=40&hp=0.5&lp=30'):
+                yield f'mode={mode}&{window}'
+
+    def test_json_matches_signal_data(self):
+        for query in self.queries():
+            payload = self.client.get(f'/edf/{self.edf_file.pk}/window/?{query}').json()
+            self.assertEqual([s['id'] for s in payload['signals']], [s.id for s in self.signals])
+            for signal, window in zip(self.signals, payload['signals']):
+                single = self.client.get(f'/signal/{signal.id}/data/?{query}').json()
+                for key in ('signal_label', 'units', 'sampling_rate', 't0', 'sample_interval', 'gaps', 'data'):
+                    self.assertEqual(window[key], single[key], f'{query} {signal.signal_label} {key}')
+
+    def test_binary_matches_signal_data(self):
+        ids = ','.join(str(s.id) for s in reversed(self.signals))
+        for query in self.queries():
+            response = self.client.get(f'/edf/{self.edf_file.pk}/window/?{query}&signals={ids}&format=bin')
+            self.assertEqual(response['X-Signal-Ids'], ids)
+            counts = [int(n) for n in response['X-Sample-Counts'].split(',')]
+            rates = response['X-Sampling-Rates'].split(',')
+            offset = 0
+            for signal, count, rate in zip(reversed(self.signals), counts, rates):
+                single = self.client.get(f'/signal/{signal.id}/data/?{query}&format=bin')
+                self.assertEqual(count, int(single['X-Sample-Count']))
+                self.assertEqual(rate, single['X-Sampling-Rate'])
+                self.assertEqual(response['X-Signal-T0'], single['X-Signal-T0'])
+                self.assertEqual(response.content[offset:offset + count * 4], single.content, f'{query} {signal.id}')
+                offset += count * 4
+            self.assertEqual(offset, len(response.content))
+
+
+@override_settings(EDF_HTTP_CACHE_MAX_AGE=3600)
+class ConditionalRequestTests(SyntheticFileTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.edf_file = self.ingest(write_edf(os.path.join(self.media_root, 'etag.edf'), [CHANNEL], 60))
+
+    def urls(self):
+        # 重新處理後信號列會重建，id 隨之改變
+        signal = self.edf_file.signals.get()
+        return [
+            f'/signal/{signal.id}/data/?start=0&end=10',
+            f'/edf/{self.edf_file.pk}/window/?start=0&end=10',
+            f'/signal/{signal.id}/export/?start=0&end=10',
+            f'/edf/{self.edf_file.pk}/stats/',
+        ]
+
+    def assert_cacheable(self, response):
+        self.assertIn('ETag', response)
+        self.assertIn('public', response['Cache-Control'])
+        self.assertIn('max-age=3600', response['Cache-Control'])
+
+    def test_if_none_match(self):
+        for url in self.urls():
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200, url)
+            self.assert_cacheable(response)
+
+            cached = self.client.get(url, headers={'If-None-Match': response['ETag']})
+            self.assertEqual(cached.status_code, 304, url)
+            self.assertEqual(cached['ETag'], response['ETag'])
+            self.assert_cacheable(cached)
+            self.assertEqual(self.client.get(url, headers={'If-None-Match': '"stale"'}).status_code, 200, url)
+
+    def test_etag_depends_on_query(self):
+        url = self.urls()[0]
+        self.assertNotEqual(self.client.get(url)['ETag'], self.client.get(url + '&mode=stride')['ETag'])
+
+    def test_not_cacheable_until_ingest_done(self):
+        urls = self.urls()
+        etags = [self.client.get(url)['ETag'] for url in urls]
+
+        # 重新處理：工作排入佇列但尚未執行
+        job = enqueue_ingest(self.edf_file)
+        for url, etag in zip(urls, etags):
+            response = self.client.get(url, headers={'If-None-Match': etag})
+            self.assertEqual(response.status_code, 200, url)
+            self.assertNotIn('ETag', response)
+            self.assertIn('no-store', response['Cache-Control'])
+            self.assertNotIn('max-age', response['Cache-Control'])
+
+        self.assertEqual(run_job(job.pk), IngestJob.DONE)
+        for url, etag in zip(self.urls(), etags):
+            response = self.client.get(url, headers={'If-None-Match': etag})
+            self.assertEqual(response.status_code, 200, url)
+            self.assertNotEqual(response['ETag'], etag)
+            self.assert_cacheable(response)
+
+
+class FilterTests(SyntheticFileTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.edf_file = self.ingest(write_edf(os.path.join(self.media_root, 'filter.edf'), [CHANNEL], 60))
+        self.signal = self.edf_file.signals.get()
+
+    def window(self, start, end, query):
+        response = self.client.get(f'/signal/{self.signal.id}/data/?start={start}&end={end}&{query}')
+        self.assertEqual(response.status_code, 200)
+        return np.array(response.json()['data'])
+
+    def reference(self, spec):
+        """整段信號以端點值延伸後與 kernel 做 np.convolve"""
+        from .edf_reader import read_signal_window
+        from .filters import design_kernel
+
+        samples = read_signal_window(self.edf_file.file.path, 0, max_samples=0).data
+        kernel = design_kernel(spec, 100.0)
+        half = len(kernel) // 2
+        padded = np.concatenate((np.full(half, samples[0]), samples, np.full(half, samples[-1])))
+        return np.convolve(padded, kernel, mode='valid')
+
+    def test_matches_convolve_reference(self):
+        from .filters import FilterSpec
+
+        for query, spec in (('hp=0.5&lp=30', FilterSpec(0.5, 30.0, None)),
+                            ('notch=50&lp=40', FilterSpec(None, 40.0, 50.0))):
+            reference = self.reference(spec)
+            self.assertEqual(len(reference), 6000)
+            # 檔案開頭、中間與結尾的視窗
+            for start, end in ((0, 10), (20, 40), (50, 60)):
+                np.testing.assert_allclose(self.window(start, end, query), reference[start * 100:end * 100],
+                                           rtol=0, atol=1e-6, err_msg=f'{query} {start}-{end}')
+
+    def test_adjacent_windows_join_exactly(self):
+        whole = self.window(20, 40, 'hp=0.5&lp=30')
+        joined = np.concatenate((self.window(20, 30, 'hp=0.5&lp=30'), self.window(30, 40, 'hp=0.5&lp=30')))
+        np.testing.assert_allclose(joined, whole, rtol=0, atol=1e-9)
+
+    def test_filtered_differs_from_raw(self):
+        self.assertGreater(np.abs(self.window(20, 30, 'hp=0.5&lp=30') - self.window(20, 30, '')).max(), 1.0)
+
+
+class MontageTests(SyntheticFileTestCase):
+
+    def setUp(self):
+        super().setUp()
+        labels = ['EEG C4-REF', 'EEG A1-REF', 'EEG C3-REF', 'EEG M2-REF']
+        channels = [CHANNEL._replace(label=label) for label in labels]
+        self.edf_file = self.ingest(write_edf(os.path.join(self.media_root, 'montage.edf'), channels, 30))
+        self.signals = {s.signal_label: s for s in self.edf_file.signals.all()}
+
+        from .models import Derivation, Montage
+
+        self.montage = Montage.objects.create(name='bipolar')
+        self.derivation = Derivation.objects.create(montage=self.montage, position=0, label='C4-M1',
+                                                    positive='C4', negative='M1')
+        Derivation.objects.create(montage=self.montage, position=1, label='C3', positive='C3')
+        Derivation.objects.create(montage=self.montage, position=2, label='O1-M2', positive='O1', negative='M2')
+        self.url = f'/edf/{self.edf_file.pk}/window/?montage=bipolar&start=5&end=15'
+
+    def raw(self, label):
+        response = self.client.get(f'/signal/{self.signals[label].id}/data/?start=5&end=15')
+        return np.array(response.json()['data'])
+
+    def test_derivation_math(self):
+        payload = self.client.get(self.url).json()
+        self.assertEqual([s['signal_label'] for s in payload['signals']], ['C4-M1', 'C3'])
+        self.assertEqual(payload['missing'], ['O1-M2'])
+
+        c4_m1, c3 = payload['signals']
+        self.assertGreater(np.abs(c4_m1['data']).max(), 1.0)
+        self.assertEqual(c4_m1['id'], f"{self.signals['EEG C4-REF'].id}-{self.signals['EEG A1-REF'].id}")
+        np.testing.assert_allclose(c4_m1['data'], self.raw('EEG C4-REF') - self.raw('EEG A1-REF'), rtol=0, atol=1e-9)
+        np.testing.assert_allclose(c3['data'], self.raw('EEG C3-REF'), rtol=0, atol=1e-9)
+
+    def test_lookup_by_id(self):
+        by_id = self.client.get(self.url.replace('montage=bipolar', f'montage={self.montage.pk}'))
+        self.assertEqual(by_id.content, self.client.get(self.url).content)
+
+    def test_etag_changes_with_derivation(self):
+        etag = self.client.get(self.url)['ETag']
+        self.assertEqual(self.client.get(self.url, headers={'If-None-Match': etag}).status_code, 304)
+
+        self.derivation.negative = 'M2'
+        self.derivation.save()
+        response = self.client.get(self.url, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        c4_m2 = response.json()['signals'][0]['data']
+        np.testing.assert_allclose(c4_m2, self.raw('EEG C4-REF') - self.raw('EEG M2-REF'), rtol=0, atol=1e-9)
+
+    def test_unknown_montage(self):
+        self.assertEqual(self.client.get(self.url.replace('bipolar', 'nope')).status_code, 404)
+
+
+async def _read_body(response):
+    if not response.streaming:
+        return response.content
+    if response.is_async:
+        return b''.join([chunk async for chunk in response.streaming_content])
+    return b''.join(response.streaming_content)
+
+
+# 非同步 view 的讀取在其他執行緒進行，需要已提交的資料
+@override_settings(ROOT_URLCONF=__name__)
+class AsyncViewTests(SyntheticFileMixin, TransactionTestCase):
+
+    def setUp(self):
+        super().setUp()
+        channels = [CHANNEL, CHANNEL._replace(label='S1'), CHANNEL._replace(label='S2', rate=50)]
+        self.edf_file = self.ingest(write_edf(os.path.join(self.media_root, 'async.edf'), channels, 120))
+        self.signals = list(self.edf_file.signals.all())
+
+    async def assert_same_as_sync(self, url):
+        with override_settings(ROOT_URLCONF='edf_viewer.urls'):
+            expected = await sync_to_async(self.client.get)(url)
+            expected_body = await _read_body(expected)
+        response = await self.async_client.get(url)
+        self.assertEqual(response.status_code, expected.status_code, url)
+        self.assertEqual(await _read_body(response), expected_body, url)
+        skip = {'Server-Timing'}
+        self.assertEqual({k: v for k, v in response.items() if k not in skip},
+                         {k: v for k, v in expected.items() if k not in skip}, url)
+
+    async def test_signal_data_matches_sync(self):
+        signal = self.signals[0]
+        for query in ('start=0&end=30', 'start=0&end=120&max_samples=500', 'start=10&end=20&format=bin',
+                      'start=0&end=60&mode=stride&hp=1', 'mode=bogus'):
+            await self.assert_same_as_sync(f'/signal/{signal.id}/data/?{query}')
+
+    async def test_edf_window_matches_sync(self):
+        ids = ','.join(str(signal.id) for signal in self.signals)
+        for query in (f'signals={ids}&start=0&end=30', f'signals={ids}&start=30&end=90&format=bin',
+                      'start=0&end=10', 'signals=99999'):
+            await self.assert_same_as_sync(f'/edf/{self.edf_file.pk}/window/?{query}')
+
+    async def test_export_streams_same_bytes(self):
+        signal = self.signals[0]
+        for query in ('format=csv', 'format=f32&start=10&end=20'):
+            await self.assert_same_as_sync(f'/signal/{signal.id}/export/?{query}')
+
+    async def test_not_modified(self):
+        url = f'/signal/{self.signals[0].id}/data/?start=0&end=30'
+        etag = (await self.async_client.get(url))['ETag']
+        response = await self.async_client.get(url, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+
+    async def test_cold_handle_opens_only_in_decode_pool(self):
+        from . import edf_reader, offload, window_cache
+
+        path = self.edf_file.file.path
+        edf_reader.invalidate_edf_handle(path)
+        opened = []
+
+        def get_edf_handle(*args, **kwargs):
+            opened.append(threading.current_thread().name)
+            return edf_reader.get_edf_handle(*args, **kwargs)
+
+        url = f'/signal/{self.signals[1].id}/data/?start=0&end=30'
+        with mock.patch.object(window_cache, 'get_edf_handle', side_effect=get_edf_handle), \
+                mock.patch.object(offload, 'decode', wraps=offload.decode) as decode:
+            # 冷的 handle：只查快取的路徑不開檔，交給解碼執行緒池
+            self.assertEqual((await self.async_client.get(url)).status_code, 200)
+            self.assertEqual(decode.call_count, 1)
+            self.assertTrue(opened)
+            self.assertTrue(all(name.startswith('edf-decode') for name in opened), opened)
+
+            # 快取命中：不再經過解碼執行緒池
+            opened.clear()
+            self.assertEqual((await self.async_client.get(url)).status_code, 200)
+            self.assertEqual(decode.call_count, 1)
+            self.assertEqual(opened, [])
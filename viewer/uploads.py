@@ -0,0 +1,243 @@
+"""
+分段、可續傳的上傳：建立工作階段 → 依 offset 依序 PUT 分段 → 完成後建立 EDFFile 並排入背景處理
+分段直接串流寫入媒體目錄中的最終檔案（不經暫存檔複製），同時累進計算 SHA-256；
+收到足夠的開頭位元組就檢查 EDF 標頭，宣告的記錄數 × 記錄大小與宣告的檔案大小不符時立即拒絕
+"""
+import hashlib
+import logging
+import os
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows：只有同一行程內的鎖
+    fcntl = None
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+
+from .edf_header import check_edf_layout, edf_header_size
+from .models import EDFFile, UploadSession
+
+logger = logging.getLogger(__name__)
+
+_BLOCK_BYTES = 1024 * 1024
+
+# 累進的雜湊：token -> (已雜湊的位元組數, hashlib 物件)
+# 只存在於處理分段的行程；換了行程或分段不連續時，完成時改為重新讀檔計算
+_hashers = {}
+_hashers_lock = threading.Lock()
+
+# 同一行程內同一工作階段的分段依序寫入；不同行程之間由檔案鎖與 received 的條件式更新保證
+_session_locks = {}
+_session_locks_lock = threading.Lock()
+
+
+class UploadConflict(Exception):
+    """分段的 offset 與已接收的位元組數不符；current 為伺服器端目前的 offset"""
+
+    def __init__(self, message, current):
+        super().__init__(message)
+        self.current = current
+
+
+def _session_lock(token):
+    with _session_locks_lock:
+        return _session_locks.setdefault(token, threading.Lock())
+
+
+def _forget(token):
+    with _hashers_lock:
+        _hashers.pop(token, None)
+    with _session_locks_lock:
+        _session_locks.pop(token, None)
+
+
+def create_session(title, filename, size):
+    """預留媒體目錄中的檔案並建立工作階段；副檔名或大小不合理時拋出 ValueError"""
+    filename = os.path.basename(filename or '')
+    if not filename.lower().endswith(('.edf', '.bdf')):
+        raise ValueError(f"unsupported file type: {filename!r} (expected .edf or .bdf)")
+    if size <= 256:
+        raise ValueError(f"file too small for an EDF header: {size} bytes")
+
+    # 與表單上傳相同的目錄與檔名規則；先存一個空檔佔住名稱
+    name = EDFFile._meta.get_field('file').generate_filename(None, filename)
+    name = default_storage.save(name, ContentFile(b''))
+    return UploadSession.objects.create(title=title or filename, file_name=name, size=size)
+
+
+def _fail(session, message):
+    logger.warning(f"Upload {session.token} ({session.title}) rejected: {message}")
+    session.status = UploadSession.FAILED
+    session.error = message
+    session.save(update_fields=['status', 'error', 'updated_at'])
+    default_storage.delete(session.file_name)
+    _forget(session.token)
+
+
+class _HeaderCheck:
+    """收集檔案開頭的位元組：滿 256 bytes 時檢查固定標頭，滿完整標頭時檢查記錄配置與檔案大小"""
+
+    def __init__(self, prefix, file_size):
+        self.data = bytearray(prefix)
+        self.file_size = file_size
+        self.needed = 256
+        self.done = False
+        self._check()
+
+    def feed(self, block):
+        pos = 0
+        while not self.done and pos < len(block):
+            take = self.needed - len(self.data)
+            self.data += block[pos:pos + take]
+            pos += take
+            self._check()
+
+    def _check(self):
+        if len(self.data) < self.needed:
+            return
+        if self.needed == 256:
+            self.needed = edf_header_size(self.data)
+            if self.needed > self.file_size:
+                raise ValueError(f"header of {self.needed} bytes does not fit in {self.file_size} bytes")
+            if len(self.data) < self.needed:
+                return
+        check_edf_layout(bytes(self.data[:self.needed]), self.file_size)
+        self.done = True
+
+
+@contextmanager
+def _locked_file(path):
+    """以讀寫模式開啟檔案並取得排他的檔案鎖（跨行程）；關閉檔案時釋放"""
+    with open(path, 'r+b') as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        yield f
+
+
+def write_chunk(session, offset, stream, length):
+    """
+    將 stream 的 length 個位元組寫入 offset；offset 必須等於目前已接收的位元組數（否則拋出 UploadConflict）
+    標頭檢查未通過時刪除檔案、將工作階段標為失敗並拋出 ValueError
+    連線中斷時保留已寫入的部分，回傳更新後的工作階段
+    """
+    if length < 0 or offset + length > session.size:
+        raise ValueError(f"chunk of {length} bytes at offset {offset} exceeds the declared size {session.size}")
+
+    path = default_storage.path(session.file_name)
+    # 檢查 offset、截斷、寫入與更新進度都在檔案鎖內：不同行程對同一 offset 的分段只有一個會寫入
+    with _session_lock(session.token):
+        # 失敗的工作階段已刪除檔案，先確認狀態再開啟
+        _check_offset(session, offset)
+        with _locked_file(path) as f:
+            # 取得檔案鎖後重新確認：等候期間其他行程可能已寫入同一 offset
+            _check_offset(session, offset)
+            return _write_locked(session, offset, stream, length, f)
+
+
+def _check_offset(session, offset):
+    session.refresh_from_db(fields=['received', 'status', 'header_checked'])
+    if session.status != UploadSession.UPLOADING:
+        raise UploadConflict(f"upload is {session.status}", session.received)
+    if offset != session.received:
+        raise UploadConflict(f"expected offset {session.received}, got {offset}", session.received)
+
+
+def _write_locked(session, offset, stream, length, f):
+    """在已取得檔案鎖的 f 寫入分段並更新進度"""
+    with _hashers_lock:
+        position, hasher = _hashers.pop(session.token, (0, None))
+    if fcntl is None:
+        # 沒有檔案鎖時無法確定磁碟上的內容與累進的雜湊一致，完成時重新讀檔計算
+        hasher = None
+    elif offset == 0:
+        hasher = hashlib.sha256()
+    elif position != offset:
+        hasher = None
+
+    check = None
+    if not session.header_checked:
+        # 續傳時先讀回已寫入的開頭（此時必定短於完整標頭）
+        check = _HeaderCheck(f.read(offset), session.size)
+
+    written = 0
+    try:
+        f.seek(offset)
+        # 丟棄上次中斷時寫了一半、未計入 received 的資料
+        f.truncate()
+        while written < length:
+            try:
+                block = stream.read(min(_BLOCK_BYTES, length - written))
+            except OSError:
+                # 連線中斷：保留已寫入的部分，用戶端從 received 續傳
+                break
+            if not block:
+                break
+            if check is not None and not check.done:
+                check.feed(block)
+            f.write(block)
+            written += len(block)
+            if hasher is not None:
+                hasher.update(block)
+        f.flush()
+    except ValueError as e:
+        _fail(session, str(e))
+        raise
+
+    fields = {'received': offset + written}
+    if check is not None and check.done:
+        fields['header_checked'] = True
+    updated = UploadSession.objects.filter(pk=session.pk, received=offset,
+                                           status=UploadSession.UPLOADING).update(**fields)
+    if not updated:
+        session.refresh_from_db(fields=['received'])
+        raise UploadConflict('upload was modified concurrently', session.received)
+    for name, value in fields.items():
+        setattr(session, name, value)
+    if hasher is not None:
+        with _hashers_lock:
+            _hashers[session.token] = (session.received, hasher)
+    return session
+
+
+def content_hash(session):
+    """完整檔案的 SHA-256：分段連續寫入同一行程時直接取用累進的結果，否則重新讀檔計算"""
+    from .importer import file_sha256
+
+    with _hashers_lock:
+        position, hasher = _hashers.pop(session.token, (0, None))
+    if hasher is not None and position == session.size:
+        return hasher.hexdigest()
+    return file_sha256(default_storage.path(session.file_name))
+
+
+def finalize(session, hypnogram=None):
+    """
+    所有分段都已接收時建立 EDFFile（可附上睡眠週期檔）並排入背景處理
+    回傳 (EDFFile, IngestJob)；尚未收齊時拋出 UploadConflict
+    """
+    from .ingest import enqueue_ingest
+
+    with _session_lock(session.token):
+        session.refresh_from_db()
+        if session.status != UploadSession.UPLOADING:
+            raise UploadConflict(f"upload is {session.status}", session.received)
+        if session.received != session.size or not session.header_checked:
+            raise UploadConflict(f"received {session.received} of {session.size} bytes", session.received)
+
+        digest = content_hash(session)
+        with transaction.atomic():
+            edf_file = EDFFile(title=session.title, content_hash=digest)
+            edf_file.file.name = session.file_name
+            if hypnogram is not None:
+                edf_file.hypnogram_file.save(hypnogram.name, hypnogram, save=False)
+            edf_file.save()
+            job = enqueue_ingest(edf_file)
+            session.status = UploadSession.COMPLETE
+            session.edf_file = edf_file
+            session.save(update_fields=['status', 'edf_file', 'updated_at'])
+    _forget(session.token)
+    return edf_file, job
@@ -1,12 +1,30 @@
+from django.conf import settings
 from django.urls import path
 from . import views
 
 app_name = 'viewer'  # 確認這行存在
 
+# 以 ASGI 執行時（edf_viewer/asgi.py）信號資料相關端點改用非同步版本
+_async = getattr(settings, 'EDF_ASYNC_VIEWS', False)
+
 urlpatterns = [
     path('', views.index, name='index'),
     path('upload/', views.upload_edf, name='upload_edf'),
+    path('upload/sessions/', views.upload_session_create, name='upload_session_create'),
+    path('upload/sessions/<uuid:token>/', views.upload_session, name='upload_session'),
+    path('upload/sessions/<uuid:token>/finalize/', views.upload_session_finalize, name='upload_session_finalize'),
+    path('ingest/<int:job_id>/', views.ingest_status, name='ingest_status'),
+    path('ingest/<int:job_id>/retry/', views.ingest_retry, name='ingest_retry'),
     path('edf/<int:pk>/', views.view_edf, name='view_edf'),
-    path('signal/<int:signal_id>/data/', views.signal_data, name='signal_data'),
-    path('edf/<int:pk>/hypnogram/', views.hypnogram_data, name='hypnogram_data'),
+    path('signal/<int:signal_id>/data/', views.signal_data_async if _async else views.signal_data, name='signal_data'),
+    path('edf/<int:pk>/hypnogram/', views.hypnogram_data_async if _async else views.hypnogram_data,
+         name='hypnogram_data'),
+    path('edf/<int:pk>/window/', views.edf_window_async if _async else views.edf_window, name='edf_window'),
+    path('signal/<int:signal_id>/export/', views.signal_export_async if _async else views.signal_export,
+         name='signal_export'),
+    path('edf/<int:pk>/export/', views.edf_export_async if _async else views.edf_export, name='edf_export'),
+    path('edf/<int:pk>/stats/', views.edf_stats, name='edf_stats'),
+    path('signal/<int:signal_id>/spectrum/', views.signal_spectrum, name='signal_spectrum'),
+    path('cache/stats/', views.cache_stats, name='cache_stats'),
+    path('metrics/', views.metrics_view, name='metrics'),
 ]
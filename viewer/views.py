@@ -1,19 +1,26 @@
 from django.shortcuts import render, get_object_or_404, redirect
 from django.views.decorators.http import require_http_methods
 from django.contrib import messages
-from django.http import JsonResponse
+from django.http import Http404, HttpResponse, JsonResponse
 from django.views.decorators.csrf import csrf_exempt
-from .models import EDFFile, Signal
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import quote_etag
+from django.conf import settings
+from django.urls import reverse
+from .models import EDFFile, IngestJob, Signal
 from .forms import EDFUploadForm
-from .edf_parser import parse_edf_file
+from . import metrics
 import os
+import hashlib
 import logging
+from functools import wraps
+from asgiref.sync import iscoroutinefunction, sync_to_async
 
 logger = logging.getLogger(__name__)
 
 def index(request):
     """首頁 - 顯示已上傳的 EDF 檔案列表"""
-    edf_files = EDFFile.objects.all()
+    edf_files = EDFFile.objects.prefetch_related('ingest_jobs')
     context = {
         'edf_files': edf_files,
     }
@@ -22,26 +29,141 @@ def index(request):
 
 @require_http_methods(["GET", "POST"])
 def upload_edf(request):
-    """上傳 EDF 檔案"""
+    """上傳 EDF 檔案：存檔後立即回應，解析交由背景工作處理"""
+    from .ingest import enqueue_ingest
+
     if request.method == 'POST':
         form = EDFUploadForm(request.POST, request.FILES)
         if form.is_valid():
             edf_file = form.save()
-            
-            try:
-                parse_edf_file(edf_file)
-                messages.success(request, f'檔案 {edf_file.title} 上傳成功！')
-                return redirect('viewer:view_edf', pk=edf_file.pk)
-            except Exception as e:
-                edf_file.delete()
-                messages.error(request, f'解析檔案失敗：{str(e)}')
+            job = enqueue_ingest(edf_file)
+            messages.success(request, f'檔案 {edf_file.title} 上傳成功，處理中…')
+            return redirect(f"{reverse('viewer:upload_edf')}?job={job.pk}")
     else:
         form = EDFUploadForm()
     
-    context = {'form': form}
+    context = {'form': form, 'job_id': request.GET.get('job')}
     return render(request, 'viewer/upload.html', context)
 
 
+def ingest_status(request, job_id):
+    """背景處理工作狀態（供上傳頁面輪詢）"""
+    job = get_object_or_404(IngestJob.objects.select_related('edf_file'), pk=job_id)
+    return JsonResponse({
+        'id': job.pk,
+        'status': job.status,
+        'attempts': job.attempts,
+        'error': job.error.splitlines()[0] if job.error else '',
+        'edf_file': job.edf_file.pk,
+        'title': job.edf_file.title,
+        'view_url': reverse('viewer:view_edf', args=[job.edf_file.pk]),
+    })
+
+
+@require_http_methods(["POST"])
+def ingest_retry(request, job_id):
+    """重新排入失敗的處理工作"""
+    from .ingest import retry_job
+
+    job = get_object_or_404(IngestJob, pk=job_id)
+    if not retry_job(job.pk):
+        return JsonResponse({'error': f'job {job.pk} is {job.status}'}, status=409)
+    return JsonResponse({'id': job.pk, 'status': IngestJob.QUEUED})
+
+
+def _upload_session_json(session):
+    return {
+        'id': str(session.token),
+        'title': session.title,
+        'size': session.size,
+        'offset': session.received,
+        'header_checked': session.header_checked,
+        'status': session.status,
+        'error': session.error,
+        'url': reverse('viewer:upload_session', args=[session.token]),
+        'finalize_url': reverse('viewer:upload_session_finalize', args=[session.token]),
+    }
+
+
+@require_http_methods(["POST"])
+def upload_session_create(request):
+    """
+    建立分段上傳：JSON {"title", "filename", "size"}
+    之後以 PUT <url>?offset=N 依序傳送分段，中斷後以 GET <url> 取得 offset 續傳，最後 POST <finalize_url>
+    """
+    import json
+    from .uploads import create_session
+
+    try:
+        payload = json.loads(request.body or b'{}')
+        size = int(payload.get('size', 0))
+        session = create_session(payload.get('title', ''), payload.get('filename', ''), size)
+    except (ValueError, TypeError) as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    return JsonResponse(_upload_session_json(session), status=201)
+
+
+@require_http_methods(["GET", "PUT"])
+def upload_session(request, token):
+    """
+    GET：目前的進度（續傳時由 offset 繼續）
+    PUT ?offset=N：將請求內容寫入 offset；offset 與已接收的位元組數不符時回傳 409 與目前的 offset，
+    標頭檢查未通過時回傳 400 並捨棄整個上傳
+    """
+    from .models import UploadSession
+    from .uploads import UploadConflict, write_chunk
+
+    session = get_object_or_404(UploadSession, token=token)
+    if request.method == 'GET':
+        return JsonResponse(_upload_session_json(session))
+
+    try:
+        offset = int(request.GET.get('offset', ''))
+        length = int(request.META.get('CONTENT_LENGTH') or -1)
+    except ValueError:
+        return JsonResponse({'error': 'offset query parameter and Content-Length are required'}, status=400)
+    if length < 0:
+        return JsonResponse({'error': 'Content-Length is required'}, status=411)
+
+    try:
+        # 直接從請求串流讀取（不經 request.body），分段不會整段載入記憶體
+        session = write_chunk(session, offset, request, length)
+    except UploadConflict as e:
+        return JsonResponse({'error': str(e), 'offset': e.current}, status=409)
+    except ValueError as e:
+        return JsonResponse({'error': str(e), 'status': session.status}, status=400)
+    return JsonResponse(_upload_session_json(session))
+
+
+@require_http_methods(["POST"])
+def upload_session_finalize(request, token):
+    """所有分段都已接收後建立 EDF 檔案並排入背景處理；可附上 multipart 的 hypnogram_file"""
+    from django.core.validators import FileExtensionValidator
+    from django.core.exceptions import ValidationError
+    from .models import UploadSession
+    from .uploads import UploadConflict, finalize
+
+    session = get_object_or_404(UploadSession, token=token)
+    hypnogram = request.FILES.get('hypnogram_file')
+    if hypnogram is not None:
+        try:
+            FileExtensionValidator(allowed_extensions=['edf', 'bdf'])(hypnogram)
+        except ValidationError as e:
+            return JsonResponse({'error': ' '.join(e.messages)}, status=400)
+
+    try:
+        edf_file, job = finalize(session, hypnogram)
+    except UploadConflict as e:
+        return JsonResponse({'error': str(e), 'offset': e.current}, status=409)
+    return JsonResponse({
+        'edf_file': edf_file.pk,
+        'content_hash': edf_file.content_hash,
+        'job': job.pk,
+        'status_url': reverse('viewer:ingest_status', args=[job.pk]),
+        'view_url': reverse('viewer:view_edf', args=[edf_file.pk]),
+    }, status=201)
+
+
 def view_edf(request, pk):
     """檢視 EDF 檔案的信號數據"""
     edf_file = get_object_or_404(EDFFile, pk=pk)
@@ -54,10 +176,135 @@ def view_edf(request, pk):
     return render(request, 'viewer/view_edf.html', context)
 
 
-def signal_data(request, signal_id):
-    """獲取信號數據（JSON 格式用於圖表）- 優化版本"""
-    signal = get_object_or_404(Signal, id=signal_id)
+def _file_etag(request, file_path, *versions):
+    """以檔案路徑、mtime、大小、衍生資料版本與請求內容（路徑、查詢參數、回應格式）組成強 ETag"""
+    try:
+        stat = os.stat(file_path)
+    except OSError:
+        return None
+    raw = '|'.join([
+        file_path, str(stat.st_mtime_ns), str(stat.st_size), *versions,
+        request.path, request.GET.urlencode(), str(_wants_binary(request)),
+    ])
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+
+def _mtime_version(path):
+    try:
+        return str(os.stat(path).st_mtime_ns)
+    except OSError:
+        return '-'
+
+
+def _derived_version(edf_file):
+    """
+    背景處理產生的資料（信號列、時長、金字塔、統計）的版本
+    最近一次工作尚未完成時回傳 None：回應內容仍會改變，不可快取
+    """
+    from .epoch_stats import stats_path
+    from .pyramid import pyramid_dir
+
+    job = edf_file.ingest_jobs.first()
+    if job is not None and job.status != IngestJob.DONE:
+        return None
+    # 沒有工作紀錄的舊資料視為已完成
+    finished = job.finished_at.isoformat() if job is not None and job.finished_at else ''
+    path = edf_file.file.path
+    return f"{finished}|{_mtime_version(pyramid_dir(path))}|{_mtime_version(stats_path(path))}"
+
+
+def _montage_version(request):
+    """?montage= 的導程定義（可在管理介面修改，不能只靠查詢參數區分）"""
+    from .models import Derivation
+
+    value = request.GET.get('montage')
+    if not value:
+        return ''
+    lookup = {'montage__pk': int(value)} if value.isdigit() else {'montage__name': value}
+    rows = Derivation.objects.filter(**lookup).order_by('position', 'pk').values_list(
+        'montage_id', 'position', 'label', 'positive', 'negative')
+    return hashlib.sha1(repr(list(rows)).encode('utf-8')).hexdigest()
+
+
+def _edf_file_etag(request, edf_file, file_path=None, *versions):
+    version = _derived_version(edf_file)
+    if version is None:
+        return None
+    return _file_etag(request, file_path or edf_file.file.path, version, *versions)
+
+
+def _signal_etag(request, signal_id):
+    signal = Signal.objects.select_related('edf_file').filter(id=signal_id).first()
+    return _edf_file_etag(request, signal.edf_file) if signal else None
+
+
+def _edf_etag(request, pk):
+    edf_file = EDFFile.objects.filter(pk=pk).first()
+    return _edf_file_etag(request, edf_file, None, _montage_version(request)) if edf_file else None
+
+
+def _hypnogram_etag(request, pk):
+    edf_file = EDFFile.objects.filter(pk=pk).first()
+    if not edf_file or not edf_file.hypnogram_file:
+        return None
+    return _edf_file_etag(request, edf_file, edf_file.hypnogram_file.path)
+
+
+def immutable_resource(etag_func):
+    """
+    內容只取決於上傳後不再變動的檔案與其衍生資料的 view：
+    加上強 ETag、處理 If-None-Match（304），成功回應附長期 Cache-Control
+    etag_func 回傳 None（例如背景處理尚未完成）時不附 ETag 並標為 no-store
+    非同步 view 的 ETag 在 sync_to_async 的執行緒計算（需要查詢資料庫）
+    """
+    def finish(request, response, etag):
+        if etag is None:
+            if response.has_header('ETag'):
+                del response['ETag']
+            patch_cache_control(response, no_store=True)
+        elif response.status_code in (200, 206, 304):
+            if request.method in ('GET', 'HEAD'):
+                response.headers.setdefault('ETag', etag)
+            patch_cache_control(response, public=True, max_age=settings.EDF_HTTP_CACHE_MAX_AGE)
+        elif response.has_header('ETag'):
+            del response['ETag']
+        return response
+
+    def decorator(view):
+        # django.views.decorators.http.condition 在 Django 4.2 只支援同步 view，這裡自行處理條件式請求
+        if iscoroutinefunction(view):
+            @wraps(view)
+            async def async_wrapper(request, *args, **kwargs):
+                etag = await sync_to_async(etag_func)(request, *args, **kwargs)
+                etag = quote_etag(etag) if etag is not None else None
+                response = get_conditional_response(request, etag=etag)
+                if response is None:
+                    response = await view(request, *args, **kwargs)
+                return finish(request, response, etag)
+            return async_wrapper
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            etag = etag_func(request, *args, **kwargs)
+            etag = quote_etag(etag) if etag is not None else None
+            response = get_conditional_response(request, etag=etag)
+            if response is None:
+                response = view(request, *args, **kwargs)
+            return finish(request, response, etag)
+        return wrapper
+    return decorator
+
+
+async def _aget_or_404(queryset, **kwargs):
+    """get_object_or_404 的非同步版本（Django 4.2 尚未提供）"""
+    try:
+        return await queryset.aget(**kwargs)
+    except queryset.model.DoesNotExist:
+        raise Http404(f"No {queryset.model._meta.object_name} matches the given query.")
+
 
+def _parse_time_range(request):
+    """解析 ?start=&end=（秒），格式錯誤時視為未指定"""
     start = request.GET.get('start')
     end = request.GET.get('end')
 
@@ -66,80 +313,680 @@ def signal_data(request, signal_id):
         end_time = float(end) if end is not None else None
     except ValueError:
         start_time, end_time = None, None
+    return start_time, end_time
+
+
+def _parse_filters(request):
+    """解析 ?hp=&lp=&notch=（Hz），都未指定時回傳 None；數值不合法時拋出 ValueError"""
+    from .filters import parse_filter_spec
+    return parse_filter_spec(request.GET.get('hp'), request.GET.get('lp'), request.GET.get('notch'))
+
+
+def _max_samples_for(start_time, end_time, duration):
+    """根據時間範圍調整採樣限制：大範圍降低採樣，小範圍提高精度"""
+    time_range = (end_time - start_time) if (start_time and end_time) else duration
+    return max(5000, min(50000, int(time_range * 100)))
+
+
+def _window_params(request):
+    """
+    信號資料端點共用的參數：時間範圍、下採樣模式與濾波設定
+    回傳 ((start_time, end_time, mode, filters), 錯誤回應 or None)
+    """
+    # 讀取資料的模組（含 NumPy）在第一次需要時才載入，讓 worker 啟動更快
+    from .decimation import DECIMATION_MODES
+
+    start_time, end_time = _parse_time_range(request)
+    mode = request.GET.get('mode', 'minmax')
+    if mode not in DECIMATION_MODES:
+        return None, JsonResponse({'error': f'unknown mode: {mode}'}, status=400)
+    try:
+        filters = _parse_filters(request)
+    except ValueError as e:
+        return None, JsonResponse({'error': str(e)}, status=400)
+    return (start_time, end_time, mode, filters), None
+
+
+def _observe_window(request, edf_file, signal_indices, start_time, end_time, mode, filters):
+    """記錄視窗請求，連續翻頁時在背景預讀接下來的視窗"""
+    if not getattr(settings, 'EDF_PREFETCH_WINDOWS', 0):
+        return
+    from .prefetch import client_key, observe
+
+    observe(
+        client_key(request),
+        edf_file.file.path,
+        signal_indices,
+        start_time,
+        end_time,
+        duration=edf_file.duration,
+        max_samples=_max_samples_for(start_time, end_time, edf_file.duration),
+        mode=mode,
+        filters=filters,
+    )
+
+
+def _signal_data_response(request, signal, start_time, end_time, mode, filters, cached_only=False):
+    """讀取（或取自快取）單一信號的視窗並編碼；cached_only 時未命中快取回傳 None"""
+    from .window_cache import get_signal_windows
+
+    windows = get_signal_windows(
+        signal.edf_file.file.path,
+        [signal.signal_index],
+        start_time=start_time,
+        end_time=end_time,
+        max_samples=_max_samples_for(start_time, end_time, signal.edf_file.duration),
+        mode=mode,
+        header_loader=signal.edf_file.load_header,
+        filters=filters,
+        cached_only=cached_only,
+    )
+    if windows is None:
+        return None
+    window = windows[0]
+    _observe_window(request, signal.edf_file, [signal.signal_index], start_time, end_time, mode, filters)
+
+    with metrics.timed('encode'):
+        if _wants_binary(request):
+            response = _binary_signal_response(signal, window, mode)
+        else:
+            response = JsonResponse({
+                'signal_label': signal.signal_label,
+                'units': signal.units,
+                'sampling_rate': window.sampling_rate,
+                'mode': mode,
+                't0': window.t0,
+                'sample_interval': window.sample_interval,
+                'gaps': window.gaps,
+                'data': window.data.tolist(),
+            })
+    patch_vary_headers(response, ['Accept'])
+    return response
+
+
+@immutable_resource(_signal_etag)
+def signal_data(request, signal_id):
+    """獲取信號數據（JSON 或二進位 float32 格式用於圖表）- 優化版本；可用 ?hp=&lp=&notch= 濾波"""
+    signal = get_object_or_404(Signal.objects.select_related('edf_file'), id=signal_id)
+    params, error = _window_params(request)
+    if error is not None:
+        return error
+
+    try:
+        return _signal_data_response(request, signal, *params)
+    except Exception as e:
+        logger.error(f"Error reading signal {signal_id}: {str(e)}")
+        return JsonResponse({'error': str(e)}, status=400)
+
+
+@immutable_resource(_signal_etag)
+async def signal_data_async(request, signal_id):
+    """
+    signal_data 的非同步版本（ASGI）：快取命中直接回應，
+    未命中才交給解碼執行緒池，慢的大視窗請求不會擋住其他請求
+    """
+    from .offload import decode, lookup
+
+    signal = await _aget_or_404(Signal.objects.select_related('edf_file'), id=signal_id)
+    params, error = _window_params(request)
+    if error is not None:
+        return error
+
+    try:
+        response = await lookup(_signal_data_response, request, signal, *params, True)
+        if response is None:
+            response = await decode(signal.edf_file.file.path, _signal_data_response, request, signal, *params)
+        return response
+    except Exception as e:
+        logger.error(f"Error reading signal {signal_id}: {str(e)}")
+        return JsonResponse({'error': str(e)}, status=400)
+
+
+def _select_signals(request, edf_file):
+    """
+    依 ?signals=1,2,5 選出檔案中的信號（保留請求順序），未指定時回傳全部信號
+    回傳 (signals, 錯誤回應 or None)
+    """
+    signals = list(edf_file.signals.all())
+    requested = request.GET.get('signals')
+    if requested:
+        try:
+            ids = [int(x) for x in requested.split(',') if x.strip()]
+        except ValueError:
+            return None, JsonResponse({'error': f'invalid signals: {requested}'}, status=400)
+        by_id = {signal.id: signal for signal in signals}
+        missing = [x for x in ids if x not in by_id]
+        if missing:
+            return None, JsonResponse({'error': f'unknown signals: {missing}'}, status=404)
+        signals = [by_id[x] for x in ids]
+    return signals, None
+
+
+def _select_montage(request, edf_file):
+    """
+    依 ?montage=<id 或名稱> 將導程對應到檔案中的信號
+    回傳 (channels, missing, 錯誤回應 or None)
+    """
+    from .models import Montage
+    from .montage import resolve_montage
+
+    value = request.GET['montage']
+    lookup = {'pk': int(value)} if value.isdigit() else {'name': value}
+    montage = Montage.objects.prefetch_related('derivations').filter(**lookup).first()
+    if montage is None:
+        return None, [], JsonResponse({'error': f'unknown montage: {value}'}, status=404)
+    channels, missing = resolve_montage(montage, edf_file.signals.all())
+    if not channels:
+        return None, missing, JsonResponse({'error': f'no derivation of {montage.name} available', 'missing': missing},
+                                           status=404)
+    return channels, missing, None
+
+
+def _window_signals(request, edf_file):
+    """依 ?montage= 或 ?signals= 選出要讀取的信號；回傳 (signals, missing, 錯誤回應 or None)"""
+    if request.GET.get('montage'):
+        return _select_montage(request, edf_file)
+    signals, error = _select_signals(request, edf_file)
+    return signals, [], error
+
+
+def _edf_window_response(request, edf_file, signals, missing, start_time, end_time, mode, filters,
+                         cached_only=False):
+    """讀取（或取自快取）多個信號的同一視窗並編碼；cached_only 時有信號未命中快取回傳 None"""
+    from .window_cache import get_signal_windows
+
+    windows = get_signal_windows(
+        edf_file.file.path,
+        [signal.signal_index for signal in signals],
+        start_time=start_time,
+        end_time=end_time,
+        max_samples=_max_samples_for(start_time, end_time, edf_file.duration),
+        mode=mode,
+        header_loader=edf_file.load_header,
+        filters=filters,
+        cached_only=cached_only,
+    )
+    if windows is None:
+        return None
+    _observe_window(request, edf_file, [signal.signal_index for signal in signals], start_time, end_time, mode,
+                    filters)
+
+    with metrics.timed('encode'):
+        if _wants_binary(request):
+            response = _binary_window_response(signals, windows, mode)
+        else:
+            response = JsonResponse({
+                'mode': mode,
+                'missing': missing,
+                'signals': [{
+                    'id': signal.id,
+                    'signal_label': signal.signal_label,
+                    'units': signal.units,
+                    'sampling_rate': window.sampling_rate,
+                    't0': window.t0,
+                    'sample_interval': window.sample_interval,
+                    'gaps': window.gaps,
+                    'data': window.data.tolist(),
+                } for signal, window in zip(signals, windows)],
+            })
+    patch_vary_headers(response, ['Accept'])
+    return response
+
+
+@immutable_resource(_edf_etag)
+def edf_window(request, pk):
+    """
+    一次取得多個信號的同一時間視窗：?signals=1,2,5&start=&end=&hp=&lp=&notch=
+    資料記錄只讀取一次；未指定 signals 時回傳全部信號
+    ?montage=<id 或名稱> 改為回傳導程（相減後才濾波與下採樣）；檔案中找不到的導程列在 missing
+    """
+    edf_file = get_object_or_404(EDFFile, pk=pk)
+    params, error = _window_params(request)
+    if error is not None:
+        return error
+    signals, missing, error = _window_signals(request, edf_file)
+    if error is not None:
+        return error
+
+    try:
+        return _edf_window_response(request, edf_file, signals, missing, *params)
+    except Exception as e:
+        logger.error(f"Error reading window of EDF {pk}: {str(e)}")
+        return JsonResponse({'error': str(e)}, status=400)
+
+
+@immutable_resource(_edf_etag)
+async def edf_window_async(request, pk):
+    """edf_window 的非同步版本（ASGI），快取與解碼的分流同 signal_data_async"""
+    from .offload import decode, lookup
+
+    edf_file = await _aget_or_404(EDFFile.objects.all(), pk=pk)
+    params, error = _window_params(request)
+    if error is not None:
+        return error
+    signals, missing, error = await sync_to_async(_window_signals)(request, edf_file)
+    if error is not None:
+        return error
 
     try:
-        from .edf_reader import read_signal_data
-        
-        # 根據時間範圍調整採樣限制
-        time_range = (end_time - start_time) if (start_time and end_time) else signal.edf_file.duration
-        # 大範圍降低採樣，小範圍提高精度
-        max_samples = max(5000, min(50000, int(time_range * 100)))
-        
-        data, sampling_rate = read_signal_data(
+        response = await lookup(_edf_window_response, request, edf_file, signals, missing, *params, True)
+        if response is None:
+            response = await decode(edf_file.file.path, _edf_window_response, request, edf_file, signals, missing,
+                                    *params)
+        return response
+    except Exception as e:
+        logger.error(f"Error reading window of EDF {pk}: {str(e)}")
+        return JsonResponse({'error': str(e)}, status=400)
+
+
+def _wants_binary(request):
+    """?format=bin 或 Accept: application/octet-stream 時回傳二進位格式"""
+    if request.GET.get('format') == 'bin':
+        return True
+    return 'application/octet-stream' in request.headers.get('Accept', '')
+
+
+def _binary_signal_response(signal, window, mode):
+    """little-endian float32 樣本序列，元數據放在回應標頭"""
+    payload = window.data.astype('<f4').tobytes()
+    response = HttpResponse(payload, content_type='application/octet-stream')
+    response['X-Sample-Count'] = str(len(window.data))
+    response['X-Sampling-Rate'] = repr(window.sampling_rate)
+    response['X-Signal-T0'] = repr(window.t0)
+    response['X-Sample-Interval'] = repr(window.sample_interval)
+    _set_gap_header(response, window)
+    response['X-Decimation-Mode'] = mode
+    response['X-Signal-Units'] = signal.units
+    return response
+
+
+def _binary_window_response(signals, windows, mode):
+    """
+    多信號的 float32 序列依 signals 順序串接
+    各信號的 id、樣本數、取樣率與點間隔以逗號分隔放在回應標頭
+    """
+    payload = b''.join(window.data.astype('<f4').tobytes() for window in windows)
+    response = HttpResponse(payload, content_type='application/octet-stream')
+    response['X-Signal-Ids'] = ','.join(str(signal.id) for signal in signals)
+    response['X-Sample-Counts'] = ','.join(str(len(window.data)) for window in windows)
+    response['X-Sampling-Rates'] = ','.join(repr(window.sampling_rate) for window in windows)
+    response['X-Sample-Intervals'] = ','.join(repr(window.sample_interval) for window in windows)
+    response['X-Signal-T0'] = repr(windows[0].t0) if windows else '0.0'
+    response['X-Decimation-Mode'] = mode
+    response['X-Signal-Labels'] = ','.join(signal.signal_label.replace(',', ' ') for signal in signals)
+    if windows:
+        _set_gap_header(response, windows[0])
+    return response
+
+
+def _set_gap_header(response, window):
+    """EDF+D 視窗內的記錄空隙：開始時間:長度，以逗號分隔"""
+    if window.gaps:
+        response['X-Signal-Gaps'] = ','.join(f"{start!r}:{length!r}" for start, length in window.gaps)
+
+
+def _parse_byte_range(header, length):
+    """
+    解析單一範圍的 Range 標頭（bytes=a-b、bytes=a-、bytes=-n）
+    回傳 (first, last)；沒有或不支援（例如多個範圍）時回傳 None，無法滿足時回傳 False
+    """
+    if not header or not header.startswith('bytes=') or ',' in header:
+        return None
+    first, _, last = header[len('bytes='):].strip().partition('-')
+    try:
+        if not first:
+            suffix = int(last)
+            if suffix <= 0:
+                return False
+            return max(0, length - suffix), length - 1
+        first = int(first)
+        last = min(int(last), length - 1) if last else length - 1
+    except ValueError:
+        return None
+    if first > last or first >= length:
+        return False
+    return first, last
+
+
+def _export_response(request, export, filename, etag):
+    """
+    串流匯出內容；二進位格式支援 Range / If-Range 以便續傳
+    """
+    from django.http import StreamingHttpResponse
+
+    length = export.content_length
+    byte_range = None
+    if length is not None:
+        if_range = request.headers.get('If-Range')
+        if not if_range or if_range.strip('"') == etag:
+            byte_range = _parse_byte_range(request.headers.get('Range'), length)
+        if byte_range is False:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{length}'
+            return response
+
+    if byte_range:
+        first, last = byte_range
+        response = StreamingHttpResponse(export.iter_bytes(first, last), content_type=export.content_type, status=206)
+        response['Content-Range'] = f'bytes {first}-{last}/{length}'
+        response['Content-Length'] = str(last - first + 1)
+    else:
+        response = StreamingHttpResponse(export.iter_bytes(), content_type=export.content_type)
+        if length is not None:
+            response['Content-Length'] = str(length)
+
+    response['Accept-Ranges'] = 'bytes' if length is not None else 'none'
+    response['Content-Disposition'] = f'attachment; filename="{filename}.{export.fmt}"'
+    response['X-Sample-Count'] = str(export.num_samples)
+    response['X-Sampling-Rate'] = repr(export.sampling_rate)
+    response['X-Signal-T0'] = repr(export.t0)
+    response['X-Signal-Labels'] = ','.join(label.replace(',', ' ') for label in export.labels)
+    return response
+
+
+def _export_filename(*parts):
+    return '_'.join(''.join(c if c.isalnum() or c in '-.' else '_' for c in part) for part in parts)
+
+
+def _signal_export_response(request, signal):
+    start_time, end_time = _parse_time_range(request)
+
+    try:
+        from .export import SignalExport
+
+        export = SignalExport(
             signal.edf_file.file.path,
-            signal.signal_index,
+            [signal.signal_index],
             start_time=start_time,
             end_time=end_time,
-            max_samples=max_samples,
-            return_rate=True
+            fmt=request.GET.get('format', 'csv'),
+            labels=[signal.signal_label],
+            header_loader=signal.edf_file.load_header,
         )
-        
-        return JsonResponse({
-            'signal_label': signal.signal_label,
-            'units': signal.units,
-            'sampling_rate': sampling_rate,
-            'data': data,
-        })
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    response = _export_response(request, export, _export_filename(signal.edf_file.title, signal.signal_label),
+                                _signal_etag(request, signal.id))
+    response['X-Signal-Units'] = signal.units
+    return response
+
+
+@immutable_resource(_signal_etag)
+def signal_export(request, signal_id):
+    """
+    以原始解析度串流匯出信號：?format=csv|f32|npy&start=&end=
+    記憶體用量固定，不隨時間範圍增長
+    """
+    signal = get_object_or_404(Signal.objects.select_related('edf_file'), id=signal_id)
+    return _signal_export_response(request, signal)
+
+
+@immutable_resource(_signal_etag)
+async def signal_export_async(request, signal_id):
+    """
+    signal_export 的非同步版本（ASGI）：開啟檔案與產生每一塊輸出都在解碼執行緒池執行
+    （ASGI 下同步 iterator 的串流回應會先整份讀入記憶體）
+    """
+    from .offload import decode, stream_in_pool
+
+    signal = await _aget_or_404(Signal.objects.select_related('edf_file'), id=signal_id)
+    path = signal.edf_file.file.path
+    return stream_in_pool(path, await decode(path, _signal_export_response, request, signal))
+
+
+def _edf_export_response(request, edf_file):
+    from .edf_annotations import ANNOTATION_LABEL
+
+    start_time, end_time = _parse_time_range(request)
+
+    signals, error = _select_signals(request, edf_file)
+    if error is not None:
+        return error
+    if not request.GET.get('signals'):
+        signals = [signal for signal in signals if signal.signal_label != ANNOTATION_LABEL]
+        if not signals:
+            return JsonResponse({'error': 'no data signals to export'}, status=404)
+        signals = [signal for signal in signals if signal.sampling_rate == signals[0].sampling_rate]
+
+    try:
+        from .export import SignalExport
+
+        export = SignalExport(
+            edf_file.file.path,
+            [signal.signal_index for signal in signals],
+            start_time=start_time,
+            end_time=end_time,
+            fmt=request.GET.get('format', 'csv'),
+            labels=[signal.signal_label for signal in signals],
+            header_loader=edf_file.load_header,
+        )
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    response = _export_response(request, export, _export_filename(edf_file.title), _edf_etag(request, edf_file.pk))
+    response['X-Signal-Ids'] = ','.join(str(signal.id) for signal in signals)
+    return response
+
+
+@immutable_resource(_edf_etag)
+def edf_export(request, pk):
+    """
+    串流匯出多個相同取樣率的信號：?signals=1,2&format=csv|f32|npy&start=&end=
+    未指定 signals 時匯出與第一個資料信號取樣率相同的信號（不含 EDF+ 註記信號）
+    二進位格式為逐樣本交錯排列（樣本數 × 信號數）
+    """
+    edf_file = get_object_or_404(EDFFile, pk=pk)
+    return _edf_export_response(request, edf_file)
+
+
+@immutable_resource(_edf_etag)
+async def edf_export_async(request, pk):
+    """edf_export 的非同步版本（ASGI），執行緒的分流同 signal_export_async"""
+    from .offload import decode, stream_in_pool
+
+    edf_file = await _aget_or_404(EDFFile.objects.all(), pk=pk)
+    path = edf_file.file.path
+    return stream_in_pool(path, await decode(path, _edf_export_response, request, edf_file))
+
+
+@immutable_resource(_signal_etag)
+def signal_spectrum(request, signal_id):
+    """
+    信號的頻譜分析：?output=bands|psd|spectrogram&epoch=30&window=4&overlap=0.5&start=&end=&fmax=
+    bands 為每 epoch 的頻帶功率，psd 為範圍內的平均 Welch PSD，spectrogram 為每 epoch 的 PSD
+    整個信號的結果依 (信號, epoch, window, overlap) 快取，不同時間範圍只做切片
+    """
+    signal = get_object_or_404(Signal.objects.select_related('edf_file'), id=signal_id)
+    start_time, end_time = _parse_time_range(request)
+    output = request.GET.get('output', 'bands')
+
+    from .spectrum import FREQUENCY_BANDS, SPECTRUM_OUTPUTS, get_spectrogram, summarize_spectrogram
+
+    if output not in SPECTRUM_OUTPUTS:
+        return JsonResponse({'error': f'unknown output: {output}'}, status=400)
+
+    try:
+        spectrogram = get_spectrogram(
+            signal.edf_file.file.path,
+            signal.signal_index,
+            epoch_seconds=float(request.GET.get('epoch', 30)),
+            window_seconds=float(request.GET.get('window', 4)),
+            overlap=float(request.GET.get('overlap', 0.5)),
+            header_loader=signal.edf_file.load_header,
+        )
+        fmax = float(request.GET['fmax']) if 'fmax' in request.GET else None
+        result = summarize_spectrogram(spectrogram, output, start_time, end_time, fmax)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
     except Exception as e:
-        logger.error(f"Error reading signal {signal_id}: {str(e)}")
+        logger.error(f"Error computing spectrum of signal {signal_id}: {str(e)}")
         return JsonResponse({'error': str(e)}, status=400)
 
+    if _wants_binary(request):
+        response = HttpResponse(result.data.astype('<f4').tobytes(), content_type='application/octet-stream')
+        response['X-Matrix-Shape'] = ','.join(str(n) for n in result.data.shape)
+        response['X-Epoch-Seconds'] = repr(spectrogram.epoch_seconds)
+        response['X-First-Epoch'] = str(result.epochs.start)
+        if result.freqs is not None and len(result.freqs) > 1:
+            response['X-Frequency-Step'] = repr(float(result.freqs[1] - result.freqs[0]))
+    else:
+        payload = {
+            'output': output,
+            'units': f'{signal.units}^2' if output == 'bands' else f'{signal.units}^2/Hz',
+            'sampling_rate': spectrogram.sampling_rate,
+            'epoch_seconds': spectrogram.epoch_seconds,
+            'first_epoch': result.epochs.start,
+            'num_epochs': result.epochs.stop - result.epochs.start,
+            'data': result.data.tolist(),
+        }
+        if output == 'bands':
+            payload['bands'] = [{'name': name, 'low': low, 'high': high} for name, low, high in FREQUENCY_BANDS]
+        else:
+            payload['freqs'] = result.freqs.tolist()
+        response = JsonResponse(payload)
+    patch_vary_headers(response, ['Accept'])
+    return response
+
 
+def _hypnogram_response(request, edf_file):
+    """查詢範圍內的睡眠週期 annotation 並編碼"""
+    from django.db.models import F, Q
+
+    annotations = edf_file.annotations.all()
+    start_time, end_time = _parse_time_range(request)
+    if end_time is not None:
+        annotations = annotations.filter(onset__lt=end_time)
+    if start_time is not None:
+        annotations = annotations.alias(end=F('onset') + F('duration')).filter(
+            Q(onset__gte=start_time) | Q(end__gt=start_time))
+
+    hypnogram_data = [
+        {'onset': onset, 'duration': duration, 'stage': stage}
+        for onset, duration, stage in annotations.values_list('onset', 'duration', 'stage')
+    ]
+    return JsonResponse({
+        'data': hypnogram_data,
+        'total_duration': float(edf_file.duration),
+        'num_segments': len(hypnogram_data),
+    })
+
+
+@immutable_resource(_hypnogram_etag)
 def hypnogram_data(request, pk):
-    """讀取睡眠週期 annotation（onset, duration, stage）"""
+    """讀取睡眠週期 annotation（onset, duration, stage），可用 ?start=&end= 限定範圍"""
+    from .edf_parser import parse_hypnogram_file
+
     edf_file = get_object_or_404(EDFFile, pk=pk)
 
     if not edf_file.hypnogram_file:
         return JsonResponse({'error': 'no hypnogram file'}, status=404)
 
     try:
-        import mne
-        annotations = mne.read_annotations(edf_file.hypnogram_file.path)
-        
-        stage_mapping = {
-            'Sleep stage W': 'W',
-            'Sleep stage 1': 'N1',
-            'Sleep stage 2': 'N2',
-            'Sleep stage 3': 'N3',
-            'Sleep stage 4': 'N3',
-            'Sleep stage R': 'REM',
-            'Sleep stage ?': 'unknown',
-            'W': 'W',
-            'N1': 'N1',
-            'N2': 'N2',
-            'N3': 'N3',
-            'REM': 'REM',
-            '1': 'N1',
-            '2': 'N2',
-            '3': 'N3',
-            'R': 'REM',
-        }
-        
-        hypnogram_data = []
-        
-        for onset, duration, description in zip(annotations.onset, annotations.duration, annotations.description):
-            stage = stage_mapping.get(description, description.split()[-1] if 'Sleep stage' in description else description)
-            hypnogram_data.append({
-                'onset': float(onset),
-                'duration': float(duration),
-                'stage': stage
-            })
-        
-        return JsonResponse({
-            'data': hypnogram_data,
-            'total_duration': float(edf_file.duration),
-            'num_segments': len(hypnogram_data),
-        })
+        # 舊資料（處理時尚未保存註記）或背景處理尚未解析時，在第一次讀取時補上
+        if edf_file.hypnogram_parsed_at is None:
+            parse_hypnogram_file(edf_file, only_if_unparsed=True)
     except Exception as e:
         logger.error(f"Error reading hypnogram: {str(e)}")
         return JsonResponse({'error': f'{type(e).__name__}: {str(e)}'}, status=400)
+
+    return _hypnogram_response(request, edf_file)
+
+
+@immutable_resource(_hypnogram_etag)
+async def hypnogram_data_async(request, pk):
+    """hypnogram_data 的非同步版本（ASGI）：補解析睡眠週期檔時交給解碼執行緒池"""
+    from .edf_parser import parse_hypnogram_file
+    from .offload import decode
+
+    edf_file = await _aget_or_404(EDFFile.objects.all(), pk=pk)
+
+    if not edf_file.hypnogram_file:
+        return JsonResponse({'error': 'no hypnogram file'}, status=404)
+
+    try:
+        if edf_file.hypnogram_parsed_at is None:
+            await decode(edf_file.hypnogram_file.path, parse_hypnogram_file, edf_file, True)
+    except Exception as e:
+        logger.error(f"Error reading hypnogram: {str(e)}")
+        return JsonResponse({'error': f'{type(e).__name__}: {str(e)}'}, status=400)
+
+    return await sync_to_async(_hypnogram_response)(request, edf_file)
+
+
+@immutable_resource(_edf_etag)
+def edf_stats(request, pk):
+    """
+    整份記錄的每 epoch（30 秒）統計：?signals=1,2
+    回傳每個欄位的 epoch × 信號矩陣；二進位格式為 (欄位, epoch, 信號) 的 float32
+    """
+    from .edf_reader import get_edf_handle
+    from .epoch_stats import EPOCH_SECONDS, STAT_FIELDS, build_epoch_stats, load_epoch_stats
+
+    edf_file = get_object_or_404(EDFFile, pk=pk)
+    signals, error = _select_signals(request, edf_file)
+    if error is not None:
+        return error
+
+    try:
+        path = edf_file.file.path
+        stats = load_epoch_stats(path, get_edf_handle(path, edf_file.load_header).mtime)
+        if stats is None:
+            # 舊資料（處理時尚未建立統計）在第一次讀取時補上
+            stats = build_epoch_stats(path)
+    except Exception as e:
+        logger.error(f"Error reading stats of EDF {pk}: {str(e)}")
+        return JsonResponse({'error': str(e)}, status=400)
+
+    matrix = stats[:, :, [signal.signal_index for signal in signals]]
+    if _wants_binary(request):
+        response = HttpResponse(matrix.astype('<f4').tobytes(), content_type='application/octet-stream')
+        response['X-Stat-Fields'] = ','.join(STAT_FIELDS)
+        response['X-Num-Epochs'] = str(matrix.shape[1])
+        response['X-Epoch-Seconds'] = repr(EPOCH_SECONDS)
+        response['X-Signal-Ids'] = ','.join(str(signal.id) for signal in signals)
+    else:
+        # 沒有樣本的 epoch 為 NaN，JSON 以 null 表示
+        values = {
+            name: [[None if v != v else v for v in row] for row in matrix[k].tolist()]
+            for k, name in enumerate(STAT_FIELDS)
+        }
+        response = JsonResponse({
+            'epoch_seconds': EPOCH_SECONDS,
+            'num_epochs': matrix.shape[1],
+            'signals': [
+                {'id': signal.id, 'signal_label': signal.signal_label, 'units': signal.units}
+                for signal in signals
+            ],
+            'fields': list(STAT_FIELDS),
+            'stats': values,
+        })
+    patch_vary_headers(response, ['Accept'])
+    return response
+
+
+def metrics_view(request):
+    """Prometheus 文字格式的延遲直方圖與計數；快取與預讀統計在抓取時換算"""
+    from .prefetch import prefetch_stats
+    from .window_cache import window_cache_stats
+
+    cache = window_cache_stats()
+    prefetch = prefetch_stats()
+    extra = [
+        ('edf_window_cache_hits_total', cache['hits']),
+        ('edf_window_cache_misses_total', cache['misses']),
+        ('edf_prefetch_scheduled_total', prefetch['scheduled']),
+        ('edf_prefetch_hits_total', cache['prefetch_hits']),
+        ('edf_prefetch_wasted_total', cache['prefetch_wasted']),
+    ]
+    return HttpResponse(metrics.render(extra), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+def cache_stats(request):
+    """信號視窗快取與預讀的命中統計"""
+    from .prefetch import prefetch_stats
+    from .window_cache import window_cache_stats
+
+    stats = window_cache_stats()
+    stats['prefetch'] = prefetch_stats()
+    return JsonResponse(stats)
@@ -0,0 +1,232 @@
+import hashlib
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+from . import metrics
+from .edf_reader import get_edf_handle, peek_edf_handle, read_signal_windows
+from .filters import filter_key
+
+
+class _Store:
+    """單一快取名稱共用的資料（Django 每個執行緒各自建立 backend 實例）"""
+
+    def __init__(self):
+        self.data = OrderedDict()   # key -> (pickled, expires_at)
+        self.bytes = 0
+        self.lock = threading.Lock()
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+class ByteBoundedLRUCache(BaseCache):
+    """
+    以總位元組數為上限的行程內 LRU 快取（Django cache backend）
+    設定：OPTIONS = {'MAX_BYTES': ...}；超過上限時淘汰最久未使用的項目
+    """
+
+    pickle_protocol = pickle.HIGHEST_PROTOCOL
+
+    def __init__(self, name, params):
+        super().__init__(params)
+        self.max_bytes = int(params.get('OPTIONS', {}).get('MAX_BYTES', 256 * 1024 * 1024))
+        with _stores_lock:
+            self._shared = _stores.setdefault(name, _Store())
+        self._data = self._shared.data
+        self._lock = self._shared.lock
+
+    @property
+    def size_bytes(self):
+        return self._shared.bytes
+
+    def __len__(self):
+        return len(self._data)
+
+    def _live(self, key):
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        if entry[1] is not None and entry[1] <= time.time():
+            self._remove(key)
+            return None
+        return entry
+
+    def _remove(self, key):
+        pickled, _ = self._data.pop(key)
+        self._shared.bytes -= len(pickled)
+
+    def _put(self, key, value, timeout):
+        pickled = pickle.dumps(value, self.pickle_protocol)
+        if len(pickled) > self.max_bytes:
+            return False
+        if key in self._data:
+            self._remove(key)
+        self._data[key] = (pickled, self.get_backend_timeout(timeout))
+        self._shared.bytes += len(pickled)
+        while self._shared.bytes > self.max_bytes:
+            self._remove(next(iter(self._data)))
+        return True
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        with self._lock:
+            if self._live(key) is not None:
+                return False
+            return self._put(key, value, timeout)
+
+    def get(self, key, default=None, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        with self._lock:
+            entry = self._live(key)
+            if entry is None:
+                return default
+            self._data.move_to_end(key)
+            pickled = entry[0]
+        return pickle.loads(pickled)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        with self._lock:
+            self._put(key, value, timeout)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        with self._lock:
+            entry = self._live(key)
+            if entry is None:
+                return False
+            self._data[key] = (entry[0], self.get_backend_timeout(timeout))
+            return True
+
+    def delete(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        with self._lock:
+            if key not in self._data:
+                return False
+            self._remove(key)
+            return True
+
+    def has_key(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        with self._lock:
+            return self._live(key) is not None
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._shared.bytes = 0
+
+
+# 視窗快取命中統計
+_stats = {'hits': 0, 'misses': 0, 'prefetched': 0, 'prefetch_hits': 0, 'prefetch_wasted': 0}
+_stats_lock = threading.Lock()
+
+# 預讀但尚未被請求的項目：key -> bytes
+_prefetched = OrderedDict()
+
+
+def _window_cache():
+    return caches[getattr(settings, 'EDF_WINDOW_CACHE', 'default')]
+
+
+def _window_key(file_path, mtime, signal_index, start_record, end_record, max_samples, mode, filters=None):
+    raw = '|'.join(str(part) for part in (
+        file_path, mtime, signal_index, start_record, end_record, max_samples, mode, filter_key(filters)))
+    return 'edf-window:' + hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+
+def get_signal_windows(file_path, signal_indices, start_time=None, end_time=None, max_samples=10000, mode='minmax',
+                       header_loader=None, filters=None, prefetch=False, cached_only=False):
+    """
+    read_signal_windows 的快取版本
+    鍵為 (檔案, mtime, 信號, 記錄範圍, max_samples, 下採樣模式, 濾波設定)；只讀取未命中的信號
+    prefetch 為 True 時為預先讀取：不計入命中統計，讀入的項目記錄下來以計算預讀命中率
+    cached_only 為 True 時只查詢快取：有任何信號未命中、或檔案尚未開啟（需要映射檔案、讀取標頭或
+    EDF+D 的記錄時間）就回傳 None（不計入統計），由呼叫端改走讀取路徑
+    """
+    if cached_only:
+        handle = peek_edf_handle(file_path)
+        if handle is None:
+            return None
+    else:
+        handle = get_edf_handle(file_path, header_loader)
+    start_record, end_record = handle.record_range(start_time, end_time)
+    keys = {
+        signal_index: _window_key(file_path, handle.mtime, signal_index, start_record, end_record, max_samples, mode,
+                                  filters)
+        for signal_index in signal_indices
+    }
+
+    cache = _window_cache()
+    with metrics.timed('cache'):
+        found = cache.get_many(list(keys.values()))
+    missing = [signal_index for signal_index in keys if keys[signal_index] not in found]
+    if cached_only and missing:
+        return None
+
+    if not prefetch:
+        with _stats_lock:
+            _stats['hits'] += len(keys) - len(missing)
+            _stats['misses'] += len(missing)
+            for key in found:
+                if _prefetched.pop(key, None) is not None:
+                    _stats['prefetch_hits'] += 1
+
+    windows = {signal_index: found[key] for signal_index, key in keys.items() if key in found}
+    if missing:
+        loaded = read_signal_windows(file_path, missing, start_time, end_time, max_samples, mode, header_loader,
+                                     filters)
+        fresh = dict(zip(missing, loaded))
+        with metrics.timed('cache'):
+            cache.set_many({keys[signal_index]: window for signal_index, window in fresh.items()}, timeout=None)
+        windows.update(fresh)
+        if prefetch:
+            _mark_prefetched({keys[signal_index]: window.data.nbytes for signal_index, window in fresh.items()})
+
+    return [windows[signal_index] for signal_index in signal_indices]
+
+
+def _mark_prefetched(sizes):
+    """記錄預讀的項目；超過預讀記憶體預算時，最舊的未使用項目視為浪費並不再追蹤"""
+    budget = getattr(settings, 'EDF_PREFETCH_MAX_BYTES', 32 * 1024 * 1024)
+    with _stats_lock:
+        for key, size in sizes.items():
+            _prefetched[key] = size
+            _stats['prefetched'] += 1
+        while _prefetched and sum(_prefetched.values()) > budget:
+            _prefetched.popitem(last=False)
+            _stats['prefetch_wasted'] += 1
+
+
+def prefetched_bytes():
+    """已預讀但尚未被使用的資料量"""
+    with _stats_lock:
+        return sum(_prefetched.values())
+
+
+def get_signal_window(file_path, signal_index, start_time=None, end_time=None, max_samples=10000, mode='minmax',
+                      header_loader=None, filters=None):
+    return get_signal_windows(file_path, [signal_index], start_time, end_time, max_samples, mode, header_loader,
+                              filters)[0]
+
+
+def window_cache_stats():
+    """視窗快取的命中/未命中與預讀命中次數；後端為 ByteBoundedLRUCache 時附上項目數與位元組數"""
+    with _stats_lock:
+        stats = dict(_stats)
+    lookups = stats['hits'] + stats['misses']
+    stats['hit_rate'] = stats['hits'] / lookups if lookups else 0.0
+    stats['prefetch_hit_rate'] = stats['prefetch_hits'] / stats['prefetched'] if stats['prefetched'] else 0.0
+    cache = _window_cache()
+    if isinstance(cache, ByteBoundedLRUCache):
+        stats['entries'] = len(cache)
+        stats['bytes'] = cache.size_bytes
+        stats['max_bytes'] = cache.max_bytes
+    return stats